@@ -0,0 +1,285 @@
+# alternatives_index.py
+#
+# Per-category "healthier alternatives" index for the product scanner
+# (extract_product.py).
+#
+# A scan used to download up to FETCH_LIMIT_PER_CATEGORY products for each
+# of the scanned product's categories and run the risk rules over all of
+# them. The index stores, per OFF category tag, the candidates already
+# reduced to what the scanner returns: name, brand, image, nutrient summary
+# and a bitmask of the risk_rules.ALL_RULES each one fails. Finding
+# alternatives is then a lookup plus a bitmask filter for the user's
+# conditions and restrictions (risk_rules.evaluate_flags), with no network
+# fan-out.
+#
+# A category the index does not hold yet is read by the scan in pages
+# (CategoryPager), so a scan that finds enough alternatives early does not
+# download the rest; the full entry is then built in the background.
+#
+# Entries are built ahead of time or on the first scan that needs them:
+#
+#   python alternatives_index.py build [--categories en:colas,en:yogurts] [--top 200]
+#   python alternatives_index.py stats
+#
+# `build` without --categories indexes the most populated categories of the
+# local OFF mirror. A category is fresh for ALT_INDEX_TTL_HOURS (24); for
+# ALT_INDEX_STALE_HOURS (168) after that it is still served while a detached
+# `refresh` process rebuilds it. The file is capped at ALT_INDEX_MAX_MB (LRU).
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from disk_cache import DiskCache
+from product_record import as_records
+from risk_rules import RULES_VERSION, rule_flags
+
+ALT_INDEX_CONFIG = {
+    "ENABLED": os.getenv("ALT_INDEX", "1") == "1",
+    "PATH": os.getenv("ALT_INDEX_PATH", os.path.join("cache", "alternatives_index.sqlite3")),
+    "MAX_BYTES": int(float(os.getenv("ALT_INDEX_MAX_MB", "64")) * 1024 * 1024),
+    "TTL_S": float(os.getenv("ALT_INDEX_TTL_HOURS", "24")) * 3600,
+    "STALE_S": float(os.getenv("ALT_INDEX_STALE_HOURS", "168")) * 3600,
+    "REVALIDATE": os.getenv("ALT_INDEX_REVALIDATE", "1") == "1",
+    "REFRESH_LOCK_S": 120,
+    "BUILD_TOP": 200,
+}
+
+_REFRESH_SCHEMA = "CREATE TABLE IF NOT EXISTS alt_refresh (tag TEXT PRIMARY KEY, started REAL NOT NULL)"
+
+
+def build_candidates(products: List[Dict]) -> List[Dict]:
+    """Index entries for the products the scanner can show (code, name and image), in source order"""
+    records = [r for r in as_records(products) if r.code and r.name and r.image_url]
+    flags = rule_flags(records).tolist()
+    candidates = []
+    for record, record_flags in zip(records, flags):
+        nutrients = record.nutrient_summary()
+        candidates.append({
+            "code": record.code,
+            "name": record.name,
+            "brand": record.brands if record.brands is not None else "Unknown Brand",
+            "image_url": record.image_url,
+            "nutrients": nutrients,
+            "has_nutrients": 1 if nutrients.get("energy_kcal") else 0,
+            "flags": record_flags,
+        })
+    return candidates
+
+
+class AlternativesIndex:
+    def __init__(self, path: str, max_bytes: int):
+        self._cache = DiskCache(path, "alternatives", max_bytes)
+        self._cache.execute(_REFRESH_SCHEMA)
+
+    def lookup(self, tag: str) -> Tuple[Optional[List[Dict]], str]:
+        """(candidates, "fresh" | "stale" | "miss") for a category tag"""
+        max_age = ALT_INDEX_CONFIG["TTL_S"] + ALT_INDEX_CONFIG["STALE_S"]
+        entry = self._cache.get_entry(self._key(tag), track=False, max_age=max_age)
+        self._cache.record_lookup(entry is not None)
+        if entry is None:
+            return None, "miss"
+        raw, age = entry
+        if age > ALT_INDEX_CONFIG["TTL_S"]:
+            self._cache.bump("stale_hits")
+            return json.loads(raw), "stale"
+        return json.loads(raw), "fresh"
+
+    def store(self, tag: str, candidates: List[Dict]):
+        self._cache.put_json(self._key(tag), candidates)
+
+    @staticmethod
+    def _key(tag: str) -> str:
+        # Candidate flags are only valid for the risk rules that computed them
+        return f"{RULES_VERSION}:{tag}"
+
+    def claim_refresh(self, tag: str) -> bool:
+        """True for the first caller to rebuild this category within REFRESH_LOCK_S"""
+        now = time.time()
+        self._cache.execute(
+            "INSERT INTO alt_refresh (tag, started) VALUES (?, ?) "
+            "ON CONFLICT (tag) DO UPDATE SET started = excluded.started WHERE started < ?",
+            (tag, now, now - ALT_INDEX_CONFIG["REFRESH_LOCK_S"]),
+        )
+        rows = self._cache.execute("SELECT started FROM alt_refresh WHERE tag = ?", (tag,))
+        return bool(rows) and rows[0][0] == now
+
+    def release_refresh(self, tag: str):
+        self._cache.execute("DELETE FROM alt_refresh WHERE tag = ?", (tag,))
+
+    def revalidate(self, tag: str):
+        """Rebuild a stale category in a detached process, so this scan does not wait"""
+        if not ALT_INDEX_CONFIG["REVALIDATE"] or not self.claim_refresh(tag):
+            return
+        try:
+            # OFF_CACHE=0: the rebuild must not be answered from a stale cached response
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "refresh", tag],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                close_fds=True, start_new_session=True, env=dict(os.environ, OFF_CACHE="0"),
+            )
+            self._cache.bump("revalidations")
+        except OSError as e:
+            self.release_refresh(tag)
+            sys.stderr.write(f"Alternatives index refresh failed to start: {str(e)}\n")
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+_alternatives_index = None
+
+
+def get_alternatives_index() -> Optional[AlternativesIndex]:
+    """Process-wide AlternativesIndex, or None when ALT_INDEX=0 or the file cannot be opened"""
+    global _alternatives_index
+    if not ALT_INDEX_CONFIG["ENABLED"]:
+        return None
+    if _alternatives_index is None:
+        try:
+            _alternatives_index = AlternativesIndex(ALT_INDEX_CONFIG["PATH"], ALT_INDEX_CONFIG["MAX_BYTES"])
+        except Exception as e:
+            sys.stderr.write(f"Alternatives index disabled: {str(e)}\n")
+            ALT_INDEX_CONFIG["ENABLED"] = False
+            return None
+    return _alternatives_index
+
+
+def _store_category(tag: str, candidates: List[Dict]):
+    index = get_alternatives_index()
+    if index is not None:
+        try:
+            index.store(tag, candidates)
+        except Exception as e:
+            sys.stderr.write(f"Alternatives index write failed: {str(e)}\n")
+
+
+async def index_category(client, tag: str, limit: int) -> List[Dict]:
+    """Fetch one category through the scanner's client and (re)build its entry"""
+    products = await client.fetch_by_category(tag, limit)
+    candidates = build_candidates(products)
+    # An empty answer may be a failed request (the clients log and return []), so it is not stored
+    if products:
+        _store_category(tag, candidates)
+    return candidates
+
+
+def indexed_candidates(tag: str) -> Optional[List[Dict]]:
+    """Indexed candidates for a category, None when it is not indexed (stale entries are served and rebuilt)"""
+    index = get_alternatives_index()
+    if index is None:
+        return None
+    try:
+        candidates, state = index.lookup(tag)
+        if state == "stale":
+            index.revalidate(tag)
+        return candidates
+    except Exception as e:
+        sys.stderr.write(f"Alternatives index read failed: {str(e)}\n")
+        return None
+
+
+class CategoryPager:
+    """Fetches a category that is not indexed one page at a time, most popular first.
+
+    The scanner stops asking for pages once it has enough alternatives. A
+    category read to the end (or to limit) is stored in the index as if
+    index_category() had built it; a partly read one is left to a background
+    rebuild, since a truncated entry would hide the rest of the category from
+    later scans.
+    """
+
+    def __init__(self, client, tag: str, page_size: int, limit: int):
+        self.client = client
+        self.tag = tag
+        self.page_size = page_size
+        self.limit = limit
+        self.page = 1
+        self.candidates: List[Dict] = []
+        self.exhausted = False
+        self._complete = False
+        self._fetched = 0
+
+    async def next_page(self) -> List[Dict]:
+        """Candidates of the next page (also appended to self.candidates)"""
+        # Pages keep one size so that page numbers map to fixed offsets
+        products = await self.client.fetch_by_category(self.tag, self.page_size, page=self.page)
+        short = len(products) < self.page_size
+        products = products[:self.limit - self._fetched]
+        self.page += 1
+        self._fetched += len(products)
+        self.exhausted = short or self._fetched >= self.limit
+        # An empty page may also be a failed request (the clients log and return []),
+        # so only a short non-empty page proves the category was read to the end
+        self._complete = self._fetched >= self.limit or (short and bool(products))
+        page = build_candidates(products)
+        self.candidates.extend(page)
+        return page
+
+    def finish(self):
+        """Index what was read: the whole entry when complete, else a background rebuild"""
+        if self._complete:
+            _store_category(self.tag, self.candidates)
+            return
+        index = get_alternatives_index()
+        if index is not None and self._fetched:
+            index.revalidate(self.tag)
+
+
+async def rebuild(tags: List[str]) -> Dict[str, int]:
+    """Re-index categories with the scanner's client (mirror or OFF API); tag -> candidates"""
+    from extract_product import CONFIG, open_off_client
+
+    counts = {}
+    async with open_off_client() as client:
+        for tag in tags:
+            candidates = await index_category(client, tag, CONFIG["FETCH_LIMIT_PER_CATEGORY"])
+            counts[tag] = len(candidates)
+    return counts
+
+
+def refresh(tag: str):
+    """Rebuild one category and release its refresh claim (run by revalidate())"""
+    index = get_alternatives_index()
+    try:
+        asyncio.run(rebuild([tag]))
+    finally:
+        index.release_refresh(tag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and inspect the per-category alternatives index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Index categories ahead of scans")
+    p_build.add_argument("--categories", help="Comma-separated OFF category tags (default: top mirror categories)")
+    p_build.add_argument("--top", type=int, default=ALT_INDEX_CONFIG["BUILD_TOP"],
+                         help="How many mirror categories to index without --categories")
+
+    p_refresh = sub.add_parser("refresh", help="Rebuild one category (used by stale lookups)")
+    p_refresh.add_argument("tag")
+
+    sub.add_parser("stats", help="Entry count, size and hit rate")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        if args.categories:
+            tags = [t.strip() for t in args.categories.split(",") if t.strip()]
+        else:
+            from off_mirror import get_mirror
+            tags = get_mirror().category_tags(args.top)
+        print(json.dumps(asyncio.run(rebuild(tags)), indent=2))
+    elif args.command == "refresh":
+        refresh(args.tag)
+    else:
+        index = get_alternatives_index()
+        print(json.dumps(index.stats() if index else {"enabled": False}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# barcode_store.py
+#
+# Local barcode -> product store for the scanner's barcode path
+# (extract_product.py), so a product that was scanned before is answered
+# from disk instead of a /api/v2/product/<barcode> round trip.
+#
+# Entries are the normalized product records of off_mirror.compact_product,
+# keyed on the barcode with leading zeros stripped (so UPC-A and its EAN-13
+# form share one entry):
+#   * fresh for BARCODE_STORE_TTL_HOURS (168);
+#   * for BARCODE_STORE_STALE_HOURS (720) after that an entry is still served,
+#     and a detached `python barcode_store.py refresh <barcode>` process
+#     fetches a new copy, so the scan never waits on OFF;
+#   * barcodes OFF does not know are remembered for
+#     BARCODE_STORE_NEGATIVE_MINUTES (30), so repeated scans of an unknown
+#     code do not each pay a failed lookup.
+# The file is capped at BARCODE_STORE_MAX_MB (LRU). Product requests that go
+# through the store bypass the generic OFF response cache (off_cache.py).
+#
+#   python barcode_store.py stats
+
+import os
+import sys
+import json
+import time
+import asyncio
+import subprocess
+from typing import Dict, Optional, Tuple
+
+from disk_cache import DiskCache
+from off_client import OffClient, OffClientError
+from off_mirror import PRODUCT_FIELDS, compact_product
+
+BARCODE_STORE_CONFIG = {
+    "ENABLED": os.getenv("BARCODE_STORE", "1") == "1",
+    "PATH": os.getenv("BARCODE_STORE_PATH", os.path.join("cache", "barcode_store.sqlite3")),
+    "MAX_BYTES": int(float(os.getenv("BARCODE_STORE_MAX_MB", "32")) * 1024 * 1024),
+    "TTL_S": float(os.getenv("BARCODE_STORE_TTL_HOURS", "168")) * 3600,
+    "STALE_S": float(os.getenv("BARCODE_STORE_STALE_HOURS", "720")) * 3600,
+    "NEGATIVE_TTL_S": float(os.getenv("BARCODE_STORE_NEGATIVE_MINUTES", "30")) * 60,
+    "REVALIDATE": os.getenv("BARCODE_STORE_REVALIDATE", "1") == "1",
+    "REFRESH_LOCK_S": 60,
+}
+
+# Everything compact_product keeps
+STORE_FIELDS = ",".join(PRODUCT_FIELDS + ("nutriments",))
+
+_REFRESH_SCHEMA = "CREATE TABLE IF NOT EXISTS barcode_refresh (barcode TEXT PRIMARY KEY, started REAL NOT NULL)"
+
+
+def normalize_barcode(barcode: str) -> str:
+    digits = "".join(c for c in str(barcode) if c.isdigit())
+    return digits.lstrip("0") or digits
+
+
+class BarcodeStore:
+    def __init__(self, path: str, max_bytes: int):
+        self._cache = DiskCache(path, "barcodes", max_bytes)
+        self._cache.execute(_REFRESH_SCHEMA)
+
+    def lookup(self, barcode: str) -> Tuple[Optional[Dict], str]:
+        """(product, "fresh" | "stale" | "negative" | "miss") for a barcode"""
+        max_age = BARCODE_STORE_CONFIG["TTL_S"] + BARCODE_STORE_CONFIG["STALE_S"]
+        entry = self._cache.get_entry(normalize_barcode(barcode), track=False, max_age=max_age)
+        if entry is not None:
+            raw, age = entry
+            product = json.loads(raw)["product"]
+            if product is None:
+                if age <= BARCODE_STORE_CONFIG["NEGATIVE_TTL_S"]:
+                    self._cache.record_lookup(True)
+                    self._cache.bump("negative_hits")
+                    return None, "negative"
+            elif age > BARCODE_STORE_CONFIG["TTL_S"]:
+                self._cache.record_lookup(True)
+                self._cache.bump("stale_hits")
+                return product, "stale"
+            else:
+                self._cache.record_lookup(True)
+                return product, "fresh"
+        self._cache.record_lookup(False)
+        return None, "miss"
+
+    def store(self, barcode: str, product: Optional[Dict]):
+        """Remember a product, or (product=None) that OFF does not know the barcode"""
+        self._cache.put_json(normalize_barcode(barcode), {"product": product})
+
+    def claim_refresh(self, barcode: str) -> bool:
+        """True for the first caller to refresh this barcode within REFRESH_LOCK_S"""
+        key, now = normalize_barcode(barcode), time.time()
+        self._cache.execute(
+            "INSERT INTO barcode_refresh (barcode, started) VALUES (?, ?) "
+            "ON CONFLICT (barcode) DO UPDATE SET started = excluded.started WHERE started < ?",
+            (key, now, now - BARCODE_STORE_CONFIG["REFRESH_LOCK_S"]),
+        )
+        rows = self._cache.execute("SELECT started FROM barcode_refresh WHERE barcode = ?", (key,))
+        return bool(rows) and rows[0][0] == now
+
+    def release_refresh(self, barcode: str):
+        self._cache.execute("DELETE FROM barcode_refresh WHERE barcode = ?", (normalize_barcode(barcode),))
+
+    def revalidate(self, barcode: str):
+        """Refresh a stale entry in a detached process, so this scan does not wait"""
+        if not BARCODE_STORE_CONFIG["REVALIDATE"] or not self.claim_refresh(barcode):
+            return
+        try:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "refresh", barcode],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                close_fds=True, start_new_session=True,
+            )
+            self._cache.bump("revalidations")
+        except OSError as e:
+            self.release_refresh(barcode)
+            sys.stderr.write(f"Barcode store refresh failed to start: {str(e)}\n")
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+_barcode_store = None
+
+
+def get_barcode_store() -> Optional[BarcodeStore]:
+    """Process-wide BarcodeStore, or None when BARCODE_STORE=0 or the file cannot be opened"""
+    global _barcode_store
+    if not BARCODE_STORE_CONFIG["ENABLED"]:
+        return None
+    if _barcode_store is None:
+        try:
+            _barcode_store = BarcodeStore(BARCODE_STORE_CONFIG["PATH"], BARCODE_STORE_CONFIG["MAX_BYTES"])
+        except Exception as e:
+            sys.stderr.write(f"Barcode store disabled: {str(e)}\n")
+            BARCODE_STORE_CONFIG["ENABLED"] = False
+            return None
+    return _barcode_store
+
+
+async def fetch_and_store(store: Optional[BarcodeStore], client: OffClient, barcode: str) -> Optional[Dict]:
+    """Fetch a product from OFF and record the answer (including "not found"); raises OffClientError"""
+    try:
+        raw = await client.product(barcode, STORE_FIELDS, cached=False)
+    except OffClientError as e:
+        if e.status == 404 and store is not None:
+            store.store(barcode, None)
+        raise
+    product = compact_product(dict(raw, code=raw.get("code") or barcode)) if raw else None
+    if store is not None:
+        try:
+            store.store(barcode, product)
+        except Exception as e:
+            sys.stderr.write(f"Barcode store write failed: {str(e)}\n")
+    return product
+
+
+async def get_product(client: OffClient, barcode: str) -> Optional[Dict]:
+    """Product for a barcode from the store when known, else from OFF; raises OffClientError"""
+    store = get_barcode_store()
+    if store is not None:
+        try:
+            product, state = store.lookup(barcode)
+            if state == "stale":
+                store.revalidate(barcode)
+            if state != "miss":
+                return product
+        except Exception as e:
+            sys.stderr.write(f"Barcode store read failed: {str(e)}\n")
+    return await fetch_and_store(store, client, barcode)
+
+
+def refresh(barcode: str):
+    """Re-fetch one barcode and overwrite its entry (run by revalidate())"""
+    store = get_barcode_store()
+
+    async def run():
+        async with OffClient() as client:
+            await fetch_and_store(store, client, barcode)
+
+    try:
+        asyncio.run(run())
+    except OffClientError as e:
+        sys.stderr.write(f"{str(e)}\n")
+    finally:
+        store.release_refresh(barcode)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "refresh":
+        refresh(sys.argv[2])
+    else:
+        store = get_barcode_store()
+        print(json.dumps(store.stats() if store else {"enabled": False}, indent=2))
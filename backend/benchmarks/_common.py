@@ -0,0 +1,44 @@
+# Shared helpers for the benchmark scripts in this folder.
+
+import os
+import sys
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Let benchmark scripts import the backend modules one level up
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def summarize_latencies(latencies_s: List[float]) -> Dict:
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds"""
+    if not latencies_s:
+        return {"count": 0}
+    ms = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+def write_json(path: str, payload: Dict):
+    payload = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **payload}
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    sys.stderr.write(f"Wrote {path}\n")
+
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """Print rows as a Markdown table so reports can be pasted into reviews"""
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for row in rows:
+        print("| " + " | ".join(str(row.get(c, "")) for c in columns) + " |")
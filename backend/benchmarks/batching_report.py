@@ -0,0 +1,103 @@
+# batching_report.py
+#
+# Throughput-vs-latency report for the classifier micro-batcher.
+#
+#   python benchmarks/batching_report.py [--backend onnx]     # real Food-101 classifier
+#   python benchmarks/batching_report.py --synthetic 25,3     # fake model: 25 ms/call + 3 ms/image
+#
+# Every (window, max batch) setting is driven by --clients closed-loop
+# callers that each classify --requests images back to back, which is how
+# concurrent uploads hit the worker.
+
+import argparse
+import time
+import threading
+
+import numpy as np
+
+from _common import summarize_latencies, write_json, print_table
+from classification_batcher import ClassificationBatcher
+from classifier_backends import load_classifier
+
+
+def load_predict_fn(args):
+    if args.synthetic:
+        per_call_ms, per_item_ms = (float(x) for x in args.synthetic.split(","))
+
+        def fake_predict(batch):
+            time.sleep((per_call_ms + per_item_ms * len(batch)) / 1000.0)
+            return np.zeros((len(batch), 101), dtype=np.float32)
+        return fake_predict
+
+    return load_classifier(args.backend).predict
+
+
+def run_setting(predict_fn, window_ms, max_batch, clients, requests_per_client):
+    batcher = ClassificationBatcher(predict_fn, max_batch_size=max_batch, window_ms=window_ms)
+    img = np.random.default_rng(0).uniform(-1, 1, (224, 224, 3)).astype(np.float32)
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        local = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            batcher.classify(img)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    # Warm-up so graph tracing does not land in the first setting
+    batcher.classify(img)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    batcher.close()
+
+    stats = summarize_latencies(latencies)
+    return {
+        "window_ms": window_ms,
+        "max_batch": max_batch,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_batch": round((batcher.items_run - 1) / max(1, batcher.batches_run - 1), 2),
+        **{k: stats[k] for k in ("p50_ms", "p95_ms", "p99_ms")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classifier micro-batching throughput vs latency report")
+    parser.add_argument("--backend", default=None, help="keras, tflite or onnx (default: $CLASSIFIER_BACKEND)")
+    parser.add_argument("--synthetic", help="per_call_ms,per_item_ms cost model instead of the real classifier")
+    parser.add_argument("--windows", default="0,5,10,20,40", help="Comma separated batch windows in ms")
+    parser.add_argument("--batches", default="1,4,8,16", help="Comma separated max batch sizes")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--out", help="Also save the report as JSON")
+    args = parser.parse_args()
+
+    predict_fn = load_predict_fn(args)
+    rows = []
+    for max_batch in (int(b) for b in args.batches.split(",")):
+        for window_ms in (float(w) for w in args.windows.split(",")):
+            if max_batch == 1 and window_ms > 0:
+                continue  # the window is meaningless without batching
+            rows.append(run_setting(predict_fn, window_ms, max_batch, args.clients, args.requests))
+
+    print_table(rows, ["window_ms", "max_batch", "mean_batch", "throughput_rps", "p50_ms", "p95_ms", "p99_ms"])
+    if args.out:
+        write_json(args.out, {
+            "benchmark": "classifier_batching",
+            "model": "synthetic " + args.synthetic if args.synthetic else (args.backend or "default backend"),
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "results": rows,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# depth_tiers.py
+#
+# Latency per depth tier (MiDaS_small / DPT_Hybrid / DPT_Large) and working
+# resolution, split into YOLO, MiDaS and height-map post-processing.
+#
+#   python benchmarks/depth_tiers.py photos/ [--tiers fast,balanced,quality] [--sizes 384,640] [--out depth.json]
+#
+# "full" in --sizes reproduces the old behaviour of post-processing at the
+# original photo resolution.
+
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from _common import summarize_latencies, write_json, print_table
+import depth_pipeline
+from image_files import collect_images
+
+
+def load_images(paths):
+    return [Image.open(f).convert("RGB") for f in collect_images(paths)]
+
+
+def time_tier(models, images, max_side, repeats):
+    yolo_model, midas, midas_transforms, device = models
+    stages = {"yolo": [], "midas": [], "post": [], "total": []}
+
+    for _ in range(repeats):
+        for pil_image in images:
+            start = time.perf_counter()
+            size = depth_pipeline.working_size(*pil_image.size, max_side=max_side)
+            work_image = pil_image if size == pil_image.size else pil_image.resize(size)
+
+            t0 = time.perf_counter()
+            results = yolo_model(work_image, verbose=False)
+            t1 = time.perf_counter()
+            depth_norm = depth_pipeline.run_midas(midas, midas_transforms, device, np.asarray(work_image), size)
+            t2 = time.perf_counter()
+            mask = depth_pipeline.food_mask(results[0], size)
+            if not mask.any():
+                mask = depth_pipeline.fallback_mask(size)
+            depth_pipeline.height_map_from_depth(depth_norm, mask)
+            depth_pipeline.colorize(depth_norm)
+            t3 = time.perf_counter()
+
+            stages["yolo"].append(t1 - t0)
+            stages["midas"].append(t2 - t1)
+            stages["post"].append(t3 - t2)
+            stages["total"].append(t3 - start)
+    return {name: summarize_latencies(values) for name, values in stages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Depth-estimation latency per quality tier")
+    parser.add_argument("paths", nargs="+", help="Sample food photos or folders of photos")
+    parser.add_argument("--tiers", default=",".join(depth_pipeline.DEPTH_TIERS))
+    parser.add_argument("--sizes", default="640,full", help="Working-resolution caps to compare")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", help="Also save the report as JSON")
+    args = parser.parse_args()
+
+    images = load_images(args.paths)
+    rows = []
+    for tier in args.tiers.split(","):
+        models = depth_pipeline.load_depth_models(tier)
+        # Warm-up pass so weight loading / first-call allocation is not timed
+        time_tier(models, images[:1], None, 1)
+        for size in args.sizes.split(","):
+            max_side = 10 ** 6 if size == "full" else int(size)
+            stats = time_tier(models, images, max_side, args.repeats)
+            rows.append({
+                "tier": tier,
+                "midas": depth_pipeline.DEPTH_TIERS[tier]["midas"],
+                "working_size": size,
+                "yolo_p50_ms": stats["yolo"]["p50_ms"],
+                "midas_p50_ms": stats["midas"]["p50_ms"],
+                "post_p50_ms": stats["post"]["p50_ms"],
+                "total_p50_ms": stats["total"]["p50_ms"],
+                "total_p95_ms": stats["total"]["p95_ms"],
+                "stages": stats,
+            })
+
+    print_table(rows, ["tier", "midas", "working_size", "yolo_p50_ms", "midas_p50_ms",
+                       "post_p50_ms", "total_p50_ms", "total_p95_ms"])
+    if args.out:
+        write_json(args.out, {"benchmark": "depth_tiers", "images": len(images), "results": rows})
+
+
+if __name__ == "__main__":
+    main()
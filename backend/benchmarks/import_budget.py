@@ -0,0 +1,137 @@
+# import_budget.py
+#
+# Import-time and first-result latency report for the backend scripts.
+#
+#   python benchmarks/import_budget.py [--image photo.jpg] [--skip-run] [--out report.json]
+#
+# For every script this measures, in fresh interpreters:
+#   * import_ms      - median time to `import <script>` (nothing should run yet)
+#   * eager_imports  - heavy modules that were loaded by the import anyway
+#   * first_result_ms / total_ms - wall time from spawn to the first stdout
+#                      line and to exit, on a sample input
+# It exits non-zero when an import goes over its budget or pulls in a
+# deferred dependency, so the regression is visible in review.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from _common import BACKEND_DIR, write_json, print_table
+
+SCRIPTS = {
+    "predict": {
+        "budget_ms": 400,
+        "deferred": ["tensorflow", "onnxruntime", "torch", "cv2", "ultralytics", "google.generativeai"],
+        "argv": lambda inputs: ["predict.py", inputs["image"]],
+    },
+    "extract_product": {
+        "budget_ms": 250,
+        "deferred": ["aiohttp", "pyzbar"],
+        "argv": lambda inputs: ["extract_product.py", inputs["scan_json"]],
+    },
+    "food_lookup": {
+        "budget_ms": 100,
+        "deferred": ["aiohttp", "requests", "urllib3"],
+        "argv": lambda inputs: ["food_lookup.py", inputs["lookup_json"]],
+    },
+}
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_ms": elapsed * 1000, "eager": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, deferred, repeats):
+    timings, eager = [], set()
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module, deferred=deferred)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(probe["import_ms"])
+        eager.update(probe["eager"])
+    return round(statistics.median(timings), 1), sorted(eager)
+
+
+def measure_run(argv, timeout):
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable] + argv, cwd=BACKEND_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    first_line = proc.stdout.readline()
+    first_ms = (time.perf_counter() - start) * 1000
+    try:
+        proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+    total_ms = (time.perf_counter() - start) * 1000
+    return {
+        "first_result_ms": round(first_ms, 1) if first_line else None,
+        "total_ms": round(total_ms, 1),
+        "first_result": first_line.strip()[:120],
+    }
+
+
+def build_inputs(tmp_dir, image):
+    if not image:
+        from PIL import Image
+        image = os.path.join(tmp_dir, "sample.jpg")
+        Image.new("RGB", (1280, 960), (180, 120, 60)).save(image, quality=90)
+    scan_json = os.path.join(tmp_dir, "scan.json")
+    with open(scan_json, "w") as f:
+        json.dump({"image_path": os.path.abspath(image), "conditions": {}, "restrictions": {}}, f)
+    lookup_json = os.path.join(tmp_dir, "lookup.json")
+    with open(lookup_json, "w") as f:
+        json.dump({"input_name": "oreo", "conditions": {}, "restrictions": {}}, f)
+    return {"image": os.path.abspath(image), "scan_json": scan_json, "lookup_json": lookup_json}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and first-result latency budget")
+    parser.add_argument("--image", help="Sample photo for predict/extract_product (default: synthetic)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-run", action="store_true", help="Only measure imports")
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--out", help="Also save the report as JSON")
+    args = parser.parse_args()
+
+    rows, over_budget = [], False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputs = build_inputs(tmp_dir, args.image)
+        for name, spec in SCRIPTS.items():
+            import_ms, eager = measure_import(name, spec["deferred"], args.repeats)
+            ok = import_ms <= spec["budget_ms"] and not eager
+            over_budget = over_budget or not ok
+            row = {
+                "script": name,
+                "import_ms": import_ms,
+                "budget_ms": spec["budget_ms"],
+                "eager_imports": ",".join(eager) or "-",
+                "ok": "yes" if ok else "NO",
+            }
+            if not args.skip_run:
+                row.update(measure_run(spec["argv"](inputs), args.timeout))
+            rows.append(row)
+
+    columns = ["script", "import_ms", "budget_ms", "eager_imports", "ok"]
+    if not args.skip_run:
+        columns += ["first_result_ms", "total_ms"]
+    print_table(rows, columns)
+    if args.out:
+        write_json(args.out, {"benchmark": "import_budget", "results": rows})
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# ranking_scale.py
+#
+# Ranking cost at growing candidate counts: the BM25 index in ranking.py
+# vs the per-product Jaccard + prefix loop food_lookup.py used before.
+#
+#   python benchmarks/ranking_scale.py [--sizes 20,10000,1000000] [--queries 20] [--out ranking.json]
+#
+# Candidate names are synthetic product names drawn from a fixed vocabulary
+# (seeded, so runs are comparable). For the index, build time is reported
+# separately from per-query time: a search page builds and queries once, a
+# cached catalog builds once and answers many queries.
+
+import re
+import time
+import random
+import argparse
+
+from _common import summarize_latencies, write_json, print_table
+from ranking import RankingIndex
+
+BRANDS = ["Lay's", "Pringles", "Coca-Cola", "Pepsi", "Fage", "Danone", "Kellogg's", "Nestle", "Ferrero", "Heinz",
+          "Oreo", "Milka", "Lindt", "Barilla", "Tesco", "Carrefour", "Walkers", "Doritos", "Yoplait", "Alpro"]
+WORDS = ["original", "classic", "zero", "sugar", "light", "greek", "yogurt", "chips", "salted", "cheese", "onion",
+         "chocolate", "milk", "dark", "hazelnut", "spread", "cola", "orange", "juice", "pasta", "tomato", "sauce",
+         "cereal", "corn", "flakes", "oat", "almond", "drink", "vanilla", "strawberry", "crisps", "sea", "salt",
+         "vinegar", "protein", "bar", "organic", "whole", "wheat", "biscuits", "cookies", "cream", "butter", "peanut"]
+
+
+def legacy_similarity(input_name, product_name):
+    """The removed food_lookup.calculate_similarity_score, kept here as the baseline"""
+    if not product_name:
+        return 0.0
+    input_lower = input_name.lower()
+    product_lower = product_name.lower()
+    input_words = set(re.findall(r'\w+', input_lower))
+    product_words = set(re.findall(r'\w+', product_lower))
+    stop_words = {"the", "a", "an", "of", "in", "with", "product", "food", "brand", "pack", "item"}
+    filtered_input_words = input_words - stop_words
+    if not filtered_input_words:
+        return 0.0
+    common_words = filtered_input_words.intersection(product_words)
+    union_words = filtered_input_words.union(product_words)
+    jaccard_score = len(common_words) / len(union_words) if union_words else 0.0
+    prefix_bonus = 0.1 if product_lower.startswith(input_lower) else 0.0
+    return jaccard_score + prefix_bonus
+
+
+def synthetic_names(count, rng):
+    return [f"{rng.choice(BRANDS)} {' '.join(rng.sample(WORDS, rng.randint(1, 4)))}" for _ in range(count)]
+
+
+def synthetic_queries(count, rng):
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(count)]
+
+
+def run_size(size, queries, legacy_max):
+    rng = random.Random(size)
+    names = synthetic_names(size, rng)
+
+    start = time.perf_counter()
+    index = RankingIndex(names)
+    build_s = time.perf_counter() - start
+
+    index_latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        index.top_k(q, 20)
+        index_latencies.append(time.perf_counter() - start)
+
+    row = {
+        "candidates": size,
+        "index_build_ms": round(build_s * 1000, 2),
+        "index": summarize_latencies(index_latencies),
+    }
+    if size <= legacy_max:
+        legacy_latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            sorted(((legacy_similarity(q, n), i) for i, n in enumerate(names)), reverse=True)[:20]
+            legacy_latencies.append(time.perf_counter() - start)
+        row["legacy"] = summarize_latencies(legacy_latencies)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranking cost: BM25 index vs per-product Jaccard loop")
+    parser.add_argument("--sizes", default="20,10000,1000000")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=1000000,
+                        help="Skip the legacy loop above this many candidates")
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries, random.Random(0))
+    results = [run_size(int(s), queries, args.legacy_max) for s in args.sizes.split(",")]
+
+    rows = []
+    for r in results:
+        legacy = r.get("legacy", {})
+        rows.append({
+            "candidates": r["candidates"],
+            "index build ms": r["index_build_ms"],
+            "index query p50 ms": r["index"]["p50_ms"],
+            "index query p95 ms": r["index"]["p95_ms"],
+            "build + 1 query ms": round(r["index_build_ms"] + r["index"]["p50_ms"], 2),
+            "legacy p50 ms": legacy.get("p50_ms", "skipped"),
+            "legacy p95 ms": legacy.get("p95_ms", "skipped"),
+        })
+    print_table(rows, list(rows[0].keys()))
+    if args.out:
+        write_json(args.out, {"queries": args.queries, "results": results})
+
+
+if __name__ == "__main__":
+    main()
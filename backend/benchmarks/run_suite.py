@@ -0,0 +1,543 @@
+# run_suite.py
+#
+# Offline latency / throughput / memory benchmark for every Python pipeline
+# stage behind predict.py, recipe_gernate.py, extract_product.py and
+# food_lookup.py.
+#
+#   python benchmarks/run_suite.py [--stages preprocess,risk] [--repeats 20] [--images photos/] [--out suite.json]
+#   python benchmarks/run_suite.py --compare before.json after.json [--threshold 1.2]
+#
+# Inputs are generated (seeded, so runs are comparable) or bundled:
+#   * synthetic food photos at web and phone-camera sizes, plus any --images;
+#   * rendered EAN-13 barcodes and product-name labels for the scanner;
+#   * fixtures/off_sample.jsonl ingested into a throwaway OFF mirror, so every
+#     OFF lookup (search, barcode, category) is answered locally. Gemini is
+#     never called.
+#
+# Each stage runs in a fresh interpreter: one untimed warm-up, then every
+# input --repeats times. The report gives p50/p95/p99 per call, throughput
+# (calls per second of busy time), set-up time (imports and model loading)
+# and the stage process's peak RSS. Stages whose model files, packages or
+# binaries are missing are reported as skipped, with the reason.
+#
+# --compare prints the p50/p95/p99 and peak RSS change per stage between two
+# saved reports, and exits non-zero when a p50 grew by more than --threshold.
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from _common import BACKEND_DIR, summarize_latencies, write_json, print_table
+from image_files import collect_images
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+OFF_FIXTURE = os.path.join(FIXTURES_DIR, "off_sample.jsonl")
+
+# (width, height) of the synthetic photos: web upload, phone camera (4:3 and 16:9)
+PHOTO_SIZES = [(800, 600), (1600, 1200), (3024, 4032), (1920, 1080)]
+ALL_CONDITIONS = {"Hypertension": True, "Diabetes": True, "High Cholesterol": True, "Obesity": True}
+ALL_RESTRICTIONS = {"Lactose Free": True, "Vegan": True, "Gluten Free": True, "Nut Free": True}
+
+# Settings that change what a stage measures; recorded with every report
+REPORTED_ENV = ("CLASSIFIER_BACKEND", "YOLO_BACKEND", "YOLO_IMGSZ", "DEPTH_TIER", "DEPTH_WORKING_SIZE", "OCR_PSM")
+
+
+class StageSkipped(Exception):
+    """Raised by a stage set-up when this machine cannot run the stage"""
+
+
+# ----------------------------------------------------------------------
+# INPUTS
+# ----------------------------------------------------------------------
+
+def synthetic_photo(size: Tuple[int, int], rng: np.random.Generator) -> Image.Image:
+    """Plate-on-table photo: textured background, light disc, noisy food blob"""
+    w, h = size
+    Y, X = np.ogrid[:h, :w]
+    img = np.empty((h, w, 3), dtype=np.float32)
+    img[:] = rng.uniform(60, 140, 3)
+    img += rng.normal(0, 8, (h, w, 1))
+    r = min(w, h) * 0.42
+    cx, cy = w / 2 + rng.uniform(-0.05, 0.05) * w, h / 2 + rng.uniform(-0.05, 0.05) * h
+    plate = (X - cx) ** 2 + (Y - cy) ** 2 <= r ** 2
+    img[plate] = 235
+    food = (X - cx) ** 2 / (0.6 * r) ** 2 + (Y - cy) ** 2 / (0.45 * r) ** 2 <= 1
+    img[food] = rng.uniform(90, 210, 3) + rng.normal(0, 25, (int(food.sum()), 3))
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+
+
+_EAN_L = ["0001101", "0011001", "0010011", "0111101", "0100011", "0110001", "0101111", "0111011", "0110111", "0001011"]
+_EAN_R = ["".join("1" if b == "0" else "0" for b in code) for code in _EAN_L]
+_EAN_G = [code[::-1] for code in _EAN_R]
+_EAN_PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG", "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def ean13_checksum(first12: str) -> str:
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def ean13_image(code: str, module_px: int = 3, height: int = 160) -> Image.Image:
+    """Black-on-white EAN-13 symbol (check digit recomputed) with quiet zones"""
+    digits = code[:12].rjust(12, "0")
+    digits += ean13_checksum(digits)
+    parity = _EAN_PARITY[int(digits[0])]
+    bits = "101"
+    for d, p in zip(digits[1:7], parity):
+        bits += (_EAN_L if p == "L" else _EAN_G)[int(d)]
+    bits += "01010" + "".join(_EAN_R[int(d)] for d in digits[7:]) + "101"
+    row = np.array([0 if b == "1" else 255 for b in "0" * 11 + bits + "0" * 11], dtype=np.uint8)
+    strip = np.repeat(np.tile(row, (height, 1)), module_px, axis=1)
+    canvas = np.full((height + 160, strip.shape[1] + 160), 255, dtype=np.uint8)
+    canvas[80:80 + height, 80:80 + strip.shape[1]] = strip
+    return Image.fromarray(canvas).convert("RGB")
+
+
+def label_image(text: str, rng: np.random.Generator, size: Tuple[int, int] = (1000, 750)) -> Image.Image:
+    """Package-front photo: coloured background with the product name printed on it"""
+    img = Image.new("RGB", size, tuple(int(c) for c in rng.integers(120, 255, 3)))
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.load_default(size=56)
+    except TypeError:
+        font = ImageFont.load_default()
+    draw.multiline_text((60, size[1] // 3), text.replace(" ", "\n", 1), fill=(10, 10, 10), font=font, spacing=12)
+    return img
+
+
+def prepare_inputs(workdir: str, extra_images: List[str], seed: int) -> Dict:
+    """Write photos, barcodes, labels and the OFF mirror into workdir; returns the manifest"""
+    from off_mirror import ingest
+
+    rng = np.random.default_rng(seed)
+    products = [json.loads(line) for line in open(OFF_FIXTURE) if line.strip()]
+
+    photos = []
+    for size in PHOTO_SIZES:
+        path = os.path.join(workdir, f"photo_{size[0]}x{size[1]}.jpg")
+        synthetic_photo(size, rng).save(path, quality=90)
+        photos.append(path)
+    photos.extend(os.path.abspath(p) for p in collect_images(extra_images))
+
+    barcodes, labels = [], []
+    for i, product in enumerate(products[:8]):
+        path = os.path.join(workdir, f"barcode_{i}.png")
+        ean13_image(str(product["code"])).save(path)
+        barcodes.append(path)
+        path = os.path.join(workdir, f"label_{i}.jpg")
+        label_image(product["product_name"], rng).save(path, quality=90)
+        labels.append(path)
+
+    mirror_path = os.path.join(workdir, "off_mirror.sqlite3")
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest(OFF_FIXTURE, mirror_path)
+
+    queries = list(dict.fromkeys(" ".join(p["product_name"].split()[:2]) for p in products if p.get("product_name")))
+    manifest = {"workdir": workdir, "photos": photos, "barcodes": barcodes, "labels": labels,
+                "queries": queries, "seed": seed}
+    with open(os.path.join(workdir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def stage_env(workdir: str) -> Dict[str, str]:
+    """Environment for stage processes: local OFF mirror, caches inside workdir, no Gemini"""
+    return dict(
+        os.environ,
+        OFF_BACKEND="local",
+        OFF_MIRROR_PATH=os.path.join(workdir, "off_mirror.sqlite3"),
+        OFF_CACHE="0",
+        ALT_INDEX_PATH=os.path.join(workdir, "alternatives_index.sqlite3"),
+        ALT_INDEX_REVALIDATE="0",
+        BARCODE_STORE_PATH=os.path.join(workdir, "barcode_store.sqlite3"),
+        BARCODE_STORE_REVALIDATE="0",
+        NUTRITION_MATRIX_PATH=os.path.join(workdir, "nutrition_matrix.npz"),
+        GEMINI_API_KEY="",
+        WEIGHT_ESTIMATOR="local",
+        TF_CPP_MIN_LOG_LEVEL="3",
+    )
+
+
+# ----------------------------------------------------------------------
+# STAGES
+# ----------------------------------------------------------------------
+# Each set-up gets the manifest and returns (inputs, run); run(input) is
+# the timed call. Set-up time (imports, model loads) is reported apart.
+
+def _load_photos(manifest):
+    return [Image.open(p).convert("RGB") for p in manifest["photos"]]
+
+
+def setup_preprocess(manifest):
+    from image_ingest import ingest_image
+
+    def run(path):
+        ingested = ingest_image(path)
+        ingested.classifier_tensor()
+        ingested.depth_image()
+    return manifest["photos"], run
+
+
+def setup_classification(manifest):
+    from classifier_backends import CLASSIFIER_BACKEND, load_classifier
+    from image_ingest import ingest_image
+    try:
+        model = load_classifier(CLASSIFIER_BACKEND)
+    except Exception as e:
+        raise StageSkipped(f"{CLASSIFIER_BACKEND} classifier unavailable: {str(e)}")
+    tensors = [ingest_image(p).classifier_tensor() for p in manifest["photos"]]
+    return tensors, model.predict
+
+
+def _working_images(manifest):
+    import depth_pipeline
+    images = []
+    for img in _load_photos(manifest):
+        size = depth_pipeline.working_size(*img.size)
+        images.append(img.resize(size) if size != img.size else img)
+    return images
+
+
+def setup_yolo(manifest):
+    from yolo_backends import YOLO_MODELS, load_yolo
+    try:
+        model = load_yolo(*YOLO_MODELS["segment"])
+    except Exception as e:
+        raise StageSkipped(f"YOLO segmentation model unavailable: {str(e)}")
+    return _working_images(manifest), lambda img: model(img, verbose=False)
+
+
+def setup_midas(manifest):
+    import depth_pipeline
+    try:
+        _, midas, transforms, device = depth_pipeline.load_depth_models()
+    except Exception as e:
+        raise StageSkipped(f"MiDaS unavailable: {str(e)}")
+    images = [(np.asarray(img), img.size) for img in _working_images(manifest)]
+    return images, lambda item: depth_pipeline.run_midas(midas, transforms, device, *item)
+
+
+def setup_height_map(manifest):
+    """Post-processing after MiDaS, on synthetic relative depth (dome over a tilted table)"""
+    import depth_pipeline
+    import volume_estimator
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        raise StageSkipped("opencv-python not installed")
+
+    rng = np.random.default_rng(manifest["seed"])
+    items = []
+    for path in manifest["photos"]:
+        with Image.open(path) as img:
+            w, h = depth_pipeline.working_size(*img.size)
+        Y, X = np.mgrid[:h, :w].astype(np.float32)
+        dome = np.exp(-(((X - w / 2) / (0.25 * w)) ** 2 + ((Y - h / 2) / (0.2 * h)) ** 2))
+        depth = 0.3 * Y / h + 0.6 * dome + rng.normal(0, 0.01, (h, w)).astype(np.float32)
+        depth = (depth - depth.min()) / (depth.max() - depth.min())
+        items.append((depth.astype(np.float32), depth_pipeline.fallback_mask((w, h))))
+
+    def run(item):
+        depth, mask = item
+        height_map = depth_pipeline.height_map_from_depth(depth, mask)
+        depth_pipeline.colorize(height_map)
+        volume_estimator.estimate_weight("Pizza", height_map, mask)
+    return items, run
+
+
+def setup_nutrition(manifest):
+    """Macros for a batch of (dish, estimated grams) pairs from the compiled nutrition matrix"""
+    from nutrition_matrix import get_nutrition_matrix
+    from predict import CLASS_LABELS
+    matrix = get_nutrition_matrix(CLASS_LABELS)
+    rng = np.random.default_rng(manifest["seed"])
+    batches = [(rng.integers(0, len(matrix), 64), rng.uniform(50, 800, 64)) for _ in range(8)]
+    return batches, lambda batch: matrix.macros(*batch)
+
+
+def setup_ingredients(manifest):
+    from recipe_gernate import MODEL_PATH, IngredientDetector
+    try:
+        detector = IngredientDetector(MODEL_PATH)
+    except Exception as e:
+        raise StageSkipped(f"Ingredient YOLO model unavailable: {str(e)}")
+    return manifest["photos"], detector.detect_with_dimensions
+
+
+def setup_ocr_preprocess(manifest):
+    from scan_ocr import preprocess_for_ocr
+    images = [Image.open(p).convert("RGB") for p in manifest["labels"]]
+    return images, preprocess_for_ocr
+
+
+def setup_ocr(manifest):
+    from scan_ocr import OCR_CONFIG, extract_text
+    if shutil.which(OCR_CONFIG["TESSERACT_CMD"]) is None:
+        raise StageSkipped(f"{OCR_CONFIG['TESSERACT_CMD']} not found")
+    loop = asyncio.new_event_loop()
+    images = [Image.open(p).convert("RGB") for p in manifest["labels"]]
+    return images, lambda img: loop.run_until_complete(extract_text(img))
+
+
+def setup_barcode(manifest):
+    try:
+        import pyzbar.pyzbar  # noqa: F401
+    except Exception as e:
+        raise StageSkipped(f"pyzbar unavailable: {str(e)}")
+    from extract_product import decode_barcode
+    images = [Image.open(p).convert("RGB") for p in manifest["barcodes"]]
+    images += _load_photos(manifest)  # photos without a barcode: the full-scan miss path
+    return images, decode_barcode
+
+
+def _search_pages(manifest):
+    from off_mirror import get_mirror
+    return [(q, get_mirror().search(q, 20)) for q in manifest["queries"]]
+
+
+def setup_ranking(manifest):
+    from ranking import score_candidates
+    pages = [(q, [p.get("product_name") for p in products]) for q, products in _search_pages(manifest)]
+    return pages, lambda page: score_candidates(*page)
+
+
+def setup_risk(manifest):
+    from product_record import as_records
+    from risk_rules import evaluate
+    pages = [as_records(products) for _, products in _search_pages(manifest)]
+    return pages, lambda records: evaluate(records, ALL_CONDITIONS, ALL_RESTRICTIONS, calorie_limit=300)
+
+
+def setup_lookup(manifest):
+    """food_lookup.py end to end (mirror search, records, risk, ranking, JSON output)"""
+    import food_lookup
+    inputs = []
+    for i, query in enumerate(manifest["queries"]):
+        path = os.path.join(manifest["workdir"], f"lookup_{i}.json")
+        with open(path, "w") as f:
+            json.dump({"input_name": query, "conditions": ALL_CONDITIONS, "restrictions": ALL_RESTRICTIONS}, f)
+        inputs.append(path)
+
+    def run(path):
+        sys.argv = ["food_lookup.py", path]
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            food_lookup.main()
+    return inputs, run
+
+
+def setup_scan(manifest):
+    """extract_product.scan after identification: risk, alternatives index, scoring"""
+    import extract_product
+    from off_mirror import get_mirror
+
+    products = [p for p in (get_mirror().by_barcode(c) for c in _fixture_codes()) if p and p.get("categories_tags")]
+    current = {}
+
+    async def identified(client, img):
+        return current["product"], "barcode"
+    extract_product.identify_product = identified
+
+    loop = asyncio.new_event_loop()
+    request = {"image_path": manifest["photos"][0], "conditions": ALL_CONDITIONS, "restrictions": ALL_RESTRICTIONS}
+
+    def run(product):
+        current["product"] = product
+        loop.run_until_complete(extract_product.scan(request, lambda event: None))
+    return products, run
+
+
+def _fixture_codes():
+    products = (json.loads(line) for line in open(OFF_FIXTURE) if line.strip())
+    return [p["code"] for p in products if p.get("code")]
+
+
+# name -> (script whose stage it is, set-up)
+STAGES: Dict[str, Tuple[str, Callable]] = {
+    "preprocess": ("predict.py", setup_preprocess),
+    "classification": ("predict.py", setup_classification),
+    "yolo": ("predict.py", setup_yolo),
+    "midas": ("predict.py", setup_midas),
+    "height_map": ("predict.py", setup_height_map),
+    "nutrition": ("predict.py", setup_nutrition),
+    "ingredients": ("recipe_gernate.py", setup_ingredients),
+    "ocr_preprocess": ("extract_product.py", setup_ocr_preprocess),
+    "ocr": ("extract_product.py", setup_ocr),
+    "barcode": ("extract_product.py", setup_barcode),
+    "scan": ("extract_product.py", setup_scan),
+    "ranking": ("food_lookup.py", setup_ranking),
+    "risk": ("food_lookup.py", setup_risk),
+    "lookup": ("food_lookup.py", setup_lookup),
+}
+
+
+# ----------------------------------------------------------------------
+# RUNNER
+# ----------------------------------------------------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)"""
+    # Linux carries ru_maxrss over exec(), so a stage process would report the
+    # suite's own peak; VmHWM belongs to this process image only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def run_stage(name: str, workdir: str, repeats: int) -> Dict:
+    """Body of a stage process: set up, warm up, time every input `repeats` times"""
+    with open(os.path.join(workdir, "manifest.json")) as f:
+        manifest = json.load(f)
+    script, setup = STAGES[name]
+    result = {"stage": name, "script": script}
+
+    start = time.perf_counter()
+    try:
+        inputs, run = setup(manifest)
+    except StageSkipped as e:
+        return {**result, "status": "skipped", "reason": str(e)}
+    result["setup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if not inputs:
+        return {**result, "status": "skipped", "reason": "no inputs"}
+
+    run(inputs[0])
+    latencies = []
+    for _ in range(repeats):
+        for item in inputs:
+            t0 = time.perf_counter()
+            run(item)
+            latencies.append(time.perf_counter() - t0)
+
+    busy_s = sum(latencies)
+    return {
+        **result,
+        "status": "ok",
+        "inputs": len(inputs),
+        **summarize_latencies(latencies),
+        "throughput_per_s": round(len(latencies) / busy_s, 2) if busy_s > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def spawn_stage(name: str, workdir: str, repeats: int, timeout: float) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, "--workdir", workdir, "--repeats", str(repeats)],
+        cwd=BACKEND_DIR, env=stage_env(workdir),
+        capture_output=True, text=True, timeout=timeout,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        errors = proc.stderr.strip().splitlines()
+        return {"stage": name, "script": STAGES[name][0], "status": "error",
+                "reason": errors[-1] if errors else f"exit code {proc.returncode}"}
+    return json.loads(lines[-1])
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "env": {key: os.environ[key] for key in REPORTED_ENV if key in os.environ},
+    }
+
+
+def compare(before_path: str, after_path: str, threshold: float) -> bool:
+    """Print per-stage changes between two reports; True when a p50 regressed past threshold"""
+    with open(before_path) as f:
+        before = {r["stage"]: r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = {r["stage"]: r for r in json.load(f)["results"]}
+
+    rows, regressed = [], False
+    for stage in [s for s in after if s in before]:
+        old, new = before[stage], after[stage]
+        if old.get("status") != "ok" or new.get("status") != "ok":
+            rows.append({"stage": stage, "status": f"{old.get('status')} -> {new.get('status')}"})
+            continue
+        row = {"stage": stage, "status": "ok"}
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            ratio = new[key] / old[key] if old[key] else None
+            row[key] = f"{old[key]} -> {new[key]}" + (f" (x{ratio:.2f})" if ratio is not None else "")
+            if key == "p50_ms" and ratio is not None and ratio > threshold:
+                regressed = True
+                row["status"] = "REGRESSED"
+        if old.get("peak_rss_mb") is not None and new.get("peak_rss_mb") is not None:
+            row["peak_rss_mb"] = f"{old['peak_rss_mb']} -> {new['peak_rss_mb']}"
+        rows.append(row)
+    print_table(rows, ["stage", "status", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"])
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of every Python pipeline stage")
+    parser.add_argument("--stages", help=f"Comma-separated subset of: {','.join(STAGES)}")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed passes over each stage's inputs")
+    parser.add_argument("--images", nargs="*", default=[], help="Extra sample photos or folders for the image stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds per stage")
+    parser.add_argument("--out", help="Also save the report as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved reports")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p50 ratio counted as a regression by --compare")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.workdir, args.repeats)))
+        return
+
+    if args.compare:
+        if compare(*args.compare, args.threshold):
+            sys.exit(1)
+        return
+
+    stages = [s.strip() for s in args.stages.split(",")] if args.stages else list(STAGES)
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_inputs(workdir, args.images, args.seed)
+        for name in stages:
+            sys.stderr.write(f"Running {name}...\n")
+            try:
+                rows.append(spawn_stage(name, workdir, args.repeats, args.timeout))
+            except subprocess.TimeoutExpired:
+                rows.append({"stage": name, "script": STAGES[name][0], "status": "error",
+                             "reason": f"timed out after {args.timeout:.0f}s"})
+
+    print_table(rows, ["stage", "script", "status", "inputs", "p50_ms", "p95_ms", "p99_ms",
+                       "throughput_per_s", "setup_ms", "peak_rss_mb", "reason"])
+    if args.out:
+        write_json(args.out, {"benchmark": "run_suite", "environment": environment(),
+                              "repeats": args.repeats, "seed": args.seed, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
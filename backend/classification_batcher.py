@@ -0,0 +1,92 @@
+# classification_batcher.py
+#
+# Micro-batching queue in front of the Food-101 classifier. Concurrent
+# callers submit single preprocessed images; a background thread collects
+# them for up to `window_ms` (or until `max_batch_size` are waiting), runs a
+# single forward pass, and hands every caller back its own row.
+
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+
+class ClassificationBatcher:
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 8, window_ms: float = 10.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.window = max(0.0, window_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._closed = False
+
+        # Stats, mostly for the benchmark report
+        self.batches_run = 0
+        self.items_run = 0
+
+        self._thread = threading.Thread(target=self._run, name="classification-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_array: np.ndarray) -> Future:
+        """Queue one image of shape (H, W, C) or (1, H, W, C); the future resolves to its prediction row"""
+        if self._closed:
+            raise RuntimeError("Batcher is closed")
+        if img_array.ndim == 4:
+            if img_array.shape[0] != 1:
+                raise ValueError("submit() takes a single image, not a batch")
+            img_array = img_array[0]
+        future = Future()
+        self._queue.put((img_array, future))
+        return future
+
+    def classify(self, img_array: np.ndarray, timeout: float = None) -> np.ndarray:
+        """Blocking helper: returns a (1, num_classes) array like model.predict on a batch of one"""
+        return self.submit(img_array).result(timeout)[np.newaxis, :]
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future]]:
+        first = self._queue.get()
+        if first is None:
+            return []
+        pending = [first]
+        deadline = time.monotonic() + self.window
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish what we have, then stop on the next loop
+                self._queue.put(None)
+                break
+            pending.append(item)
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if not pending:
+                return
+
+            batch = np.stack([img for img, _ in pending])
+            try:
+                preds = self._predict_fn(batch)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(pending)
+            for i, (_, future) in enumerate(pending):
+                future.set_result(preds[i])
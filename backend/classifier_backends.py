@@ -0,0 +1,100 @@
+# classifier_backends.py
+#
+# Interchangeable inference backends for the Food-101 MobileNetV2 classifier.
+# Every backend takes a float32 batch of shape (N, 224, 224, 3), already in
+# MobileNetV2's [-1, 1] range, and returns an (N, 101) probability array.
+#
+#   keras   mobilenetv2_food101.h5      (TensorFlow)
+#   tflite  mobilenetv2_food101.tflite  (tflite_runtime if installed, else TensorFlow)
+#   onnx    mobilenetv2_food101.onnx    (onnxruntime only, never imports TensorFlow)
+#
+# The .tflite/.onnx files are produced once by export_classifier.py.
+
+import os
+from typing import Optional
+
+import numpy as np
+
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "keras").lower()
+
+MODEL_PATHS = {
+    "keras": "mobilenetv2_food101.h5",
+    "tflite": "mobilenetv2_food101.tflite",
+    "onnx": "mobilenetv2_food101.onnx",
+}
+
+
+class KerasClassifier:
+    name = "keras"
+
+    def __init__(self, model_path: str):
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+        import tensorflow as tf
+        tf.get_logger().setLevel('ERROR')
+        self._tf = tf
+        # Inference only: skipping the old run_eagerly=True compile lets predict() run as a traced graph
+        self.model = tf.keras.models.load_model(model_path, compile=False)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._tf.device('/CPU:0'):
+            return self.model.predict(batch.astype(np.float32, copy=False), verbose=0)
+
+
+class TFLiteClassifier:
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if batch.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input['index'], list(batch.shape))
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch.shape[0]
+        self.interpreter.set_tensor(self._input['index'], batch.astype(np.float32, copy=False))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output['index']).copy()
+
+
+class OnnxClassifier:
+    name = "onnx"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+BACKENDS = {
+    "keras": KerasClassifier,
+    "tflite": TFLiteClassifier,
+    "onnx": OnnxClassifier,
+}
+
+
+def load_classifier(backend: Optional[str] = None, model_path: Optional[str] = None):
+    """Build the requested classifier backend (defaults to $CLASSIFIER_BACKEND)"""
+    backend = (backend or CLASSIFIER_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{backend}', expected one of {sorted(BACKENDS)}")
+    model_path = model_path or MODEL_PATHS[backend]
+    if not os.path.exists(model_path):
+        hint = " (run export_classifier.py export first)" if backend != "keras" else ""
+        raise FileNotFoundError(f"Classifier model not found: {model_path}{hint}")
+    return BACKENDS[backend](model_path)
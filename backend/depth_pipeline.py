@@ -0,0 +1,151 @@
+# depth_pipeline.py
+#
+# YOLO + MiDaS height-map computation used by predict.py.
+#
+# Quality tiers pick the MiDaS model (DEPTH_TIER env var):
+#   fast      MiDaS_small  (256 px input, several times faster on CPU)
+#   balanced  DPT_Hybrid   (384 px input, previous default)
+#   quality   DPT_Large    (384 px input, slowest)
+#
+# Everything after the networks (mask resizing, the fallback circle, the
+# dilation ring and the median floor) runs at a capped working resolution
+# (DEPTH_WORKING_SIZE, longest side in px) instead of the full phone-camera
+# resolution. Only the final colour map is optionally upsampled.
+#
+# The segmentation YOLO runs through yolo_backends (YOLO_BACKEND / YOLO_IMGSZ).
+
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from yolo_backends import YOLO_MODELS, load_yolo
+
+DEPTH_TIERS = {
+    "fast": {"midas": "MiDaS_small", "transform": "small_transform"},
+    "balanced": {"midas": "DPT_Hybrid", "transform": "dpt_transform"},
+    "quality": {"midas": "DPT_Large", "transform": "dpt_transform"},
+}
+
+DEPTH_CONFIG = {
+    "TIER": os.getenv("DEPTH_TIER", "balanced"),
+    "WORKING_SIZE": int(os.getenv("DEPTH_WORKING_SIZE", "640")),
+    "SAVE_FULL_RES": os.getenv("DEPTH_SAVE_FULL_RES", "0") == "1",
+    "RING_KERNEL": 10,  # px at working resolution
+    "IGNORED_CLASSES": (0, 60, 61),  # COCO person, dining table, toilet
+}
+
+
+def load_depth_models(tier: Optional[str] = None):
+    """Load YOLO and the MiDaS model for a tier; returns (yolo, midas, transform, device)"""
+    import torch
+
+    tier = tier or DEPTH_CONFIG["TIER"]
+    if tier not in DEPTH_TIERS:
+        raise ValueError(f"Unknown depth tier '{tier}', expected one of {sorted(DEPTH_TIERS)}")
+    spec = DEPTH_TIERS[tier]
+
+    yolo_model = load_yolo(*YOLO_MODELS["segment"])
+    midas = torch.hub.load("intel-isl/MiDaS", spec["midas"])
+    device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+    midas.to(device)
+    midas.eval()
+    midas_transforms = getattr(torch.hub.load("intel-isl/MiDaS", "transforms"), spec["transform"])
+    return yolo_model, midas, midas_transforms, device
+
+
+def working_size(width: int, height: int, max_side: Optional[int] = None) -> Tuple[int, int]:
+    """(w, h) scaled so the longest side is at most max_side, never upscaled"""
+    max_side = max_side or DEPTH_CONFIG["WORKING_SIZE"]
+    scale = min(1.0, max_side / float(max(width, height)))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def food_mask(yolo_result, size: Tuple[int, int]) -> np.ndarray:
+    """Union of YOLO instance masks (minus people/tables) at `size`, as float32 0/1"""
+    import cv2
+
+    w, h = size
+    target_mask = np.zeros((h, w), dtype=np.float32)
+    if yolo_result.masks is None:
+        return target_mask
+
+    classes = yolo_result.boxes.data[:, 5].cpu().numpy().astype(int)
+    masks = yolo_result.masks.data.cpu().numpy()
+    for i, class_id in enumerate(classes):
+        if class_id in DEPTH_CONFIG["IGNORED_CLASSES"]:
+            continue
+        mask_resized = cv2.resize(masks[i], (w, h), interpolation=cv2.INTER_LINEAR)
+        np.maximum(target_mask, mask_resized, out=target_mask)
+    return target_mask
+
+
+def fallback_mask(size: Tuple[int, int]) -> np.ndarray:
+    """Centred disc covering a third of the short side, used when YOLO finds no food"""
+    w, h = size
+    center_x, center_y = w // 2, h // 2
+    radius = min(w, h) // 3
+    Y, X = np.ogrid[:h, :w]
+    inside = (X - center_x) ** 2 + (Y - center_y) ** 2 <= radius ** 2
+    return inside.astype(np.float32)
+
+
+def run_midas(midas, midas_transforms, device, img_np: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Relative inverse depth resized to `size`, normalised to [0, 1]"""
+    import torch
+
+    w, h = size
+    input_batch = midas_transforms(img_np).to(device)
+    with torch.no_grad():
+        prediction = midas(input_batch)
+        prediction = torch.nn.functional.interpolate(
+            prediction.unsqueeze(1), size=(h, w), mode="bicubic", align_corners=False
+        ).squeeze()
+
+    depth_map = prediction.cpu().numpy().astype(np.float32)
+    d_min, d_max = depth_map.min(), depth_map.max()
+    if d_max - d_min > 0:
+        depth_map = (depth_map - d_min) / (d_max - d_min)
+    return depth_map
+
+
+def height_map_from_depth(depth_norm: np.ndarray, target_mask: np.ndarray) -> np.ndarray:
+    """Food height above the plate: masked depth minus the median of a ring around the mask"""
+    import cv2
+
+    kernel = np.ones((DEPTH_CONFIG["RING_KERNEL"],) * 2, np.uint8)
+    mask_u8 = (target_mask > 0.5).astype(np.uint8)
+    ring = cv2.dilate(mask_u8, kernel, iterations=1) > mask_u8
+    floor = float(np.median(depth_norm[ring])) if ring.any() else 0.0
+
+    height_map = depth_norm * target_mask - floor
+    np.maximum(height_map, 0, out=height_map)
+    return height_map
+
+
+def colorize(height_map: np.ndarray, out_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """JET colour map of the height map, upsampled to out_size only if asked"""
+    import cv2
+
+    peak = float(height_map.max()) or 1.0
+    res_image = (height_map / peak * 255).astype(np.uint8)
+    colored = cv2.applyColorMap(res_image, cv2.COLORMAP_JET)
+    if out_size and out_size != (colored.shape[1], colored.shape[0]):
+        colored = cv2.resize(colored, out_size, interpolation=cv2.INTER_LINEAR)
+    return colored
+
+
+def compute_height_map(models, pil_image, max_side: Optional[int] = None):
+    """Full YOLO + MiDaS + post-processing pass; returns (height_map, target_mask) at working resolution"""
+    yolo_model, midas, midas_transforms, device = models
+    size = working_size(*pil_image.size, max_side=max_side)
+    work_image = pil_image if size == pil_image.size else pil_image.resize(size)
+    img_np = np.asarray(work_image)
+
+    results = yolo_model(work_image, verbose=False)
+    target_mask = food_mask(results[0], size)
+    if not target_mask.any():
+        target_mask = fallback_mask(size)
+
+    depth_norm = run_midas(midas, midas_transforms, device, img_np, size)
+    return height_map_from_depth(depth_norm, target_mask), target_mask
@@ -0,0 +1,192 @@
+# disk_cache.py
+#
+# Small persistent key/value cache on SQLite, shared by the Python scripts.
+# Several short-lived processes (one per request) and long-lived workers can
+# use the same file at once: SQLite's WAL mode handles the locking.
+#
+# Each cache is a namespace inside the file with its own size cap. Entries
+# are evicted least-recently-used first once the namespace goes over its
+# cap (put() returns the evicted keys, for caches with companion tables),
+# and hit/miss counters persist across processes. Readers can pass a
+# max_age to treat older entries as missing (TTL caches).
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, name)
+);
+"""
+
+
+def open_database(path: str) -> sqlite3.Connection:
+    """Open (and create) a cache database usable from several threads"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class DiskCache:
+    def __init__(self, path: str, namespace: str, max_bytes: int):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self._conn = open_database(path)
+        self._lock = threading.Lock()
+        self._conn.execute("INSERT OR IGNORE INTO stats (namespace) VALUES (?)", (namespace,))
+
+    # --- raw bytes ---
+
+    def get(self, key: str, track: bool = True, max_age: Optional[float] = None) -> Optional[bytes]:
+        """Value for key (refreshing its LRU position); track=False skips the hit/miss counters.
+
+        Entries older than max_age seconds are deleted and reported as missing.
+        """
+        entry = self.get_entry(key, track, max_age)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str, track: bool = True, max_age: Optional[float] = None) -> Optional[Tuple[bytes, float]]:
+        """Like get(), but returns (value, age in seconds)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is not None and max_age is not None and now - row[1] > max_age:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                row = None
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+            if track:
+                self._count("hits" if row is not None else "misses")
+            return (row[0], now - row[1]) if row is not None else None
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone() is not None
+
+    def record_lookup(self, hit: bool):
+        """Count a logical lookup made of several get(track=False)/contains() calls"""
+        with self._lock:
+            self._count("hits" if hit else "misses")
+
+    def bump(self, name: str, amount: int = 1):
+        """Increment a cache-specific counter (reported by stats())"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO counters (namespace, name, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value",
+                (self.namespace, name, amount),
+            )
+
+    def put(self, key: str, value: bytes) -> List[str]:
+        """Store value under key; returns the keys evicted to stay under max_bytes"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, sqlite3.Binary(value), len(value), now, now),
+            )
+            return self._evict()
+
+    def execute(self, sql: str, params=()) -> list:
+        """Run extra SQL on the cache's connection (for companion tables), returning all rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    # --- JSON helpers ---
+
+    def get_json(self, key: str, track: bool = True, max_age: Optional[float] = None) -> Any:
+        raw = self.get(key, track, max_age)
+        return json.loads(raw) if raw is not None else None
+
+    def put_json(self, key: str, value: Any) -> List[str]:
+        return self.put(key, json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    # --- bookkeeping ---
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses, evictions = self._conn.execute(
+                "SELECT hits, misses, evictions FROM stats WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+            counters = dict(self._conn.execute(
+                "SELECT name, value FROM counters WHERE namespace = ? ORDER BY name", (self.namespace,)
+            ).fetchall())
+        lookups = hits + misses
+        return {
+            "namespace": self.namespace,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            **counters,
+        }
+
+    def _count(self, column: str, amount: int = 1):
+        self._conn.execute(f"UPDATE stats SET {column} = {column} + ? WHERE namespace = ?", (amount, self.namespace))
+
+    def _evict(self) -> List[str]:
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return []
+
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed ASC", (self.namespace,)
+        ):
+            victims.append((self.namespace, key))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+        self._count("evictions", len(victims))
+        return [key for _, key in victims]
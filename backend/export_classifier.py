@@ -0,0 +1,106 @@
+# export_classifier.py
+#
+# One-time export of mobilenetv2_food101.h5 to the faster CPU backends, plus
+# a parity check that the exported models agree with Keras on top-1.
+#
+#   python export_classifier.py export [--formats tflite,onnx]
+#   python export_classifier.py check <image or folder> [...] [--backends tflite,onnx]
+#
+# Export needs TensorFlow (and tf2onnx for ONNX); serving the exported files
+# does not. Pick the backend at runtime with CLASSIFIER_BACKEND=keras|tflite|onnx.
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+from classifier_backends import MODEL_PATHS, load_classifier
+from image_files import collect_images
+from image_ingest import ingest_image
+
+
+def export_tflite(model, out_path: str):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, out_path: str):
+    import tensorflow as tf
+    import tf2onnx
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=out_path)
+
+
+def export(formats: List[str]):
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    import tensorflow as tf
+    model = tf.keras.models.load_model(MODEL_PATHS["keras"], compile=False)
+
+    exporters = {"tflite": export_tflite, "onnx": export_onnx}
+    for fmt in formats:
+        if fmt not in exporters:
+            raise ValueError(f"Cannot export to '{fmt}', expected one of {sorted(exporters)}")
+        out_path = MODEL_PATHS[fmt]
+        exporters[fmt](model, out_path)
+        sys.stderr.write(f"Exported {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)\n")
+
+
+def load_sample(image_path: str) -> np.ndarray:
+    """Same preprocessing as predict.preprocess_image, without its batch axis"""
+    return ingest_image(image_path).classifier_tensor()[0]
+
+
+def parity_report(images: List[str], backends: List[str]) -> Dict:
+    """Top-1 agreement and largest probability difference of each backend against Keras"""
+    batch = np.stack([load_sample(p) for p in images])
+
+    reference = load_classifier("keras").predict(batch)
+    ref_top1 = np.argmax(reference, axis=1)
+
+    report = {"samples": len(images), "backends": {}}
+    for backend in backends:
+        preds = load_classifier(backend).predict(batch)
+        top1 = np.argmax(preds, axis=1)
+        report["backends"][backend] = {
+            "top1_agreement": round(float(np.mean(top1 == ref_top1)), 4),
+            "max_abs_prob_diff": round(float(np.max(np.abs(preds - reference))), 6),
+            "mismatched_images": [images[i] for i in np.flatnonzero(top1 != ref_top1)],
+        }
+    return report
+
+
+def check(paths: List[str], backends: List[str]) -> bool:
+    images = collect_images(paths)
+    if not images:
+        raise ValueError("No sample images found")
+
+    report = parity_report(images, backends)
+    print(json.dumps(report, indent=2))
+    return all(not r["mismatched_images"] for r in report["backends"].values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and parity-check the Food-101 classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Write .tflite/.onnx copies of the Keras model")
+    p_export.add_argument("--formats", default="tflite,onnx")
+
+    p_check = sub.add_parser("check", help="Compare top-1 predictions against Keras")
+    p_check.add_argument("paths", nargs="+", help="Sample images or folders of images")
+    p_check.add_argument("--backends", default="tflite,onnx")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.formats.split(","))
+    elif not check(args.paths, args.backends.split(",")):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# export_yolo.py
+#
+# One-time export of the YOLO checkpoints to CPU inference engines, plus a
+# parity and latency check against the .pt models on the same images.
+#
+#   python export_yolo.py export [--models ingredient,segment] [--formats onnx,openvino] [--imgsz 480]
+#   python export_yolo.py check <image or folder> [...] [--backends onnx,openvino] [--imgsz 480]
+#
+# Export needs the ultralytics exporters (onnx, openvino); serving the
+# exported files only needs onnxruntime / openvino. Pick the engine at
+# runtime with YOLO_BACKEND=pt|onnx|openvino (and the same YOLO_IMGSZ).
+#
+# check matches every .pt detection to the same-class exported detection
+# with the highest IoU, and reports the matched fraction, mean IoU and
+# per-image latency of both engines. It exits 1 when the matched fraction
+# is below --min-match.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from image_files import collect_images
+from yolo_backends import BACKENDS, YOLO_MODELS, exported_path, load_yolo
+
+# Fraction of .pt detections an exported engine must reproduce to pass
+DEFAULT_MIN_MATCH = 0.95
+
+
+def export(models: List[str], formats: List[str], imgsz: Optional[int]):
+    from ultralytics import YOLO
+
+    for name in models:
+        pt_path, _ = YOLO_MODELS[name]
+        for fmt in formats:
+            if fmt not in BACKENDS or fmt == "pt":
+                raise ValueError(f"Cannot export to '{fmt}', expected one of {[b for b in BACKENDS if b != 'pt']}")
+            # Static input shape: ONNX Runtime and OpenVINO plan for a fixed size
+            written = YOLO(pt_path).export(format=fmt, imgsz=imgsz or 640, dynamic=False, half=False)
+            out_path = exported_path(pt_path, fmt, imgsz)
+            if os.path.abspath(str(written)) != os.path.abspath(out_path):
+                if os.path.isdir(out_path):
+                    shutil.rmtree(out_path)
+                shutil.move(str(written), out_path)
+            sys.stderr.write(f"Exported {out_path}\n")
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two (N, 4) / (M, 4) xyxy arrays"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def detections(model, image_path: str, conf: float):
+    """(boxes xyxy, classes) for one image, plus the inference time in ms"""
+    start = time.perf_counter()
+    result = model(image_path, conf=conf, verbose=False)[0]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    boxes = result.boxes
+    return boxes.xyxy.cpu().numpy().reshape(-1, 4), boxes.cls.cpu().numpy().astype(int), elapsed_ms
+
+
+def match_detections(ref_boxes, ref_cls, boxes, cls, iou_threshold: float):
+    """Greedy same-class matching; returns the IoU of each matched reference box"""
+    if len(ref_boxes) == 0 or len(boxes) == 0:
+        return []
+    iou = box_iou(ref_boxes, boxes)
+    iou[ref_cls[:, None] != cls[None, :]] = 0.0
+    matched = []
+    for _ in range(min(len(ref_boxes), len(boxes))):
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        matched.append(float(iou[i, j]))
+        iou[i, :] = 0.0
+        iou[:, j] = 0.0
+    return matched
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict:
+    arr = np.asarray(latencies_ms)
+    return {
+        "mean_ms": round(float(arr.mean()), 2),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+    }
+
+
+def parity_report(images: List[str], models: List[str], backends: List[str], imgsz: Optional[int],
+                  conf: float, iou_threshold: float, repeats: int) -> Dict:
+    """Detection agreement and latency of each exported engine against the .pt model"""
+    report = {"samples": len(images), "imgsz": imgsz or 640, "models": {}}
+    for name in models:
+        pt_path, task = YOLO_MODELS[name]
+        engines = {"pt": load_yolo(pt_path, task, "pt")}
+        for backend in backends:
+            engines[f"{backend}@{imgsz or 640}"] = load_yolo(pt_path, task, backend, imgsz)
+
+        runs = {}
+        for label, model in engines.items():
+            model(images[0], conf=conf, verbose=False)  # warm-up
+            per_image, latencies = [], []
+            for _ in range(repeats):
+                per_image = []
+                for image_path in images:
+                    boxes, cls, elapsed_ms = detections(model, image_path, conf)
+                    per_image.append((boxes, cls))
+                    latencies.append(elapsed_ms)
+            runs[label] = (per_image, latency_summary(latencies))
+
+        ref_dets, ref_latency = runs["pt"]
+        model_report = {"pt": {"latency": ref_latency}}
+        for label, (dets, latency) in runs.items():
+            if label == "pt":
+                continue
+            total = sum(len(b) for b, _ in ref_dets)
+            ious, extra = [], 0
+            for (ref_boxes, ref_cls), (boxes, cls) in zip(ref_dets, dets):
+                matched = match_detections(ref_boxes, ref_cls, boxes, cls, iou_threshold)
+                ious.extend(matched)
+                extra += len(boxes) - len(matched)
+            matched_fraction = len(ious) / total if total else 1.0
+            model_report[label] = {
+                "matched_fraction": round(matched_fraction, 4),
+                "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+                "reference_detections": total,
+                "unmatched_extra_detections": extra,
+                "latency": latency,
+                "speedup_vs_pt": round(ref_latency["mean_ms"] / latency["mean_ms"], 2) if latency["mean_ms"] else None,
+            }
+        report["models"][name] = model_report
+    return report
+
+
+def check(paths: List[str], models: List[str], backends: List[str], imgsz: Optional[int],
+          conf: float, iou_threshold: float, repeats: int, min_match: float) -> bool:
+    images = collect_images(paths)
+    if not images:
+        raise ValueError("No sample images found")
+
+    report = parity_report(images, models, backends, imgsz, conf, iou_threshold, repeats)
+    print(json.dumps(report, indent=2))
+    return all(
+        entry["matched_fraction"] >= min_match
+        for model_report in report["models"].values()
+        for label, entry in model_report.items() if label != "pt"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and parity-check the YOLO detectors")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Write ONNX/OpenVINO copies of the .pt models")
+    p_export.add_argument("--models", default="ingredient,segment")
+    p_export.add_argument("--formats", default="onnx")
+    p_export.add_argument("--imgsz", type=int, default=None, help="Square input size (default 640)")
+
+    p_check = sub.add_parser("check", help="Compare boxes/classes and latency against the .pt models")
+    p_check.add_argument("paths", nargs="+", help="Sample images or folders of images")
+    p_check.add_argument("--models", default="ingredient,segment")
+    p_check.add_argument("--backends", default="onnx")
+    p_check.add_argument("--imgsz", type=int, default=None)
+    p_check.add_argument("--conf", type=float, default=0.25)
+    p_check.add_argument("--iou", type=float, default=0.5, help="IoU needed for two boxes to match")
+    p_check.add_argument("--repeats", type=int, default=3)
+    p_check.add_argument("--min-match", type=float, default=DEFAULT_MIN_MATCH)
+
+    args = parser.parse_args()
+    models = args.models.split(",")
+    unknown = [m for m in models if m not in YOLO_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {unknown}, expected {sorted(YOLO_MODELS)}")
+
+    if args.command == "export":
+        export(models, args.formats.split(","), args.imgsz)
+    elif not check(args.paths, models, args.backends.split(","), args.imgsz,
+                   args.conf, args.iou, max(1, args.repeats), args.min_match):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,31 @@
 import sys
 import json
 import asyncio
-import aiohttp
 import os
 from typing import Dict, List, Any, Optional
 
 from PIL import Image
-from pyzbar.pyzbar import decode
-import pytesseract
+
+from alternatives_index import CategoryPager, build_candidates, indexed_candidates
+from barcode_store import get_product
+from image_ingest import load_image
+from off_client import OFF_CLIENT_CONFIG, OffClient, OffClientError
+from off_mirror import get_mirror, use_local_mirror
+from product_record import ProductRecord
+from risk_rules import evaluate as evaluate_risks, evaluate_flags
+from scan_ocr import extract_text
+
+# aiohttp and pyzbar are imported by the stage that uses them, so an invalid
+# image never opens a session. Tesseract runs as a subprocess (scan_ocr.py)
+# started alongside barcode decoding and killed once the barcode resolves.
 
 # --- CONFIGURATION ---
 CONFIG = {
-    "OFF_API_BASE_URL": "https://world.openfoodfacts.org",
-    "REQUEST_TIMEOUT": 25, 
+    "OFF_API_BASE_URL": OFF_CLIENT_CONFIG["BASE_URL"],
     "MAX_ALTERNATIVES_TO_RETURN": 15, # Increased to ensure UI is filled
     "FETCH_LIMIT_PER_CATEGORY": 40, 
+    "CATEGORY_PAGE_SIZE": 10, # Categories not in the alternatives index are read page by page
+    "ALTERNATIVES_BYTE_BUDGET": int(float(os.getenv("ALTERNATIVES_BUDGET_KB", "512")) * 1024),
     "MAX_CATEGORIES_TO_SEARCH": 2, 
 }
 
@@ -25,66 +36,73 @@ CONFIG = {
 # ----------------------------------------------------------------------
 
 class AsyncOpenFoodFactsClient:
-    def __init__(self, base_url: str, timeout: int):
-        self._base_url = base_url
-        self._timeout = aiohttp.ClientTimeout(total=timeout)
-        self._session: Optional[aiohttp.ClientSession] = None
+    """Scanner-facing wrapper over the shared OffClient; failures are logged and treated as not found"""
+
+    def __init__(self, base_url: str):
+        self._client = OffClient(base_url)
         # We need categories_tags to find alternatives
-        self._fields = "code,product_name,brands,image_url,nutriments,ingredients_text,categories_tags"
+        self._fields = "code,product_name,brands,image_url,nutriments,ingredients_text,categories_tags,labels_tags,allergens_tags"
 
     async def __aenter__(self):
-        self._session = aiohttp.ClientSession(timeout=self._timeout)
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        if self._session:
-            await self._session.close()
+        await self._client.close()
 
-    async def _get(self, url: str, params: Dict) -> Optional[Dict]:
-        if not self._session: raise RuntimeError("Session not started.")
+    async def fetch_by_barcode(self, barcode: str) -> Optional[Dict]:
         try:
-            params['fields'] = self._fields
-            headers = {'User-Agent': 'NutriwiseScanner/3.0 (Fix)'}
-            
-            async with self._session.get(url, params=params, headers=headers) as response:
-                if response.status == 200:
-                    return await response.json()
-                return None
-        except Exception:
+            return await get_product(self._client, barcode)
+        except OffClientError as e:
+            sys.stderr.write(f"{str(e)}\n")
             return None
 
+    async def search_by_name(self, name: str, page_size: int = 20) -> Optional[List[Dict]]:
+        try:
+            return await self._client.search(name, page_size, self._fields, sort_by="popularity")
+        except OffClientError as e:
+            sys.stderr.write(f"{str(e)}\n")
+            return []
+
+    @property
+    def bytes_received(self) -> int:
+        return self._client.bytes_received
+
+    async def fetch_by_category(self, category_tag: str, page_size: int, page: int = 1) -> List[Dict]:
+        try:
+            return await self._client.category(category_tag, page_size, self._fields, page=page)
+        except OffClientError as e:
+            sys.stderr.write(f"{str(e)}\n")
+            return []
+
+
+class LocalOpenFoodFactsClient:
+    """Same interface as AsyncOpenFoodFactsClient, answered from the local OFF mirror"""
+
+    async def __aenter__(self):
+        self._mirror = get_mirror()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
     async def fetch_by_barcode(self, barcode: str) -> Optional[Dict]:
-        url = f"{self._base_url}/api/v2/product/{barcode}"
-        data = await self._get(url, {})
-        return data.get("product") if data else None
+        return self._mirror.by_barcode(barcode)
 
     async def search_by_name(self, name: str, page_size: int = 20) -> Optional[List[Dict]]:
-        url = f"{self._base_url}/cgi/search.pl"
-        params = {
-            "search_terms": name, "search_simple": 1, "action": "process",
-            "json": 1, "page_size": page_size, "sort_by": "popularity"
-        }
-        data = await self._get(url, params)
-        return data.get("products", []) if data else []
-
-    async def fetch_by_category(self, category_tag: str, page_size: int) -> List[Dict]:
-        url = f"{self._base_url}/cgi/search.pl"
-        params = {
-            "tagtype_0": "categories", 
-            "tag_contains_0": "contains", 
-            "tag_0": category_tag,
-            "action": "process", 
-            "json": 1, 
-            "page_size": page_size,
-            "sort_by": "popularity" 
-        }
-        data = await self._get(url, params)
-        return data.get("products", []) if data else []
-    
-    async def fetch_alternatives_concurrently(self, categories: List[str], page_size: int) -> List[Dict]:
-        tasks = [self.fetch_by_category(cat, page_size) for cat in categories]
-        results_lists = await asyncio.gather(*tasks)
-        return [p for sublist in results_lists for p in sublist]
+        return self._mirror.search(name, page_size)
+
+    # Nothing is downloaded
+    bytes_received = 0
+
+    async def fetch_by_category(self, category_tag: str, page_size: int, page: int = 1) -> List[Dict]:
+        return self._mirror.by_category(category_tag, page_size, offset=(page - 1) * page_size)
+
+
+def open_off_client():
+    """Local mirror client when OFF_BACKEND selects it, else the OFF API client"""
+    if use_local_mirror():
+        return LocalOpenFoodFactsClient()
+    return AsyncOpenFoodFactsClient(CONFIG["OFF_API_BASE_URL"])
 
 
 # ----------------------------------------------------------------------
@@ -94,25 +112,47 @@ class AsyncOpenFoodFactsClient:
 def optimize_image(image_path: str) -> Optional[Image.Image]:
     try:
         if not os.path.exists(image_path): return None
-        img = Image.open(image_path)
-        img.thumbnail((1000, 1000)) 
+        # Same decode path as predict.py: JPEG draft decode + EXIF orientation
+        img, _ = load_image(image_path, 1000)
         return img
     except:
         return None
 
 def decode_barcode(img: Image.Image) -> Optional[str]:
     try:
+        from pyzbar.pyzbar import decode
         barcodes = decode(img)
         if barcodes: return barcodes[0].data.decode("utf-8")
         return None
     except:
         return None
 
-def extract_text(img: Image.Image) -> str:
+async def identify_product(client, img: Image.Image) -> tuple[Optional[Dict], str]:
+    """(product, method): barcode decoding and OCR start together, OCR is cancelled if the barcode resolves"""
+    loop = asyncio.get_running_loop()
+    barcode_job = loop.run_in_executor(None, decode_barcode, img)
+    ocr_job = asyncio.create_task(extract_text(img))
+    method = "none"
     try:
-        return pytesseract.image_to_string(img, lang='eng').strip()
-    except:
-        return ""
+        barcode = await barcode_job
+        if barcode:
+            method = "barcode"
+            product = await client.fetch_by_barcode(barcode)
+            if product:
+                return product, method
+
+        text = await ocr_job
+        if len(text) > 2:
+            search_query = text.split('\n')[0].strip()[:30]
+            if search_query:
+                products = await client.search_by_name(search_query, page_size=1)
+                if products:
+                    return products[0], "ocr"
+        return None, method
+    finally:
+        if not ocr_job.done():
+            ocr_job.cancel()
+            await asyncio.gather(ocr_job, return_exceptions=True)
 
 def get_best_category_tags(categories_tags: List[str]) -> List[str]:
     if not categories_tags: return []
@@ -120,198 +160,241 @@ def get_best_category_tags(categories_tags: List[str]) -> List[str]:
     filtered = [c for c in categories_tags if c not in IGNORED and "plant" not in c]
     return filtered[-CONFIG['MAX_CATEGORIES_TO_SEARCH']:] if filtered else categories_tags[-1:]
 
-def extract_main_nutrients(nutriments: Dict) -> Dict:
-    if not nutriments: return {}
-    def f(val):
-        if val is None: return None
-        try: return float(val)
-        except: return None
-
-    energy = f(nutriments.get("energy-kcal_100g")) or f(nutriments.get("energy-kcal"))
-    if energy is None:
-        kj = f(nutriments.get("energy-kj_100g"))
-        if kj: energy = round(kj / 4.184)
-
-    return {
-        "energy_kcal": energy, 
-        "fat_100g": f(nutriments.get("fat_100g")),
-        "saturated_fat_100g": f(nutriments.get("saturated-fat_100g")),
-        "carbohydrates_100g": f(nutriments.get("carbohydrates_100g")),
-        "sugars_100g": f(nutriments.get("sugars_100g")),
-        "salt_100g": f(nutriments.get("salt_100g")),
-        "proteins_100g": f(nutriments.get("proteins_100g"))
-    }
-
-def analyze_risk(product: Dict, conditions: Dict, preferences: Dict) -> tuple[List[Dict], int]:
-    nutrients = extract_main_nutrients(product.get("nutriments", {}))
-    statuses = []
-    failed_count = 0
+def risk_statuses(risks) -> List[tuple[List[Dict], int]]:
+    """(statuses, failed_count) per product of a risk_rules evaluation"""
+    fails = risks.failure_counts().tolist()
+    results = []
+    for i in range(len(risks)):
+        statuses = risks.statuses(i)
+        if not statuses:
+            statuses.append({"name": "General", "is_safe": True, "status_detail": "No specific risks"})
+        results.append((statuses, fails[i]))
+    return results
+
+def analyze_risk_batch(products: List, conditions: Dict, preferences: Dict) -> List[tuple[List[Dict], int]]:
+    """(statuses, failed_count) per product, from one risk_rules pass over the batch"""
+    return risk_statuses(evaluate_risks(products, conditions, preferences))
+
+def analyze_risk(product, conditions: Dict, preferences: Dict) -> tuple[List[Dict], int]:
+    return analyze_risk_batch([product], conditions, preferences)[0]
+
+def alternatives_complete(final_alts: List[Dict], main_fails: int) -> bool:
+    """Whether the list is full of strictly better items (of items as safe, for an already safe product)"""
+    if len(final_alts) < CONFIG["MAX_ALTERNATIVES_TO_RETURN"]:
+        return False
+    return final_alts[-1]["failure_count"] < max(main_fails, 1)
+
+def score_alternatives(indexed: List[Dict], exclude_code, main_fails: int, conditions: Dict, preferences: Dict) -> List[Dict]:
+    """Alternatives as returned to the app: safer-or-equal candidates, best first"""
+    # SCORE & FILTER (bitmask filter over the precomputed risk flags)
+    valid_alts = []
+    seen_codes = {exclude_code}
+
+    candidates = []
+    for alt in indexed:
+        if alt["code"] in seen_codes: continue
+        seen_codes.add(alt["code"])
+        candidates.append(alt)
+
+    risks = evaluate_flags([alt["flags"] for alt in candidates], conditions, preferences)
+    for alt, (alt_statuses, alt_fails) in zip(candidates, risk_statuses(risks)):
+        
+        # --- LOGIC FIX: Allow Safer OR Equal items ---
+        # 1. Is it Strictly Safer? (Fewer fails)
+        is_better = alt_fails < main_fails
+        # 2. Is it Equal? (Same fails, but maybe user wants variety)
+        is_equal = alt_fails == main_fails
+        
+        no_conditions = (len(conditions) + len(preferences) == 0)
+
+        if is_better or is_equal or no_conditions:
+            valid_alts.append({
+                "score": alt_fails, # Lower score is better
+                "is_better": 1 if is_better else 0, # Priority flag
+                "has_nutrients": alt["has_nutrients"],
+                "data": {
+                    "name": alt["name"],
+                    "brand": alt["brand"],
+                    "image_url": alt["image_url"],
+                    "nutrients": alt["nutrients"],
+                    "safety_statuses": alt_statuses,
+                    "failure_count": alt_fails
+                }
+            })
+
+    # Sorting Strategy:
+    # 1. Strictly Better Items first
+    # 2. Then by Failure Score (Lowest first)
+    # 3. Then by Data Completeness
+    valid_alts.sort(key=lambda x: (-x['is_better'], x['score'], -x['has_nutrients']))
     
-    checks = [
-        ("salt_100g", 1.5, "Hypertension", "High Salt"),
-        ("sugars_100g", 22.5, "Diabetes", "High Sugar"),
-        ("saturated_fat_100g", 5.0, "High Cholesterol", "High Sat. Fat"),
-        ("energy_kcal", 450, "Obesity", "High Calorie"),
-    ]
-
-    for n_key, limit, cond_key, msg in checks:
-        if conditions.get(cond_key):
-            val = nutrients.get(n_key)
-            is_safe = val is None or val <= limit
-            if not is_safe: failed_count += 1
-            statuses.append({"name": cond_key, "is_safe": is_safe, "status_detail": msg if not is_safe else "Safe levels"})
-
-    ingredients = str(product.get("ingredients_text", "")).lower()
-    pref_checks = [
-        ("Lactose Free", ["milk", "lactose", "cheese", "cream", "butter", "whey"], "Contains Dairy"),
-        ("Vegan", ["milk", "egg", "meat", "fish", "gelatin", "honey"], "Animal Content"),
-        ("Gluten Free", ["wheat", "barley", "rye", "gluten", "malt"], "Contains Gluten"),
-        ("Nut Free", ["nut", "almond", "cashew", "hazelnut", "pecan"], "Contains Nuts"),
-    ]
-
-    for pref_key, keywords, msg in pref_checks:
-        if preferences.get(pref_key):
-            is_safe = not any(k in ingredients for k in keywords)
-            if not is_safe: failed_count += 1
-            statuses.append({"name": pref_key, "is_safe": is_safe, "status_detail": msg if not is_safe else "Safe"})
-
-    if not statuses:
-        statuses.append({"name": "General", "is_safe": True, "status_detail": "No specific risks"})
-
-    return statuses, failed_count
+    return [x["data"] for x in valid_alts[:CONFIG["MAX_ALTERNATIVES_TO_RETURN"]]]
 
 # ----------------------------------------------------------------------
 # MAIN LOGIC
 # ----------------------------------------------------------------------
-
-async def main():
-    if len(sys.argv) != 2:
-        print(json.dumps({"error": "Missing input file argument"}))
-        return
-
-    try:
-        with open(sys.argv[1], 'r') as f:
-            input_data = json.load(f)
-    except:
-        print(json.dumps({"error": "Input Read Error"}))
-        return
-
+# Events, in order (with --stream each is printed as one NDJSON line as soon
+# as it is known; without it they are folded into the single JSON document
+# the scanner has always printed):
+#   {"type": "product", "success": true, "method": ..., "product": {...}}
+#   {"type": "alternatives", "alternatives": [...]}   one per category that
+#       arrives; each carries the full current list, best first, and
+#       replaces the previous one
+#   {"type": "done", "success": true, "alternatives_count": N}
+# or a single {"type": "error", "success": false, "error": ...}. A stream
+# that fails after the product event ends with an error event instead of
+# "done", so every line stays a typed event.
+
+async def scan(input_data: Dict, emit):
     image_path = input_data.get("image_path")
     conditions = input_data.get("conditions", {})
     preferences = input_data.get("restrictions", {})
 
     pil_image = optimize_image(image_path)
     if not pil_image:
-        print(json.dumps({"success": False, "error": "Image file invalid"}))
+        emit({"type": "error", "success": False, "error": "Image file invalid"})
         return
 
-    async with AsyncOpenFoodFactsClient(CONFIG["OFF_API_BASE_URL"], CONFIG["REQUEST_TIMEOUT"]) as client:
-        
-        # 1. IDENTIFY PRODUCT
-        product = None
-        method = "none"
+    async with open_off_client() as client:
         
-        barcode = decode_barcode(pil_image)
-        if barcode:
-            product = await client.fetch_by_barcode(barcode)
-            method = "barcode"
-        
-        if not product:
-            text = extract_text(pil_image)
-            if len(text) > 2:
-                search_query = text.split('\n')[0].strip()[:30]
-                if search_query:
-                    products = await client.search_by_name(search_query, page_size=1)
-                    if products:
-                        product = products[0]
-                        method = "ocr"
+        # 1. IDENTIFY PRODUCT (barcode and OCR in parallel)
+        product, method = await identify_product(client, pil_image)
 
         if not product:
-            print(json.dumps({"success": False, "error": "Product not identified"}))
+            emit({"type": "error", "success": False, "error": "Product not identified"})
             return
 
-        main_statuses, main_fails = analyze_risk(product, conditions, preferences)
+        record = ProductRecord(product)
+        main_statuses, main_fails = analyze_risk(record, conditions, preferences)
+        emit({
+            "type": "product",
+            "success": True,
+            "method": method,
+            "product": {
+                "name": product.get("product_name"),
+                "brand": product.get("brands", "Unknown Brand"),
+                "image_url": product.get("image_url"),
+                "nutrients": record.nutrient_summary(),
+                "safety_statuses": main_statuses,
+                "failure_count": main_fails
+            },
+        })
 
-        # 2. FIND ALTERNATIVES (Strategy: Category -> Fallback to Keyword)
+        # 2. FIND ALTERNATIVES (Strategy: Category index -> Fallback to Keyword)
         cat_tags = product.get("categories_tags", [])
         search_tags = get_best_category_tags(cat_tags)
         
-        raw_candidates = []
+        final_alts = []
+        found_candidates = False
         
-        # Strategy A: Search by Category (Specific)
+        # Strategy A: Pre-scored candidates per category (alternatives_index.py).
+        # Categories missing from the index are fetched CATEGORY_PAGE_SIZE
+        # products at a time, all categories in parallel, until the list is
+        # full of strictly better items, every category is read up to
+        # FETCH_LIMIT_PER_CATEGORY, or ALTERNATIVES_BYTE_BUDGET has been
+        # downloaded. The list is re-scored and emitted as each page arrives,
+        # candidates always in tag order, so the last event matches a
+        # non-streamed scan.
         if search_tags:
-            raw_candidates = await client.fetch_alternatives_concurrently(
-                search_tags, 
-                CONFIG["FETCH_LIMIT_PER_CATEGORY"]
-            )
+            per_tag = [indexed_candidates(tag) for tag in search_tags]
+            pagers = [
+                CategoryPager(client, tag, CONFIG["CATEGORY_PAGE_SIZE"], CONFIG["FETCH_LIMIT_PER_CATEGORY"])
+                if candidates is None else None
+                for tag, candidates in zip(search_tags, per_tag)
+            ]
+            for slot, pager in enumerate(pagers):
+                if pager is not None:
+                    per_tag[slot] = pager.candidates  # grows as pages arrive
+
+            def rescore():
+                nonlocal final_alts, found_candidates
+                candidates = [c for slot in per_tag for c in slot]
+                if candidates:
+                    found_candidates = True
+                    final_alts = score_alternatives(candidates, product.get("code"), main_fails, conditions, preferences)
+                    emit({"type": "alternatives", "alternatives": final_alts})
+
+            if any(p is None for p in pagers):
+                rescore()
+            try:
+                while not alternatives_complete(final_alts, main_fails):
+                    active = [p for p in pagers if p is not None and not p.exhausted]
+                    if not active or client.bytes_received >= CONFIG["ALTERNATIVES_BYTE_BUDGET"]:
+                        break
+                    pending = [asyncio.ensure_future(p.next_page()) for p in active]
+                    try:
+                        for done in asyncio.as_completed(pending):
+                            if await done:
+                                rescore()
+                                if alternatives_complete(final_alts, main_fails):
+                                    break
+                    finally:
+                        for task in pending:
+                            task.cancel()
+                        # Let the cancellations land before the pagers are finished and the client closes
+                        await asyncio.gather(*pending, return_exceptions=True)
+            finally:
+                for pager in pagers:
+                    if pager is not None:
+                        pager.finish()
         
         # Strategy B: Fallback to Keyword Search if categories returned nothing
-        if not raw_candidates:
+        # (and the download budget is not already spent)
+        if not found_candidates:
             # Use first 2 words of product name (e.g., "Lay's Classic" -> "Lay's Classic")
             product_name = product.get("product_name", "")
             keywords = " ".join(product_name.split()[:2]) 
-            if keywords:
+            if keywords and client.bytes_received < CONFIG["ALTERNATIVES_BYTE_BUDGET"]:
                  raw_candidates = await client.search_by_name(keywords, page_size=40)
+                 final_alts = score_alternatives(build_candidates(raw_candidates or []), product.get("code"),
+                                                 main_fails, conditions, preferences)
+            emit({"type": "alternatives", "alternatives": final_alts})
 
-        # 3. SCORE & FILTER
-        valid_alts = []
-        seen_codes = {product.get("code")}
-
-        for alt in raw_candidates:
-            code = alt.get("code")
-            if not code or code in seen_codes: continue
-            seen_codes.add(code)
-
-            if not alt.get("product_name") or not alt.get("image_url"): continue
-
-            alt_statuses, alt_fails = analyze_risk(alt, conditions, preferences)
-            
-            # --- LOGIC FIX: Allow Safer OR Equal items ---
-            # 1. Is it Strictly Safer? (Fewer fails)
-            is_better = alt_fails < main_fails
-            # 2. Is it Equal? (Same fails, but maybe user wants variety)
-            is_equal = alt_fails == main_fails
-            
-            no_conditions = (len(conditions) + len(preferences) == 0)
-
-            if is_better or is_equal or no_conditions:
-                valid_alts.append({
-                    "score": alt_fails, # Lower score is better
-                    "is_better": 1 if is_better else 0, # Priority flag
-                    "has_nutrients": 1 if extract_main_nutrients(alt.get("nutriments")).get("energy_kcal") else 0,
-                    "data": {
-                        "name": alt.get("product_name"),
-                        "brand": alt.get("brands", "Unknown Brand"),
-                        "image_url": alt.get("image_url"),
-                        "nutrients": extract_main_nutrients(alt.get("nutriments", {})),
-                        "safety_statuses": alt_statuses,
-                        "failure_count": alt_fails
-                    }
-                })
-
-        # Sorting Strategy:
-        # 1. Strictly Better Items first
-        # 2. Then by Failure Score (Lowest first)
-        # 3. Then by Data Completeness
-        valid_alts.sort(key=lambda x: (-x['is_better'], x['score'], -x['has_nutrients']))
-        
-        final_alts = [x["data"] for x in valid_alts[:CONFIG["MAX_ALTERNATIVES_TO_RETURN"]]]
+        emit({"type": "done", "success": True, "alternatives_count": len(final_alts)})
 
-        output = {
-            "success": True,
-            "method": method,
-            "product": {
-                "name": product.get("product_name"),
-                "brand": product.get("brands", "Unknown Brand"),
-                "image_url": product.get("image_url"),
-                "nutrients": extract_main_nutrients(product.get("nutriments", {})),
-                "safety_statuses": main_statuses,
-                "failure_count": main_fails
-            },
-            "alternatives": final_alts
-        }
-        
-        print(json.dumps(output, indent=2))
+def emit_ndjson(event: Dict):
+    """Write one NDJSON event to stdout and flush it immediately"""
+    print(json.dumps(event))
+    sys.stdout.flush()
+
+async def main():
+    args = sys.argv[1:]
+    stream = "--stream" in args
+    args = [a for a in args if a != "--stream"]
+    if len(args) != 1:
+        print(json.dumps({"type": "error", "success": False, "error": "Missing input file argument"} if stream
+                         else {"error": "Missing input file argument"}))
+        return
+
+    try:
+        with open(args[0], 'r') as f:
+            input_data = json.load(f)
+    except:
+        print(json.dumps({"type": "error", "success": False, "error": "Input Read Error"} if stream
+                         else {"error": "Input Read Error"}))
+        return
+
+    if stream:
+        try:
+            await scan(input_data, emit_ndjson)
+        except Exception as e:
+            # Earlier events are already out; the __main__ handler's document would not parse as an event
+            emit_ndjson({"type": "error", "success": False, "error": "Script Exception", "details": str(e)})
+        return
+
+    # Single-document output, as server.js /upload parses it
+    events = {}
+    await scan(input_data, lambda event: events.__setitem__(event["type"], event))
+    if "error" in events:
+        print(json.dumps({"success": False, "error": events["error"]["error"]}))
+        return
+    output = {
+        "success": True,
+        "method": events["product"]["method"],
+        "product": events["product"]["product"],
+        "alternatives": events.get("alternatives", {}).get("alternatives", [])
+    }
+    print(json.dumps(output, indent=2))
 
 if __name__ == "__main__":
     try:
@@ -319,4 +402,4 @@ if __name__ == "__main__":
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
         asyncio.run(main())
     except Exception as e:
-        print(json.dumps({"success": False, "error": "Script Exception", "details": str(e)}))
\ No newline at end of file
+        print(json.dumps({"success": False, "error": "Script Exception", "details": str(e)}))
@@ -0,0 +1,190 @@
+# gemini_portion.py
+#
+# Gemini weight + smart-portion estimate, with a response cache.
+#
+# The answer only depends on the photo, the user's health conditions and how
+# many calories they have left, so it is cached under
+#   sha256(photo) + normalized health conditions + remaining calories bucket
+# for GEMINI_CACHE_TTL_HOURS. Calories are rounded down to a
+# GEMINI_CALORIE_BUCKET multiple and the prompt is built from the same
+# normalized values, so a cached answer is exactly what Gemini was asked.
+#
+# Identical requests that arrive while a call is in flight (worker mode)
+# wait for that call instead of making their own, and the configured
+# GenerativeModel is built once per process.
+
+import os
+import sys
+import json
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from disk_cache import DiskCache
+from result_cache import file_sha256
+
+GEMINI_CONFIG = {
+    "MODEL": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+    "CACHE_ENABLED": os.getenv("GEMINI_CACHE", "1") == "1",
+    "CACHE_PATH": os.getenv("GEMINI_CACHE_PATH", os.path.join("cache", "gemini.sqlite3")),
+    "CACHE_MAX_BYTES": int(float(os.getenv("GEMINI_CACHE_MAX_MB", "16")) * 1024 * 1024),
+    "CACHE_TTL_S": float(os.getenv("GEMINI_CACHE_TTL_HOURS", "168")) * 3600,
+    "CALORIE_BUCKET": max(1, int(os.getenv("GEMINI_CALORIE_BUCKET", "100"))),
+}
+
+PROMPT_TEMPLATE = """
+        Analyze this image of food.
+
+        Context:
+        - User Health Conditions: {health_conds}
+        - Remaining Calories for Today: {remaining_cals}
+
+        Tasks:
+        1. Estimate the approximate weight of the food visible in grams (numeric).
+        2. Suggest a "smart portion" size (in grams or serving description) that fits the user's remaining calories and health conditions. Briefly explain why.
+
+        Return a JSON object ONLY, like this:
+        {{
+            "weight": 150,
+            "smart_portion": "Consume only 100g because..."
+        }}
+        """
+
+
+# --- REQUEST NORMALIZATION ---
+
+def normalize_health_conds(health_conds) -> List[str]:
+    """Sorted, lower-case list of active conditions from the JSON object/list/string the server passes"""
+    if isinstance(health_conds, str):
+        try:
+            health_conds = json.loads(health_conds) if health_conds.strip() else []
+        except ValueError:
+            health_conds = [part for part in health_conds.split(",")]
+    if isinstance(health_conds, dict):
+        # {"diabetes": true, "hypertension": false} -> active keys only
+        health_conds = [name for name, active in health_conds.items() if active]
+    elif not isinstance(health_conds, (list, tuple)):
+        health_conds = [health_conds] if health_conds else []
+    return sorted({str(c).strip().lower() for c in health_conds if str(c).strip()})
+
+
+def bucket_calories(remaining_cals) -> Optional[int]:
+    """Round remaining calories down to the bucket size (None if not a number)"""
+    try:
+        remaining = max(0.0, float(remaining_cals))
+    except (TypeError, ValueError):
+        return None
+    bucket = GEMINI_CONFIG["CALORIE_BUCKET"]
+    return int(remaining // bucket) * bucket
+
+
+def cache_key(image_sha: str, conditions: List[str], calories: Optional[int]) -> str:
+    return f"{GEMINI_CONFIG['MODEL']}:{image_sha}:{','.join(conditions)}:{calories}"
+
+
+# --- CLIENT ---
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model(api_key: str):
+    """The configured GenerativeModel, built once per process"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _model = genai.GenerativeModel(GEMINI_CONFIG["MODEL"])
+        return _model
+
+
+def parse_response(text: str) -> Dict:
+    text = text.strip()
+    # Clean markdown if present
+    if "```json" in text:
+        text = text.replace("```json", "").replace("```", "")
+    return json.loads(text.strip())
+
+
+# --- CACHE + IN-FLIGHT DE-DUPLICATION ---
+
+_cache = None
+_cache_lock = threading.Lock()
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+def get_cache() -> Optional[DiskCache]:
+    global _cache
+    if not GEMINI_CONFIG["CACHE_ENABLED"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = DiskCache(GEMINI_CONFIG["CACHE_PATH"], "gemini_portion", GEMINI_CONFIG["CACHE_MAX_BYTES"])
+            except Exception as e:
+                sys.stderr.write(f"Gemini cache disabled: {str(e)}\n")
+                GEMINI_CONFIG["CACHE_ENABLED"] = False
+                return None
+    return _cache
+
+
+def _ask_gemini(api_key: str, load_image: Callable, conditions: List[str], calories: Optional[int]) -> Dict:
+    prompt = PROMPT_TEMPLATE.format(
+        health_conds=", ".join(conditions) or "None",
+        remaining_cals=calories if calories is not None else "Unknown",
+    )
+    response = get_model(api_key).generate_content([prompt, load_image()])
+    return parse_response(response.text)
+
+
+def estimate_portion(image_path: str, health_conds, remaining_cals,
+                     load_image: Callable, image_sha: Optional[str] = None) -> Optional[Dict]:
+    """Gemini {"weight", "smart_portion"} for a photo, served from cache when possible.
+
+    load_image is only called on a cache miss and returns the PIL image to upload.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        sys.stderr.write("Skipping Gemini: GEMINI_API_KEY environment variable not set.\n")
+        return None
+
+    conditions = normalize_health_conds(health_conds)
+    calories = bucket_calories(remaining_cals)
+    cache = get_cache()
+    if cache is None:
+        return _ask_gemini(api_key, load_image, conditions, calories)
+
+    key = cache_key(image_sha or file_sha256(image_path), conditions, calories)
+    cached = cache.get_json(key, max_age=GEMINI_CONFIG["CACHE_TTL_S"])
+    if cached is not None:
+        return cached
+
+    with _in_flight_lock:
+        pending = _in_flight.get(key)
+        owner = pending is None
+        if owner:
+            pending = _in_flight[key] = Future()
+    if not owner:
+        return pending.result()
+
+    try:
+        data = _ask_gemini(api_key, load_image, conditions, calories)
+        try:
+            cache.put_json(key, data)
+        except Exception as e:
+            sys.stderr.write(f"Gemini cache write failed: {str(e)}\n")
+        pending.set_result(data)
+        return data
+    except Exception as e:
+        pending.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+if __name__ == "__main__":
+    cache = get_cache()
+    print(json.dumps(cache.stats() if cache else {"enabled": False}, indent=2))
@@ -0,0 +1,21 @@
+# image_files.py
+#
+# Expanding image/folder arguments into image file paths, shared by the
+# batch CLIs (recipe_gernate.py --batch, export_classifier.py check,
+# export_yolo.py check) and the benchmark scripts.
+
+import os
+from typing import List
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def collect_images(paths: List[str]) -> List[str]:
+    """Expand directories into their image files (sorted), keeping plain paths as given"""
+    images = []
+    for p in paths:
+        if os.path.isdir(p):
+            images.extend(os.path.join(p, f) for f in sorted(os.listdir(p)) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            images.append(p)
+    return images
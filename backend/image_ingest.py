@@ -0,0 +1,103 @@
+# image_ingest.py
+#
+# Decode an uploaded photo once and hand out per-stage views of it.
+#
+# Phone photos are 12+ MP JPEGs, but no stage needs more than ~1000 px:
+# the classifier wants 224x224, the depth stage works at DEPTH_WORKING_SIZE
+# and Gemini only needs an upload-sized copy. JPEG draft mode lets libjpeg
+# decode straight to a 1/2, 1/4 or 1/8 scale, so the full-resolution bitmap
+# is never built. EXIF orientation is applied once here for every stage.
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from depth_pipeline import DEPTH_CONFIG
+
+INGEST_CONFIG = {
+    "CLASSIFIER_SIZE": (224, 224),
+    "DEPTH_MAX_SIDE": DEPTH_CONFIG["WORKING_SIZE"],
+    "UPLOAD_MAX_SIDE": int(os.getenv("UPLOAD_MAX_SIDE", "1024")),
+}
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def largest_stage_side() -> int:
+    return max(max(INGEST_CONFIG["CLASSIFIER_SIZE"]), INGEST_CONFIG["DEPTH_MAX_SIDE"], INGEST_CONFIG["UPLOAD_MAX_SIDE"])
+
+
+def load_image(image_path: str, max_side: int) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Decode an image at no more than max_side px, upright and RGB; also returns the original (w, h)"""
+    img = Image.open(image_path)
+    width, height = img.size
+    if img.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    if img.format == "JPEG":
+        # Picks the smallest DCT scale that still covers max_side
+        img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.BILINEAR)
+    return img, (width, height)
+
+
+def _fit(img: Image.Image, max_side: int) -> Image.Image:
+    if max(img.size) <= max_side:
+        return img
+    scaled = img.copy()
+    scaled.thumbnail((max_side, max_side), Image.BILINEAR)
+    return scaled
+
+
+class IngestedImage:
+    """One decoded photo plus lazily built, cached per-stage views"""
+
+    def __init__(self, image: Image.Image, original_size: Tuple[int, int], path: Optional[str] = None):
+        self.image = image
+        self.original_size = original_size
+        self.path = path
+        self._views: Dict[str, object] = {}
+        # Reentrant so a view can be built from another view
+        self._lock = threading.RLock()
+
+    def _view(self, name, build):
+        with self._lock:
+            if name not in self._views:
+                self._views[name] = build()
+            return self._views[name]
+
+    def classifier_tensor(self) -> np.ndarray:
+        """float32 (1, 224, 224, 3) in MobileNetV2's [-1, 1] range"""
+        def build():
+            # PIL's default (bicubic) resampling, as the model has always been fed
+            img = self.image.resize(INGEST_CONFIG["CLASSIFIER_SIZE"])
+            arr = np.asarray(img, dtype=np.float32)
+            arr *= 1.0 / 127.5
+            arr -= 1.0
+            return arr[np.newaxis]
+        return self._view("classifier", build)
+
+    def depth_image(self) -> Image.Image:
+        """RGB image capped at the depth working resolution"""
+        return self._view("depth", lambda: _fit(self.image, INGEST_CONFIG["DEPTH_MAX_SIDE"]))
+
+    def upload_image(self) -> Image.Image:
+        """Copy sized for sending to external APIs (Gemini)"""
+        return self._view("upload", lambda: _fit(self.image, INGEST_CONFIG["UPLOAD_MAX_SIDE"]))
+
+
+def ingest_image(image_path: str, max_side: Optional[int] = None) -> IngestedImage:
+    """Decode image_path once at the largest size any stage needs"""
+    try:
+        image, original_size = load_image(image_path, max_side or largest_stage_side())
+    except Exception as e:
+        raise ValueError(f"Image processing failed: {str(e)}")
+    return IngestedImage(image, original_size, image_path)
@@ -63,6 +63,7 @@ INGREDIENT_DB = {
     "Feta Cheese": {"cal": 132, "pro": 7.0, "fat": 10.5, "carb": 2.0},
     "Milk (Whole)": {"cal": 30, "pro": 1.6, "fat": 1.6, "carb": 2.5},
     "Greek Yogurt": {"cal": 29, "pro": 5.0, "fat": 0.2, "carb": 1.8},
+    "Cheese (Ricotta)": {"cal": 87, "pro": 5.6, "fat": 6.5, "carb": 1.5},
 
     # --- PRODUCE (FRUIT/VEG) ---
     "Apple": {"cal": 26, "pro": 0.1, "fat": 0.1, "carb": 7.0},
@@ -85,9 +86,12 @@ INGREDIENT_DB = {
     "BBQ Sauce": {"cal": 85, "pro": 0.0, "fat": 0.0, "carb": 20.0},
     "Soy Sauce": {"cal": 26, "pro": 4.0, "fat": 0.0, "carb": 2.5},
     "Tomato Sauce": {"cal": 15, "pro": 0.8, "fat": 0.1, "carb": 3.5},
+    "Mustard": {"cal": 30, "pro": 1.9, "fat": 1.7, "carb": 2.9},
 }
 
 # --- RECIPE MAPPING (Grams per 500g Serving) ---
+# Every ingredient must be in INGREDIENT_DB unless it is listed with 0 g;
+# nutrition_matrix.py checks this when it compiles the tables.
 DISH_RECIPES = {
     "Apple Pie": {"Apple": 250, "All-Purpose Flour": 100, "Butter": 60, "Sugar (White)": 80, "Pie Crust": 10},
     "Baby Back Ribs": {"Pork Ribs": 400, "BBQ Sauce": 80, "Brown Sugar": 10, "Garlic": 10},
@@ -0,0 +1,242 @@
+# nutrition_matrix.py
+#
+# Dish and ingredient nutrition compiled into NumPy arrays for predict.py.
+#
+# ingredients_data.py keeps INGREDIENT_DB (macros per 50 g of an ingredient)
+# and DISH_RECIPES (grams of each ingredient per 500 g serving) as nested
+# dicts, and predict.CLASS_LABELS holds each class's name and label macros
+# (per 500 g) inside a string. The build step turns them into:
+#   * dish_grams         (dishes x ingredients) grams per 500 g serving,
+#                        rows in classifier class order;
+#   * ingredient_macros  (ingredients x MACROS) per gram;
+#   * label_macros       (dishes x MACROS) the CLASS_LABELS values per 500 g;
+# plus the per-dish ingredient lists the classification event returns. Macros
+# for any dish (or batch of dishes) at any weight are then one indexing and
+# one multiply: per_gram[dishes] * grams[:, None].
+#
+# Building validates the data: every recipe ingredient with a non-zero
+# quantity must be in INGREDIENT_DB and every label must parse, otherwise it
+# fails with the full list of problems. Zero-gram entries such as
+# "Coffee (not counted)" are only listed, never counted.
+#
+#   python nutrition_matrix.py build [--out PATH]
+#   python nutrition_matrix.py show "Pizza" [--grams 350]
+#
+# The .npz records a fingerprint of its sources; a file built from older
+# data is rebuilt on load instead of being served.
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ingredients_data import DISH_RECIPES, INGREDIENT_DB
+
+NUTRITION_MATRIX_CONFIG = {
+    "PATH": os.getenv("NUTRITION_MATRIX_PATH", os.path.join("cache", "nutrition_matrix.npz")),
+}
+
+# Columns of every macro matrix: kcal, protein g, fat g, carbohydrates g
+MACROS = ("cal", "pro", "fat", "carb")
+INGREDIENT_BASE_G = 50.0
+RECIPE_BASE_G = 500.0
+
+_LABEL_RE = re.compile(
+    r"^(?P<name>[^:]+):\s*calories:\s*(?P<cal>[\d.]+),\s*protein:\s*(?P<pro>[\d.]+)g,"
+    r"\s*fat:\s*(?P<fat>[\d.]+)g,\s*carbohydrates:\s*(?P<carb>[\d.]+)g$"
+)
+
+
+def fingerprint(class_labels: Sequence[str]) -> str:
+    """Hash of everything the matrices are compiled from"""
+    source = json.dumps([list(class_labels), INGREDIENT_DB, DISH_RECIPES], ensure_ascii=False)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def compile_arrays(class_labels: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Validate the nutrition data and compile it; raises ValueError listing every problem"""
+    problems = []
+    dish_names, label_macros = [], []
+    for i, label in enumerate(class_labels):
+        match = _LABEL_RE.match(label)
+        if match is None:
+            problems.append(f"CLASS_LABELS[{i}] does not parse: {label!r}")
+            dish_names.append(label.split(":")[0].strip())
+            label_macros.append([np.nan] * len(MACROS))
+            continue
+        dish_names.append(match.group("name").strip())
+        label_macros.append([float(match.group(m)) for m in MACROS])
+
+    for dish in DISH_RECIPES:
+        if dish not in dish_names:
+            problems.append(f"DISH_RECIPES[{dish!r}] is not a CLASS_LABELS dish")
+
+    # Ingredient axis: the database, then ingredients that are only listed (0 g)
+    ingredient_names = list(INGREDIENT_DB)
+    for dish, recipe in DISH_RECIPES.items():
+        for ingredient, grams in recipe.items():
+            if ingredient in INGREDIENT_DB or ingredient in ingredient_names:
+                continue
+            if grams:
+                problems.append(f"DISH_RECIPES[{dish!r}] uses {ingredient!r} ({grams} g), which is not in INGREDIENT_DB")
+            else:
+                ingredient_names.append(ingredient)
+
+    if problems:
+        raise ValueError("Nutrition data is inconsistent:\n  " + "\n  ".join(problems))
+
+    column = {name: j for j, name in enumerate(ingredient_names)}
+    ingredient_macros = np.zeros((len(ingredient_names), len(MACROS)), dtype=np.float64)
+    for j, name in enumerate(ingredient_names[:len(INGREDIENT_DB)]):
+        ingredient_macros[j] = [INGREDIENT_DB[name][m] for m in MACROS]
+    ingredient_macros /= INGREDIENT_BASE_G
+
+    # recipe_columns keeps each recipe's own ingredient order (-1 pads) for the ingredient lists
+    width = max((len(r) for r in DISH_RECIPES.values()), default=0)
+    dish_grams = np.zeros((len(dish_names), len(ingredient_names)), dtype=np.float64)
+    recipe_columns = np.full((len(dish_names), width), -1, dtype=np.int32)
+    for i, dish in enumerate(dish_names):
+        for k, (ingredient, grams) in enumerate(DISH_RECIPES.get(dish, {}).items()):
+            dish_grams[i, column[ingredient]] = grams
+            recipe_columns[i, k] = column[ingredient]
+
+    return {
+        "fingerprint": np.array(fingerprint(class_labels)),
+        "dish_names": np.array(dish_names),
+        "ingredient_names": np.array(ingredient_names),
+        "label_macros": np.array(label_macros, dtype=np.float64).reshape(len(dish_names), len(MACROS)),
+        "ingredient_macros": ingredient_macros,
+        "dish_grams": dish_grams,
+        "recipe_columns": recipe_columns,
+        "has_recipe": np.array([d in DISH_RECIPES for d in dish_names], dtype=bool),
+    }
+
+
+def build(class_labels: Sequence[str], out_path: str) -> Dict[str, np.ndarray]:
+    """Compile and write the .npz (via a temporary file, so readers never see half a file)"""
+    arrays = compile_arrays(class_labels)
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = out_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, out_path)
+    return arrays
+
+
+class NutritionMatrix:
+    """Read-only view of the compiled arrays; dishes are addressed by classifier class index"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.dish_names: List[str] = arrays["dish_names"].tolist()
+        self.ingredient_names: List[str] = arrays["ingredient_names"].tolist()
+        self.dish_index = {name: i for i, name in enumerate(self.dish_names)}
+        self.label_macros = arrays["label_macros"]
+        self.ingredient_macros = arrays["ingredient_macros"]
+        self.dish_grams = arrays["dish_grams"]
+        self.has_recipe = arrays["has_recipe"]
+
+        # Per gram of dish: as labelled, and as computed from the recipe (NaN without one)
+        self.per_gram = self.label_macros / RECIPE_BASE_G
+        self.recipe_per_gram = self.dish_grams @ self.ingredient_macros / RECIPE_BASE_G
+        self.recipe_per_gram[~self.has_recipe] = np.nan
+
+        # "Apple: 250g" lists, in recipe order, as the classification event returns them
+        grams = self.dish_grams
+        self.ingredient_lists = [
+            [f"{self.ingredient_names[j]}: {grams[i, j]:g}g" for j in row if j >= 0]
+            for i, row in enumerate(arrays["recipe_columns"].tolist())
+        ]
+
+    def __len__(self) -> int:
+        return len(self.dish_names)
+
+    def macros(self, dishes, grams, recipe: bool = False) -> np.ndarray:
+        """MACROS for dish indices at the given weights (scalars or matching arrays); shape (..., len(MACROS))"""
+        per_gram = self.recipe_per_gram if recipe else self.per_gram
+        return per_gram[dishes] * np.asarray(grams, dtype=np.float64)[..., None]
+
+    def kcal_per_gram(self, dish_name: str) -> Optional[float]:
+        i = self.dish_index.get(dish_name)
+        return float(self.per_gram[i, 0]) if i is not None else None
+
+
+def load_arrays(class_labels: Sequence[str], path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Arrays from the .npz when it matches the current data, else freshly compiled (and saved)"""
+    path = path or NUTRITION_MATRIX_CONFIG["PATH"]
+    expected = fingerprint(class_labels)
+    try:
+        with np.load(path) as data:
+            if str(data["fingerprint"]) == expected:
+                return {key: data[key] for key in data.files}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        sys.stderr.write(f"Nutrition matrix unreadable, rebuilding: {str(e)}\n")
+    try:
+        return build(class_labels, path)
+    except OSError as e:
+        sys.stderr.write(f"Nutrition matrix not saved: {str(e)}\n")
+        return compile_arrays(class_labels)
+
+
+_nutrition_matrix = None
+
+
+def get_nutrition_matrix(class_labels: Sequence[str]) -> NutritionMatrix:
+    """Process-wide NutritionMatrix for the classifier's labels"""
+    global _nutrition_matrix
+    if _nutrition_matrix is None:
+        _nutrition_matrix = NutritionMatrix(load_arrays(class_labels))
+    return _nutrition_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and inspect the dish/ingredient nutrition matrices")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Validate ingredients_data.py and CLASS_LABELS and write the .npz")
+    p_build.add_argument("--out", default=NUTRITION_MATRIX_CONFIG["PATH"])
+
+    p_show = sub.add_parser("show", help="Macros of one dish")
+    p_show.add_argument("dish")
+    p_show.add_argument("--grams", type=float, default=RECIPE_BASE_G)
+
+    args = parser.parse_args()
+    from predict import CLASS_LABELS
+
+    if args.command == "build":
+        try:
+            arrays = build(CLASS_LABELS, args.out)
+        except ValueError as e:
+            sys.stderr.write(f"{str(e)}\n")
+            sys.exit(1)
+        print(json.dumps({
+            "path": args.out,
+            "dishes": len(arrays["dish_names"]),
+            "ingredients": len(arrays["ingredient_names"]),
+            "dishes_without_recipe": arrays["dish_names"][~arrays["has_recipe"]].tolist(),
+        }, indent=2))
+        return
+
+    matrix = get_nutrition_matrix(CLASS_LABELS)
+    i = matrix.dish_index.get(args.dish)
+    if i is None:
+        sys.stderr.write(f"Unknown dish: {args.dish}\n")
+        sys.exit(1)
+    print(json.dumps({
+        "dish": args.dish,
+        "grams": args.grams,
+        "label": dict(zip(MACROS, np.round(matrix.macros(i, args.grams), 1).tolist())),
+        "recipe": dict(zip(MACROS, np.round(matrix.macros(i, args.grams, recipe=True), 1).tolist())),
+        "ingredients": matrix.ingredient_lists[i],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
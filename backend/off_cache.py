@@ -0,0 +1,214 @@
+# off_cache.py
+#
+# Persistent response cache for OpenFoodFacts API calls, shared by
+# food_lookup.py and extract_product.py (same SQLite file, so a product one
+# script fetched is a hit for the other).
+#
+# Responses are keyed on the normalized request: endpoint path, the query
+# parameters (search terms lower-cased and whitespace-collapsed, `fields`
+# sorted) and nothing else. Each endpoint has its own TTL:
+#
+#   product   /api/v2/product/<barcode>        OFF_CACHE_TTL_PRODUCT_HOURS  (168)
+#   search    /cgi/search.pl by name            OFF_CACHE_TTL_SEARCH_HOURS   (24)
+#   category  /cgi/search.pl by category tag    OFF_CACHE_TTL_CATEGORY_HOURS (24)
+#
+# Stale-while-revalidate: for OFF_CACHE_STALE_HOURS after its TTL an entry is
+# still served, and a detached `python off_cache.py refresh` process fetches
+# a fresh copy in the background (through the same OffClient, so with the
+# same timeouts, retries and User-Agent), so the request never waits on OFF. Older
+# entries count as misses. The file is capped at OFF_CACHE_MAX_MB (LRU).
+#
+#   python off_cache.py stats
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import subprocess
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from disk_cache import DiskCache
+
+OFF_CACHE_CONFIG = {
+    "ENABLED": os.getenv("OFF_CACHE", "1") == "1",
+    "PATH": os.getenv("OFF_CACHE_PATH", os.path.join("cache", "off_responses.sqlite3")),
+    "MAX_BYTES": int(float(os.getenv("OFF_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    "TTL_S": {
+        "product": float(os.getenv("OFF_CACHE_TTL_PRODUCT_HOURS", "168")) * 3600,
+        "search": float(os.getenv("OFF_CACHE_TTL_SEARCH_HOURS", "24")) * 3600,
+        "category": float(os.getenv("OFF_CACHE_TTL_CATEGORY_HOURS", "24")) * 3600,
+    },
+    "STALE_S": float(os.getenv("OFF_CACHE_STALE_HOURS", "72")) * 3600,
+    "REVALIDATE": os.getenv("OFF_CACHE_REVALIDATE", "1") == "1",
+    "REFRESH_LOCK_S": 60,
+}
+
+_REFRESH_SCHEMA = "CREATE TABLE IF NOT EXISTS off_refresh (key TEXT PRIMARY KEY, started REAL NOT NULL)"
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def endpoint_of(url: str, params: Dict) -> str:
+    path = urlsplit(url).path
+    if "/product/" in path:
+        return "product"
+    return "category" if "tag_0" in params else "search"
+
+
+def normalize_request(url: str, params: Dict) -> Tuple[str, Dict]:
+    """(scheme://host/path, params) with equivalent requests mapped to the same value"""
+    parts = urlsplit(url)
+    base = f"{parts.scheme}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+    normalized = {}
+    for key, value in params.items():
+        value = str(value)
+        if key == "search_terms":
+            value = _SPACES_RE.sub(" ", value).strip().lower()
+        elif key == "fields":
+            value = ",".join(sorted(set(f.strip() for f in value.split(",") if f.strip())))
+        elif key == "tag_0":
+            value = value.strip().lower()
+        normalized[key] = value
+    return base, dict(sorted(normalized.items()))
+
+
+def cache_key(url: str, params: Dict) -> str:
+    base, normalized = normalize_request(url, params)
+    return f"{endpoint_of(url, params)}:{base}?{urlencode(normalized)}"
+
+
+class OffResponseCache:
+    def __init__(self, path: str, max_bytes: int):
+        self._cache = DiskCache(path, "off_responses", max_bytes)
+        self._cache.execute(_REFRESH_SCHEMA)
+
+    def lookup(self, url: str, params: Dict) -> Tuple[Optional[Dict], str]:
+        """(body, "fresh" | "stale" | "miss") for a request"""
+        endpoint = endpoint_of(url, params)
+        ttl = OFF_CACHE_CONFIG["TTL_S"][endpoint]
+        entry = self._cache.get_entry(cache_key(url, params), track=False, max_age=ttl + OFF_CACHE_CONFIG["STALE_S"])
+        self._cache.record_lookup(entry is not None)
+        if entry is None:
+            return None, "miss"
+        raw, age = entry
+        if age > ttl:
+            self._cache.bump("stale_hits")
+            return json.loads(raw), "stale"
+        return json.loads(raw), "fresh"
+
+    def store(self, url: str, params: Dict, body: Dict):
+        self._cache.put_json(cache_key(url, params), body)
+
+    def claim_refresh(self, url: str, params: Dict) -> bool:
+        """True for the first caller to revalidate this entry within REFRESH_LOCK_S"""
+        key, now = cache_key(url, params), time.time()
+        self._cache.execute(
+            "INSERT INTO off_refresh (key, started) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET started = excluded.started WHERE started < ?",
+            (key, now, now - OFF_CACHE_CONFIG["REFRESH_LOCK_S"]),
+        )
+        rows = self._cache.execute("SELECT started FROM off_refresh WHERE key = ?", (key,))
+        return bool(rows) and rows[0][0] == now
+
+    def release_refresh(self, url: str, params: Dict):
+        self._cache.execute("DELETE FROM off_refresh WHERE key = ?", (cache_key(url, params),))
+
+    def revalidate(self, url: str, params: Dict):
+        """Refresh a stale entry in a detached process, so this request does not wait"""
+        if not OFF_CACHE_CONFIG["REVALIDATE"] or not self.claim_refresh(url, params):
+            return
+        request = json.dumps({"url": url, "params": params})
+        try:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "refresh", request],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                close_fds=True, start_new_session=True,
+            )
+            self._cache.bump("revalidations")
+        except OSError as e:
+            self.release_refresh(url, params)
+            sys.stderr.write(f"OFF cache revalidation failed to start: {str(e)}\n")
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+_off_cache = None
+
+
+def get_off_cache() -> Optional[OffResponseCache]:
+    """Process-wide OffResponseCache, or None when OFF_CACHE=0 or the file cannot be opened"""
+    global _off_cache
+    if not OFF_CACHE_CONFIG["ENABLED"]:
+        return None
+    if _off_cache is None:
+        try:
+            _off_cache = OffResponseCache(OFF_CACHE_CONFIG["PATH"], OFF_CACHE_CONFIG["MAX_BYTES"])
+        except Exception as e:
+            sys.stderr.write(f"OFF cache disabled: {str(e)}\n")
+            OFF_CACHE_CONFIG["ENABLED"] = False
+            return None
+    return _off_cache
+
+
+def _cached_body(cache: OffResponseCache, url: str, params: Dict) -> Optional[Dict]:
+    try:
+        body, state = cache.lookup(url, params)
+        if state == "stale":
+            cache.revalidate(url, params)
+        return body
+    except Exception as e:
+        sys.stderr.write(f"OFF cache read failed: {str(e)}\n")
+        return None
+
+
+def _store(cache: OffResponseCache, url: str, params: Dict, body: Optional[Dict]):
+    if body is None:
+        return
+    try:
+        cache.store(url, params, body)
+    except Exception as e:
+        sys.stderr.write(f"OFF cache write failed: {str(e)}\n")
+
+
+async def cached_get_async(url: str, params: Dict, fetch: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+    """JSON body for a GET, from cache when fresh or stale, else await fetch() (cached if not None)"""
+    cache = get_off_cache()
+    if cache is None:
+        return await fetch()
+    body = _cached_body(cache, url, params)
+    if body is not None:
+        return body
+    body = await fetch()
+    _store(cache, url, params, body)
+    return body
+
+
+def refresh(url: str, params: Dict):
+    """Re-fetch one request and overwrite its entry (run by revalidate())"""
+    from off_client import OffClient, OffClientError
+
+    cache = get_off_cache()
+
+    async def run():
+        async with OffClient() as client:
+            return await client.get_json(endpoint_of(url, params), url, params, cached=False)
+
+    try:
+        cache.store(url, params, asyncio.run(run()))
+    except OffClientError as e:
+        sys.stderr.write(f"{str(e)}\n")
+    finally:
+        cache.release_refresh(url, params)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "refresh":
+        request = json.loads(sys.argv[2])
+        refresh(request["url"], request["params"])
+    else:
+        cache = get_off_cache()
+        print(json.dumps(cache.stats() if cache else {"enabled": False}, indent=2))
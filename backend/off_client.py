@@ -0,0 +1,183 @@
+# off_client.py
+#
+# Shared async OpenFoodFacts client used by food_lookup.py and
+# extract_product.py.
+#
+# One aiohttp session per process, so every call after the first reuses a
+# kept-alive TLS connection instead of paying a new TCP + TLS handshake.
+#   * connection pool with a per-host cap (OFF_LIMIT_PER_HOST), which also
+#     bounds how hard concurrent category fetches hit OFF
+#   * DNS answers cached for OFF_DNS_TTL seconds
+#   * explicit connect/total timeouts per endpoint (product, search, category)
+#   * retries on connection errors, timeouts and 429/5xx, with exponential
+#     backoff plus jitter, honouring Retry-After
+#   * TLS certificates are verified
+# Responses go through the shared OFF response cache (off_cache.py) and the
+# session is only opened on a cache miss, so a fully cached lookup never
+# imports aiohttp.
+
+import os
+import json
+import random
+import asyncio
+from typing import Dict, List, Optional
+
+from off_cache import cached_get_async
+
+OFF_CLIENT_CONFIG = {
+    "BASE_URL": os.getenv("OFF_API_BASE_URL", "https://world.openfoodfacts.org"),
+    "USER_AGENT": "NutriwiseScanner/3.0 (Fix)",
+    "LIMIT": 20,
+    "LIMIT_PER_HOST": int(os.getenv("OFF_LIMIT_PER_HOST", "6")),
+    "DNS_TTL": int(os.getenv("OFF_DNS_TTL", "300")),
+    "KEEPALIVE_S": 30,
+    # endpoint -> (connect, total) seconds
+    "TIMEOUTS": {
+        "product": (5, 10),
+        "search": (5, 20),
+        "category": (5, 20),
+    },
+    "RETRIES": int(os.getenv("OFF_RETRIES", "3")),
+    "BACKOFF_S": 0.5,
+    "BACKOFF_MAX_S": 8.0,
+    "RETRY_STATUSES": (429, 500, 502, 503, 504),
+}
+
+
+class OffClientError(Exception):
+    """A request that still failed after all retries"""
+
+    def __init__(self, endpoint: str, url: str, attempts: int, status: Optional[int] = None, reason: str = ""):
+        self.endpoint = endpoint
+        self.url = url
+        self.attempts = attempts
+        self.status = status
+        detail = f"HTTP {status}" if status else reason
+        super().__init__(f"OpenFoodFacts {endpoint} request failed after {attempts} attempt(s): {detail}")
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry number `attempt` (1-based)"""
+    if retry_after:
+        try:
+            return min(float(retry_after), OFF_CLIENT_CONFIG["BACKOFF_MAX_S"])
+        except ValueError:
+            pass
+    delay = OFF_CLIENT_CONFIG["BACKOFF_S"] * (2 ** (attempt - 1))
+    return min(delay, OFF_CLIENT_CONFIG["BACKOFF_MAX_S"]) * random.uniform(0.5, 1.0)
+
+
+def decode_body(endpoint: str, url: str, attempt: int, body: bytes) -> Dict:
+    """JSON object of a 200 response; anything else (HTML error page, truncated JSON) raises OffClientError"""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise OffClientError(endpoint, url, attempt, reason=f"invalid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise OffClientError(endpoint, url, attempt, reason=f"expected a JSON object, got {type(data).__name__}")
+    return data
+
+
+class OffClient:
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or OFF_CLIENT_CONFIG["BASE_URL"]).rstrip("/")
+        self._session = None
+        self._aiohttp = None
+        self._session_lock = asyncio.Lock()
+        # Response body bytes downloaded by this client (cache hits excluded)
+        self.bytes_received = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get_session(self):
+        async with self._session_lock:
+            if self._session is None:
+                import aiohttp
+                self._aiohttp = aiohttp
+                connector = aiohttp.TCPConnector(
+                    limit=OFF_CLIENT_CONFIG["LIMIT"],
+                    limit_per_host=OFF_CLIENT_CONFIG["LIMIT_PER_HOST"],
+                    ttl_dns_cache=OFF_CLIENT_CONFIG["DNS_TTL"],
+                    keepalive_timeout=OFF_CLIENT_CONFIG["KEEPALIVE_S"],
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector, headers={"User-Agent": OFF_CLIENT_CONFIG["USER_AGENT"]}
+                )
+            return self._session
+
+    async def _fetch(self, endpoint: str, url: str, params: Dict) -> Dict:
+        session = await self._get_session()
+        aiohttp = self._aiohttp
+        connect, total = OFF_CLIENT_CONFIG["TIMEOUTS"][endpoint]
+        timeout = aiohttp.ClientTimeout(total=total, sock_connect=connect)
+        attempts = OFF_CLIENT_CONFIG["RETRIES"] + 1
+
+        for attempt in range(1, attempts + 1):
+            retry_after = None
+            try:
+                async with session.get(url, params=params, timeout=timeout) as response:
+                    if response.status == 200:
+                        body = await response.read()
+                        self.bytes_received += len(body)
+                        return decode_body(endpoint, url, attempt, body)
+                    if response.status not in OFF_CLIENT_CONFIG["RETRY_STATUSES"] or attempt == attempts:
+                        raise OffClientError(endpoint, url, attempt, status=response.status)
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt == attempts:
+                    raise OffClientError(endpoint, url, attempt, reason=f"{type(e).__name__}: {e}") from e
+            except aiohttp.ClientError as e:
+                # Not worth retrying (bad URL, redirect loop, ...)
+                raise OffClientError(endpoint, url, attempt, reason=f"{type(e).__name__}: {e}") from e
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        raise OffClientError(endpoint, url, attempts)
+
+    async def get_json(self, endpoint: str, url: str, params: Dict, cached: bool = True) -> Dict:
+        """JSON body of a GET, via the shared OFF response cache unless cached=False; raises OffClientError"""
+        if not cached:
+            return await self._fetch(endpoint, url, params)
+        return await cached_get_async(url, params, lambda: self._fetch(endpoint, url, params))
+
+    # --- endpoints ---
+
+    async def product(self, barcode: str, fields: str, cached: bool = True) -> Optional[Dict]:
+        url = f"{self.base_url}/api/v2/product/{barcode}"
+        data = await self.get_json("product", url, {"fields": fields}, cached=cached)
+        return data.get("product")
+
+    async def search(self, terms: str, page_size: int, fields: str, sort_by: Optional[str] = None) -> List[Dict]:
+        url = f"{self.base_url}/cgi/search.pl"
+        params = {
+            "search_terms": terms, "search_simple": 1, "action": "process",
+            "json": 1, "page_size": page_size, "fields": fields,
+        }
+        if sort_by:
+            params["sort_by"] = sort_by
+        data = await self.get_json("search", url, params)
+        return data.get("products", [])
+
+    async def category(self, category_tag: str, page_size: int, fields: str, page: int = 1) -> List[Dict]:
+        url = f"{self.base_url}/cgi/search.pl"
+        params = {
+            "tagtype_0": "categories",
+            "tag_contains_0": "contains",
+            "tag_0": category_tag,
+            "action": "process",
+            "json": 1,
+            "page_size": page_size,
+            "sort_by": "popularity",
+            "fields": fields,
+        }
+        if page > 1:
+            params["page"] = page
+        data = await self.get_json("category", url, params)
+        return data.get("products", [])
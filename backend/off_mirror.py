@@ -0,0 +1,351 @@
+# off_mirror.py
+#
+# Local OpenFoodFacts mirror: a compact SQLite copy of an OFF dump holding
+# only the fields food_lookup.py and extract_product.py read, with a barcode
+# key, a full-text name/brand index and a category index.
+#
+#   python off_mirror.py ingest <dump.jsonl[.gz] | dump.csv[.gz] | -> [--out PATH]
+#   python off_mirror.py search "greek yogurt" [--limit 20]
+#   python off_mirror.py barcode 3017620422003
+#
+# The dump is streamed, so the full OFF export (tens of GB) never has to fit
+# in memory. Ingest writes to <out>.tmp and renames it over the old mirror,
+# so running lookups keep working during a rebuild.
+#
+# Lookups use it when OFF_BACKEND=local (or auto, when the mirror file
+# exists); OFF_MIRROR_PATH points at the file. Name search mirrors OFF's
+# simple search: products containing every query word, most popular first,
+# falling back to products containing the most query words.
+#
+# Names and brands are indexed in an FTS5 table (name_fts, one document per
+# product, keyed by the products rowid). On an SQLite build without FTS5 the
+# ingest keeps the plain indexed name_tokens table instead; search() uses
+# whichever the mirror file holds.
+
+import os
+import re
+import csv
+import sys
+import gzip
+import json
+import sqlite3
+import argparse
+import unicodedata
+from typing import Dict, Iterator, List, Optional
+
+OFF_MIRROR_CONFIG = {
+    "BACKEND": os.getenv("OFF_BACKEND", "api").lower(),  # api | local | auto
+    "PATH": os.getenv("OFF_MIRROR_PATH", os.path.join("cache", "off_mirror.sqlite3")),
+    "BATCH_ROWS": 5000,
+}
+
+# Union of the `fields=` lists the two lookup scripts send to the OFF API
+PRODUCT_FIELDS = (
+    "code", "product_name", "brands", "image_url", "ingredients_text",
+    "labels_tags", "allergens_tags", "categories_tags",
+)
+NUTRIMENT_FIELDS = (
+    "energy-kcal_100g", "energy-kcal", "energy-kj_100g", "proteins_100g", "fat_100g",
+    "saturated-fat_100g", "carbohydrates_100g", "fiber_100g", "sugars_100g", "salt_100g",
+)
+TAG_FIELDS = ("labels_tags", "allergens_tags", "categories_tags")
+
+_SCHEMA = """
+CREATE TABLE products (
+    code TEXT PRIMARY KEY,
+    popularity INTEGER NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE name_tokens (
+    token TEXT NOT NULL,
+    code TEXT NOT NULL
+);
+CREATE TABLE categories (
+    tag TEXT NOT NULL,
+    code TEXT NOT NULL,
+    popularity INTEGER NOT NULL
+);
+"""
+_INDEXES = """
+CREATE INDEX categories_tag ON categories (tag, popularity DESC);
+"""
+# Words are already folded by tokenize(), so FTS5 only has to split on spaces
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE name_fts USING fts5(words, content='', tokenize=\"unicode61 remove_diacritics 0 tokenchars '_'\")"
+_TOKEN_INDEX = "CREATE INDEX name_tokens_token ON name_tokens (token, code)"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case, accent-folded word tokens (same words OFF's simple search matches on)"""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text)
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(folded.lower())
+
+
+# --- DUMP READING ---
+
+def _open_text(path: str):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_csv(path: str) -> Iterator[Dict]:
+    """OFF's CSV export: tab-separated, flat nutriment columns, comma-joined tags"""
+    csv.field_size_limit(sys.maxsize)
+    with _open_text(path) as f:
+        for row in csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            product = {key: row.get(key) for key in PRODUCT_FIELDS if key not in TAG_FIELDS}
+            for key in TAG_FIELDS:
+                product[key] = [t for t in (row.get(key) or "").split(",") if t]
+            product["nutriments"] = {key: row[key] for key in NUTRIMENT_FIELDS if row.get(key)}
+            product["unique_scans_n"] = row.get("unique_scans_n")
+            yield product
+
+
+def read_dump(path: str) -> Iterator[Dict]:
+    name = path[:-3] if path.endswith(".gz") else path
+    return read_csv(path) if name.endswith((".csv", ".tsv")) else read_jsonl(path)
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def compact_product(raw: Dict) -> Optional[Dict]:
+    """The subset of an OFF product the lookup scripts use, or None if it has no barcode"""
+    code = str(raw.get("code") or raw.get("_id") or "").strip()
+    if not code:
+        return None
+    product = {"code": code}
+    for key in PRODUCT_FIELDS[1:]:
+        value = raw.get(key)
+        if value:
+            product[key] = value
+    nutriments = raw.get("nutriments") or {}
+    kept = {}
+    for key in NUTRIMENT_FIELDS:
+        value = _number(nutriments.get(key))
+        if value is not None:
+            kept[key] = value
+    product["nutriments"] = kept
+    return product
+
+
+def popularity(raw: Dict) -> int:
+    for key in ("popularity_key", "unique_scans_n", "scans_n"):
+        value = _number(raw.get(key))
+        if value is not None:
+            return int(value)
+    return 0
+
+
+# --- INGEST ---
+
+def ingest(source: str, out_path: str) -> Dict:
+    """Stream a dump into a fresh mirror at out_path; returns ingest counts"""
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(_SCHEMA)
+
+    counts = {"read": 0, "stored": 0, "skipped": 0}
+    products, tokens, categories = [], [], []
+
+    def flush():
+        conn.executemany("INSERT OR REPLACE INTO products (code, popularity, doc) VALUES (?, ?, ?)", products)
+        conn.executemany("INSERT INTO name_tokens (token, code) VALUES (?, ?)", tokens)
+        conn.executemany("INSERT INTO categories (tag, code, popularity) VALUES (?, ?, ?)", categories)
+        conn.commit()
+        products.clear()
+        tokens.clear()
+        categories.clear()
+
+    for raw in read_dump(source):
+        counts["read"] += 1
+        product = compact_product(raw)
+        if product is None or not product.get("product_name"):
+            counts["skipped"] += 1
+            continue
+        code, score = product["code"], popularity(raw)
+        products.append((code, score, json.dumps(product, separators=(",", ":"), ensure_ascii=False)))
+        words = set(tokenize(product.get("product_name", ""))) | set(tokenize(product.get("brands", "")))
+        tokens.extend((word, code) for word in words)
+        categories.extend((tag, code, score) for tag in set(product.get("categories_tags") or []))
+        counts["stored"] += 1
+        if len(products) >= OFF_MIRROR_CONFIG["BATCH_ROWS"]:
+            flush()
+    flush()
+
+    # A barcode repeated in the dump leaves duplicate index rows behind
+    conn.execute("DELETE FROM name_tokens WHERE rowid NOT IN (SELECT MIN(rowid) FROM name_tokens GROUP BY token, code)")
+    conn.execute("DELETE FROM categories WHERE rowid NOT IN (SELECT MIN(rowid) FROM categories GROUP BY tag, code)")
+    conn.executescript(_INDEXES)
+    counts["name_index"] = _build_name_index(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp_path, out_path)
+    counts["bytes"] = os.path.getsize(out_path)
+    return counts
+
+
+def _build_name_index(conn: sqlite3.Connection) -> str:
+    """Move the staged name_tokens into name_fts; keeps them as an indexed table without FTS5"""
+    try:
+        conn.execute(_FTS_SCHEMA)
+    except sqlite3.OperationalError as e:
+        sys.stderr.write(f"FTS5 unavailable ({str(e)}), indexing names in name_tokens\n")
+        conn.execute(_TOKEN_INDEX)
+        return "name_tokens"
+    conn.execute(
+        """
+        INSERT INTO name_fts (rowid, words)
+        SELECT p.rowid, group_concat(t.token, ' ') FROM name_tokens AS t
+        JOIN products AS p ON p.code = t.code GROUP BY t.code
+        """
+    )
+    conn.execute("INSERT INTO name_fts (name_fts) VALUES ('optimize')")
+    conn.execute("DROP TABLE name_tokens")
+    return "fts5"
+
+
+# --- LOOKUPS ---
+
+class OffMirror:
+    """Read-only queries against a mirror built by ingest()"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or OFF_MIRROR_CONFIG["PATH"]
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"OFF mirror not found: {self.path} (run off_mirror.py ingest first)")
+        uri = "file:" + os.path.abspath(self.path) + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.fts = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'name_fts'"
+        ).fetchone() is not None
+
+    def close(self):
+        self._conn.close()
+
+    def by_barcode(self, code: str) -> Optional[Dict]:
+        row = self._conn.execute("SELECT doc FROM products WHERE code = ?", (str(code).strip(),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, name: str, limit: int = 20) -> List[Dict]:
+        """Products matching every word of name (else the most words), most popular first"""
+        words = list(dict.fromkeys(tokenize(name)))
+        if not words:
+            return []
+        if self.fts:
+            # One FTS lookup per word; the union counts how many words each product has
+            per_word = " UNION ALL ".join(["SELECT rowid FROM name_fts WHERE name_fts MATCH ?"] * len(words))
+            matches = f"SELECT rowid, COUNT(*) AS matched FROM ({per_word}) GROUP BY rowid"
+            join = "p.rowid = m.rowid"
+            params = [f'"{word}"' for word in words]
+        else:
+            placeholders = ",".join("?" * len(words))
+            matches = f"SELECT code, COUNT(*) AS matched FROM name_tokens WHERE token IN ({placeholders}) GROUP BY code"
+            join = "p.code = m.code"
+            params = words
+        rows = self._conn.execute(
+            f"""
+            SELECT p.doc FROM ({matches}) AS m JOIN products AS p ON {join}
+            ORDER BY m.matched DESC, p.popularity DESC
+            LIMIT ?
+            """,
+            (*params, limit),
+        ).fetchall()
+        return [json.loads(doc) for (doc,) in rows]
+
+    def by_category(self, tag: str, limit: int, offset: int = 0) -> List[Dict]:
+        rows = self._conn.execute(
+            """
+            SELECT p.doc FROM categories AS c JOIN products AS p ON p.code = c.code
+            WHERE c.tag = ? ORDER BY c.popularity DESC, c.code LIMIT ? OFFSET ?
+            """,
+            (tag, limit, offset),
+        ).fetchall()
+        return [json.loads(doc) for (doc,) in rows]
+
+    def category_tags(self, limit: int) -> List[str]:
+        """The limit categories holding the most products"""
+        rows = self._conn.execute(
+            "SELECT tag FROM categories GROUP BY tag ORDER BY COUNT(*) DESC, tag LIMIT ?", (limit,)
+        ).fetchall()
+        return [tag for (tag,) in rows]
+
+
+def use_local_mirror() -> bool:
+    """Whether lookups should go to the local mirror instead of the OFF API"""
+    backend = OFF_MIRROR_CONFIG["BACKEND"]
+    if backend == "local":
+        return True
+    return backend == "auto" and os.path.exists(OFF_MIRROR_CONFIG["PATH"])
+
+
+_mirror = None
+
+
+def get_mirror() -> OffMirror:
+    global _mirror
+    if _mirror is None:
+        _mirror = OffMirror()
+    return _mirror
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the local OpenFoodFacts mirror")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Stream an OFF JSONL/CSV dump into the mirror")
+    p_ingest.add_argument("dump", help="Path to the dump (.jsonl/.csv, optionally .gz) or - for stdin JSONL")
+    p_ingest.add_argument("--out", default=OFF_MIRROR_CONFIG["PATH"])
+
+    p_search = sub.add_parser("search", help="Name search, as food_lookup.py runs it")
+    p_search.add_argument("name")
+    p_search.add_argument("--limit", type=int, default=20)
+
+    p_barcode = sub.add_parser("barcode", help="Barcode lookup, as extract_product.py runs it")
+    p_barcode.add_argument("code")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        print(json.dumps(ingest(args.dump, args.out)))
+    elif args.command == "search":
+        print(json.dumps(get_mirror().search(args.name, args.limit), indent=2))
+    else:
+        print(json.dumps(get_mirror().by_barcode(args.code), indent=2))
+
+
+if __name__ == "__main__":
+    main()
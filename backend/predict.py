@@ -1,23 +1,38 @@
-import tensorflow as tf
 import numpy as np
 import sys
 import json
-from PIL import Image
 import os
 import warnings
 import logging
-import cv2
-import torch
-from ultralytics import YOLO
-import google.generativeai as genai
+import argparse
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
 
-# --- LINKING TO NEW DATA FILE ---
-# We only import DISH_RECIPES for now. We will use INGREDIENT_DB later.
-from ingredients_data import DISH_RECIPES 
+# Dish recipes and macros come from ingredients_data.py and CLASS_LABELS,
+# compiled into arrays by nutrition_matrix.py
+from nutrition_matrix import get_nutrition_matrix
+from classification_batcher import ClassificationBatcher
+from classifier_backends import CLASSIFIER_BACKEND, load_classifier
+import depth_pipeline
+import gemini_portion
+from image_ingest import ingest_image
+from result_cache import get_result_cache
+import volume_estimator
+
+# Heavy dependencies (TensorFlow/onnxruntime, torch, cv2, ultralytics,
+# google.generativeai) are imported inside the stage that needs them, so a
+# low-confidence photo never pays for the depth stack and a missing
+# GEMINI_API_KEY never pays for the Gemini SDK.
+
+# Where the `weight` event comes from:
+#   auto   - Gemini when GEMINI_API_KEY is set, otherwise the local depth estimate
+#   local  - local depth-volume estimate only (no network)
+#   gemini - Gemini only, as before (500 g default when it fails)
+WEIGHT_ESTIMATOR = os.getenv("WEIGHT_ESTIMATOR", "auto").lower()
 
 # Configure silent operation
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-tf.get_logger().setLevel('ERROR')
 warnings.filterwarnings('ignore')
 logging.getLogger('PIL').setLevel(logging.WARNING)
 
@@ -127,97 +142,80 @@ CLASS_LABELS = [
 ]
 
 def load_classification_model():
-    """Load and configure the trained classification model"""
+    """Load the classifier on the backend picked by CLASSIFIER_BACKEND (keras/tflite/onnx)"""
     try:
-        model = tf.keras.models.load_model('mobilenetv2_food101.h5')
-        model.compile(optimizer='adam', 
-                     loss='sparse_categorical_crossentropy',
-                     metrics=['accuracy'],
-                     run_eagerly=True)
-        return model
+        return load_classifier(CLASSIFIER_BACKEND)
     except Exception as e:
         sys.stderr.write(f"Model loading failed: {str(e)}\n")
         return None
 
 def load_depth_models():
-    """Load YOLO and MiDaS models for depth estimation"""
+    """Load YOLO and the MiDaS model for the configured DEPTH_TIER"""
     try:
-        yolo_model = YOLO('yolov8n-seg.pt')
-        midas = torch.hub.load("intel-isl/MiDaS", "DPT_Hybrid")
-        device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
-        midas.to(device)
-        midas.eval()
-        midas_transforms = torch.hub.load("intel-isl/MiDaS", "transforms").dpt_transform
-        return yolo_model, midas, midas_transforms, device
+        return depth_pipeline.load_depth_models()
     except Exception as e:
         sys.stderr.write(f"Depth models loading failed: {str(e)}\n")
         return None, None, None, None
 
-# Load models globally
-model = load_classification_model()
-yolo_model, midas, midas_transforms, device = load_depth_models()
+# --- LAZY MODEL LOADING ---
+# Each model is loaded the first time its stage runs and then kept for the
+# life of the process (which matters in worker mode).
+_NOT_LOADED = object()
+_classifier = _NOT_LOADED
+_depth_models = _NOT_LOADED
+_model_lock = threading.Lock()
 
-def preprocess_image(image_path):
-    """Preprocess image for model prediction"""
-    try:
-        img = Image.open(image_path).convert('RGB').resize((224, 224))
-        img_array = np.array(img) / 127.5 - 1.0  # MobileNetV2 preprocessing
-        return np.expand_dims(img_array, axis=0)
-    except Exception as e:
-        raise ValueError(f"Image processing failed: {str(e)}")
+def get_classifier():
+    """Return the classifier, loading it on first use (None if loading failed)"""
+    global _classifier
+    if _classifier is _NOT_LOADED:
+        with _model_lock:
+            if _classifier is _NOT_LOADED:
+                _classifier = load_classification_model()
+    return _classifier
+
+def get_depth_models():
+    """Return (yolo_model, midas, midas_transforms, device), loading them on first use"""
+    global _depth_models
+    if _depth_models is _NOT_LOADED:
+        with _model_lock:
+            if _depth_models is _NOT_LOADED:
+                _depth_models = load_depth_models()
+    return _depth_models
+
+# Set in worker mode so concurrent jobs share classifier forward passes
+batcher = None
 
-def generate_depth_map(image_path):
-    """Generate and store depth map image in backend folder"""
-    if yolo_model is None or midas is None:
-        return
+# TF/torch models are not safe to drive from several threads at once: the
+# classifier has its own lock (jobs without a batcher call it directly), the
+# depth models share _inference_lock
+_classifier_lock = threading.Lock()
+_inference_lock = threading.Lock()
+
+# Step 2 runs the torch-bound depth stage and the network-bound Gemini call
+# side by side instead of one after the other
+_stage_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="predict-stage")
+
+def preprocess_image(image):
+    """Classifier input (float32, 1x224x224x3) for an ingested photo or an image path"""
+    if isinstance(image, str):
+        image = ingest_image(image)
+    return image.classifier_tensor()
+
+def generate_depth_map(image_path, ingested=None):
+    """Generate and store depth map image in backend folder; returns (height_map, mask) at working resolution"""
+    models = get_depth_models()
+    if models[0] is None or models[1] is None:
+        return None
 
     try:
-        pil_image = Image.open(image_path).convert("RGB")
-        w, h = pil_image.size
-        img_np = np.array(pil_image)
+        import cv2
 
-        results = yolo_model(pil_image, verbose=False)
-        target_mask = np.zeros((h, w), dtype=np.uint8)
-        
-        if results[0].masks is not None:
-            boxes = results[0].boxes.data.cpu().numpy()
-            masks = results[0].masks.data.cpu().numpy()
-            
-            for i, box in enumerate(boxes):
-                class_id = int(box[5])
-                mask_resized = cv2.resize(masks[i], (w, h))
-                if class_id not in [0, 60, 61]:
-                    target_mask = np.maximum(target_mask, mask_resized)
-
-        if np.sum(target_mask) == 0:
-            center_x, center_y = w // 2, h // 2
-            radius = min(w, h) // 3
-            Y, X = np.ogrid[:h, :w]
-            dist_from_center = np.sqrt((X - center_x)**2 + (Y - center_y)**2)
-            target_mask[dist_from_center <= radius] = 1
-
-        input_batch = midas_transforms(img_np).to(device)
-        with torch.no_grad():
-            prediction = midas(input_batch)
-            prediction = torch.nn.functional.interpolate(
-                prediction.unsqueeze(1), size=(h, w), mode="bicubic", align_corners=False
-            ).squeeze()
-        
-        depth_map = prediction.cpu().numpy()
-        d_min, d_max = depth_map.min(), depth_map.max()
-        depth_norm = (depth_map - d_min) / (d_max - d_min) if (d_max - d_min) > 0 else depth_map
-        
-        masked_depth = depth_norm * target_mask
-        dilated = cv2.dilate(target_mask, np.ones((10,10), np.uint8), iterations=1)
-        ring = dilated - target_mask
-        floor = np.median(depth_norm[ring == 1]) if np.sum(ring) > 0 else 0
-        
-        height_map = masked_depth - floor
-        height_map[height_map < 0] = 0
-        peak = np.max(height_map) if np.max(height_map) > 0 else 1
+        ingested = ingested or ingest_image(image_path)
+        height_map, target_mask = depth_pipeline.compute_height_map(models, ingested.depth_image())
 
-        res_image = (height_map / peak * 255).astype(np.uint8)
-        res_image_colored = cv2.applyColorMap(res_image, cv2.COLORMAP_JET)
+        out_size = ingested.original_size if depth_pipeline.DEPTH_CONFIG["SAVE_FULL_RES"] else None
+        res_image_colored = depth_pipeline.colorize(height_map, out_size)
         
         output_dir = "depth_maps"
         if not os.path.exists(output_dir):
@@ -226,136 +224,188 @@ def generate_depth_map(image_path):
         filename = os.path.basename(image_path)
         save_path = os.path.join(output_dir, f"depth_{filename}")
         cv2.imwrite(save_path, res_image_colored)
+        return height_map, target_mask
         
     except Exception as e:
         sys.stderr.write(f"Error generating depth map: {str(e)}\n")
+        return None
 
 # --- UPDATED GEMINI FUNCTION ---
-def estimate_weight_with_gemini(image_path, health_conds, remaining_cals):
+def estimate_weight_with_gemini(image_path, health_conds, remaining_cals, ingested=None, image_sha=None):
     """Estimate food weight AND suggest portion using Gemini API"""
     try:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            sys.stderr.write("Skipping Gemini: GEMINI_API_KEY environment variable not set.\n")
-            return None
-
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        image = Image.open(image_path)
-        
-        prompt = f"""
-        Analyze this image of food.
-        
-        Context:
-        - User Health Conditions: {health_conds}
-        - Remaining Calories for Today: {remaining_cals}
-        
-        Tasks:
-        1. Estimate the approximate weight of the food visible in grams (numeric).
-        2. Suggest a "smart portion" size (in grams or serving description) that fits the user's remaining calories and health conditions. Briefly explain why.
-        
-        Return a JSON object ONLY, like this:
-        {{
-            "weight": 150,
-            "smart_portion": "Consume only 100g because..."
-        }}
-        """
-        
-        response = model.generate_content([prompt, image])
-        text = response.text.strip()
-        
-        # Clean markdown if present
-        if "```json" in text:
-            text = text.replace("```json", "").replace("```", "")
-        text = text.strip()
-        
-        # Parse JSON
-        data = json.loads(text)
-        
         # Return the WHOLE data object, not just the string
-        return data 
+        return gemini_portion.estimate_portion(
+            image_path, health_conds, remaining_cals,
+            load_image=lambda: (ingested or ingest_image(image_path)).upload_image(),
+            image_sha=image_sha,
+        )
         
     except Exception as e:
         sys.stderr.write(f"Gemini API Error: {str(e)}\n")
         return None
 
+def predict_batch(img_batch):
+    """Run the classifier on an (N, 224, 224, 3) batch"""
+    classifier = get_classifier()
+    with _classifier_lock:
+        return classifier.predict(img_batch)
+
+def run_depth_stage(image_path, ingested=None):
+    """generate_depth_map under the inference lock, for use from the stage pool"""
+    with _inference_lock:
+        return generate_depth_map(image_path, ingested)
+
+def weight_event(weight_value, smart_portion_text, source):
+    """Build the `weight` NDJSON event"""
+    return {
+        'type': 'weight',
+        'success': True,
+        'weight': weight_value,
+        'smart_portion': smart_portion_text,
+        'source': source
+    }
+
+def emit_stdout(event):
+    """Write one NDJSON event to stdout and flush it immediately"""
+    print(json.dumps(event))
+    sys.stdout.flush()
+
+# --- CLASSIFICATION ---
+def classify_image(ingested):
+    """Run the classifier on an ingested photo and build the `classification` event"""
+    if get_classifier() is None:
+        raise RuntimeError("Classification model not loaded")
+
+    img_array = preprocess_image(ingested)
+    
+    if batcher is not None:
+        pred = batcher.classify(img_array)
+    else:
+        pred = predict_batch(img_array)
+    
+    class_idx = int(np.argmax(pred))
+    confidence = float(np.max(pred))
+    
+    if confidence < 0.4:
+        return {
+            'type': 'classification',
+            'success': False,
+            'message': "Couldn't predict food"
+        }
+
+    dishes = get_nutrition_matrix(CLASS_LABELS)
+    label_str = CLASS_LABELS[class_idx]
+    food_name = dishes.dish_names[class_idx]
+    ingredients_list = dishes.ingredient_lists[class_idx] or ["Ingredients info unavailable"]
+    
+    return {
+        'type': 'classification',
+        'success': True,
+        'name': food_name,
+        'ingredients': ingredients_list,
+        'full_label': label_str,
+        'confidence': f"{confidence * 100:.2f}%"
+    }
+
+def read_cache(read, *args):
+    """Read from the result cache; a cache failure (locked or corrupt file) counts as a miss"""
+    try:
+        return read(*args)
+    except Exception as e:
+        sys.stderr.write(f"Result cache read failed: {str(e)}\n")
+        return None
+
+def store_in_cache(store, *args):
+    """Write to the result cache without letting a cache failure break the response"""
+    try:
+        store(*args)
+    except Exception as e:
+        sys.stderr.write(f"Result cache write failed: {str(e)}\n")
+
 # --- UPDATED PREDICT FUNCTION ---
-def predict_and_stream(image_path, health_conds, remaining_cals):
+def predict_and_stream(image_path, health_conds, remaining_cals, emit=emit_stdout):
     try:
-        # --- STEP 1: CLASSIFICATION (FAST) ---
-        if model is None:
-             raise RuntimeError("Classification model not loaded")
+        # --- STEP 0: RESULT CACHE ---
+        # Exact file hash first (no decode needed), then the perceptual hash
+        cache = get_result_cache()
+        cache_key, cached_sha, ingested = None, None, None
+        if cache is not None:
+            cache_key = read_cache(cache.key_for, image_path)
+        if cache_key is not None:
+            cached_sha = read_cache(lambda: cache.match(cache_key, final=not cache.perceptual))
+            if cached_sha is None and cache.perceptual:
+                ingested = ingest_image(image_path)
+                cached_sha = read_cache(lambda: cache.match(cache.with_phash(cache_key, ingested)))
 
-        img_array = preprocess_image(image_path)
-        
-        with tf.device('/CPU:0'):
-            pred = model.predict(img_array, verbose=0)
-        
-        class_idx = int(np.argmax(pred))
-        confidence = float(np.max(pred))
-        
-        # Prepare Classification Result
-        classification_result = {}
-        
-        if confidence < 0.4:
-            classification_result = {
-                'type': 'classification',
-                'success': False,
-                'message': "Couldn't predict food"
-            }
-        else:
-            label_str = CLASS_LABELS[class_idx]
-            food_name = label_str.split(':')[0].strip()
-            
-            raw_recipe = DISH_RECIPES.get(food_name, {})
-            if raw_recipe:
-                ingredients_list = [f"{ing}: {qty}g" for ing, qty in raw_recipe.items()]
-            else:
-                ingredients_list = ["Ingredients info unavailable"]
-            
-            classification_result = {
-                'type': 'classification',
-                'success': True,
-                'name': food_name,
-                'ingredients': ingredients_list,
-                'full_label': label_str,
-                'confidence': f"{confidence * 100:.2f}%"
-            }
-
-        # PRINT CLASSIFICATION IMMEDIATELY & FLUSH
-        print(json.dumps(classification_result))
-        sys.stdout.flush()
+        classification_result = read_cache(cache.get_classification, cached_sha) if cached_sha else None
+        if classification_result is not None and cached_sha != cache_key.sha:
+            # Perceptual hit: keep it under this photo's SHA too, so a re-upload is an exact hit
+            store_in_cache(cache.link, cache_key, cached_sha)
+
+        if classification_result is None:
+            # --- STEP 1: CLASSIFICATION (FAST) ---
+            # Decode once; every stage below works from views of this image
+            ingested = ingested or ingest_image(image_path)
+            classification_result = classify_image(ingested)
+            if cache_key is not None:
+                store_in_cache(cache.put_classification, cache_key, classification_result)
+
+        # EMIT CLASSIFICATION IMMEDIATELY
+        emit(classification_result)
 
         if not classification_result.get('success', False):
             return 
 
+        food_name = classification_result['name']
+
         # --- STEP 2: DEPTH & WEIGHT (SLOW) ---
-        generate_depth_map(image_path)
-        
-        # Get Gemini Data
-        gemini_data = estimate_weight_with_gemini(image_path, health_conds, remaining_cals)
-        
-        weight_value = 500.0
-        smart_portion_text = "No specific recommendation available."
+        depth_result = read_cache(cache.get_depth, cached_sha) if cached_sha else None
+        if depth_result is None:
+            ingested = ingested or ingest_image(image_path)
 
+        gemini_future = None
+        if WEIGHT_ESTIMATOR != 'local':
+            image_sha = cached_sha or (cache_key.sha if cache_key else None)
+            gemini_future = _stage_pool.submit(
+                estimate_weight_with_gemini, image_path, health_conds, remaining_cals, ingested, image_sha
+            )
+        depth_future = None
+        if depth_result is None:
+            depth_future = _stage_pool.submit(run_depth_stage, image_path, ingested)
+
+        # Gemini answers are emitted as soon as they arrive, even while the
+        # depth map is still being computed
+        gemini_data = gemini_future.result() if gemini_future else None
         if gemini_data:
-            # Extract values safely
-            weight_value = float(gemini_data.get("weight", 500))
-            smart_portion_text = gemini_data.get("smart_portion", "No specific recommendation available.")
-
-        # Prepare Weight Result with Smart Portion
-        weight_result = {
-            'type': 'weight',
-            'success': True,
-            'weight': weight_value,
-            'smart_portion': smart_portion_text, # <--- ADDED THIS FIELD
-            'source': 'Gemini' if gemini_data else 'Default'
-        }
+            emit(weight_event(
+                float(gemini_data.get("weight", 500)),
+                gemini_data.get("smart_portion", "No specific recommendation available."),
+                'Gemini'
+            ))
+
+        if depth_future is not None:
+            depth_result = depth_future.result()
+            if depth_result is not None and cache_key is not None:
+                store_in_cache(cache.put_depth, cache_key, *depth_result)
+        if gemini_data:
+            return
+
+        local_estimate = None
+        if depth_result is not None and WEIGHT_ESTIMATOR != 'gemini':
+            local_estimate = volume_estimator.estimate_weight(food_name, *depth_result)
 
-        # PRINT WEIGHT RESULT TO STDOUT
-        print(json.dumps(weight_result))
-        sys.stdout.flush()
+        if local_estimate:
+            weight_value = local_estimate['weight']
+            emit(weight_event(
+                weight_value,
+                volume_estimator.smart_portion(
+                    get_nutrition_matrix(CLASS_LABELS).kcal_per_gram(food_name), weight_value, remaining_cals
+                ),
+                'Depth'
+            ))
+        else:
+            emit(weight_event(500.0, "No specific recommendation available.", 'Default'))
 
     except Exception as e:
         error_msg = {
@@ -363,13 +413,141 @@ def predict_and_stream(image_path, health_conds, remaining_cals):
             'success': False,
             'error': str(e)
         }
-        print(json.dumps(error_msg))
-        sys.stdout.flush()
+        emit(error_msg)
+
+# --- WORKER MODE ---
+# Models are loaded once at start-up, so a long-lived worker only pays the
+# TensorFlow/torch start-up cost a single time. Jobs arrive as JSON lines:
+#   {"id": "abc", "image_path": "...", "health_conds": {...}, "remaining_cals": 1500}
+# and every event written back carries the job "id", followed by a final
+# {"type": "done"} event so the caller knows the stream for that job is over.
+# Jobs run concurrently; classification goes through the shared batcher (or
+# _classifier_lock when batching is off) and the depth stage is serialised by
+# _inference_lock. server.js starts one stdin worker at boot
+# (services/predictWorker.js) and sends every /api/predict upload to it.
+
+def run_job(job, write_line):
+    """Run one worker job and write its tagged NDJSON events with write_line"""
+    job_id = job.get('id') if isinstance(job, dict) else None
+
+    def emit(event):
+        if job_id is not None:
+            event = {**event, 'id': job_id}
+        write_line(json.dumps(event))
+
+    try:
+        if not isinstance(job, dict) or not job.get('image_path'):
+            raise ValueError("Job must be a JSON object with an 'image_path'")
+
+        health_conds = job.get('health_conds', "{}")
+        if not isinstance(health_conds, str):
+            health_conds = json.dumps(health_conds)
+        remaining_cals = str(job.get('remaining_cals', "2000"))
+
+        predict_and_stream(job['image_path'], health_conds, remaining_cals, emit=emit)
+    except Exception as e:
+        emit({'type': 'error', 'success': False, 'error': str(e)})
+    finally:
+        emit({'type': 'done'})
+
+def parse_job(line):
+    """Decode a job line, returning an error event instead of raising"""
+    try:
+        return json.loads(line), None
+    except json.JSONDecodeError as e:
+        return None, {'type': 'error', 'success': False, 'error': f"Invalid job JSON: {str(e)}"}
+
+def serve_stdin(concurrency=4):
+    """Read jobs from stdin and stream results to stdout until EOF"""
+    write_lock = threading.Lock()
+
+    def write_line(line):
+        with write_lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            job, error = parse_job(line)
+            if error:
+                write_line(json.dumps(error))
+                continue
+            pool.submit(run_job, job, write_line)
+
+class JobRequestHandler(socketserver.StreamRequestHandler):
+    """Serve JSON-line jobs sent over one socket connection"""
+
+    def handle(self):
+        def write_line(line):
+            self.wfile.write((line + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+        for raw in self.rfile:
+            line = raw.decode('utf-8').strip()
+            if not line:
+                continue
+            job, error = parse_job(line)
+            if error:
+                write_line(json.dumps(error))
+                continue
+            run_job(job, write_line)
+
+def serve_socket(socket_path=None, port=None):
+    """Accept jobs on a local Unix socket, or on 127.0.0.1:<port>"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, JobRequestHandler)
+    else:
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', port), JobRequestHandler)
+    server.daemon_threads = True
+
+    sys.stderr.write(f"Predict worker listening on {socket_path or f'127.0.0.1:{port}'}\n")
+    with server:
+        server.serve_forever()
+
+def worker_main(argv):
+    global batcher
+
+    parser = argparse.ArgumentParser(description="Long-lived predict.py inference worker")
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--socket', help="Unix socket path to listen on instead of stdin")
+    parser.add_argument('--port', type=int, help="Local TCP port to listen on instead of stdin")
+    parser.add_argument('--concurrency', type=int, default=4, help="Jobs processed at once in stdin mode")
+    parser.add_argument('--batch-window-ms', type=float,
+                        default=float(os.getenv("CLASSIFIER_BATCH_WINDOW_MS", "10")),
+                        help="How long the classifier waits to fill a batch")
+    parser.add_argument('--max-batch', type=int,
+                        default=int(os.getenv("CLASSIFIER_MAX_BATCH", "8")),
+                        help="Largest classifier batch (1 disables batching)")
+    args = parser.parse_args(argv)
+
+    # Load everything up front so the first job does not pay the cold start
+    get_nutrition_matrix(CLASS_LABELS)
+    classifier = get_classifier()
+    depth_models = get_depth_models()
+
+    if classifier is not None and args.max_batch > 1:
+        batcher = ClassificationBatcher(predict_batch, args.max_batch, args.batch_window_ms)
+
+    emit_stdout({'type': 'ready', 'classifier': classifier is not None, 'depth': depth_models[1] is not None})
+
+    if args.socket or args.port:
+        serve_socket(args.socket, args.port)
+    else:
+        serve_stdin(args.concurrency)
 
 if __name__ == '__main__':
+    if '--worker' in sys.argv[1:]:
+        worker_main(sys.argv[1:])
+        sys.exit(0)
+
     try:
         if len(sys.argv) < 2:
-            raise ValueError("Usage: python predict.py <image_path> [health_conds] [remaining_cals]")
+            raise ValueError("Usage: python predict.py <image_path> [health_conds] [remaining_cals] | --worker [--socket PATH | --port N]")
             
         image_path = sys.argv[1]
         # ✅ Read new arguments
@@ -0,0 +1,112 @@
+# product_record.py
+#
+# Compact, normalized view of one OpenFoodFacts product, shared by
+# food_lookup.py, extract_product.py, risk_rules.py and alternatives_index.py.
+#
+# A record is built in one pass over the OFF product dict: the per-100g
+# nutrients are parsed to floats (None when missing or unparseable) exactly
+# once, and only the fields the scripts use are kept, in __slots__ (no
+# per-instance __dict__), so the raw payload can be dropped as soon as the
+# records exist. Everything downstream (risk rules, nutrient summaries,
+# alternative candidates) reads the record instead of re-parsing
+# `nutriments`.
+#
+# Products requested from the OFF API already carry only these fields
+# (`fields=` on every request), so the body is small enough to parse whole;
+# the records are what replaces it in memory.
+
+from typing import Dict, List, Optional, Tuple
+
+# OFF nutriment keys per record attribute, first non-empty wins
+NUTRIMENT_SOURCES = (
+    ("proteins", ("proteins_100g",)),
+    ("fat", ("fat_100g",)),
+    ("saturated_fat", ("saturated-fat_100g", "saturated_fat_100g")),
+    ("carbohydrates", ("carbohydrates_100g",)),
+    ("fiber", ("fiber_100g",)),
+    ("sugars", ("sugars_100g",)),
+    ("salt", ("salt_100g",)),
+)
+
+
+def to_float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ProductRecord:
+    __slots__ = (
+        "code", "name", "brands", "image_url", "ingredients_text",
+        "labels_tags", "allergens_tags", "categories_tags", "has_nutriments",
+        "energy_kcal", "proteins", "fat", "saturated_fat", "carbohydrates", "fiber", "sugars", "salt",
+    )
+
+    def __init__(self, raw: Dict):
+        """Single pass over an OFF product dict"""
+        self.code = raw.get("code")
+        self.name = raw.get("product_name")
+        self.brands = raw.get("brands")
+        self.image_url = raw.get("image_url")
+        self.ingredients_text = str(raw.get("ingredients_text") or "")
+        self.labels_tags = tuple(raw.get("labels_tags") or ())
+        self.allergens_tags = tuple(raw.get("allergens_tags") or ())
+        self.categories_tags = tuple(raw.get("categories_tags") or ())
+
+        nutriments = raw.get("nutriments") or {}
+        self.has_nutriments = bool(nutriments)
+        # kcal as sent, else converted from kJ
+        energy = to_float(nutriments.get("energy-kcal_100g")) or to_float(nutriments.get("energy-kcal"))
+        if energy is None:
+            kj = to_float(nutriments.get("energy-kj_100g"))
+            if kj:
+                energy = round(kj / 4.184)
+        self.energy_kcal = energy
+        for attr, keys in NUTRIMENT_SOURCES:
+            value = None
+            for key in keys:
+                value = to_float(nutriments.get(key))
+                if value is not None:
+                    break
+            setattr(self, attr, value)
+
+    def nutrient_summary(self) -> Dict:
+        """The per-100g nutrients the scanner returns ({} when the product has none)"""
+        if not self.has_nutriments:
+            return {}
+        return {
+            "energy_kcal": self.energy_kcal,
+            "fat_100g": self.fat,
+            "saturated_fat_100g": self.saturated_fat,
+            "carbohydrates_100g": self.carbohydrates,
+            "sugars_100g": self.sugars,
+            "salt_100g": self.salt,
+            "proteins_100g": self.proteins,
+        }
+
+    def lookup_nutrients(self) -> Dict:
+        """The per-100g nutrients food_lookup.py returns ({} when the product has none)"""
+        if not self.has_nutriments:
+            return {}
+        return {
+            "calories_kcal_100g": self.energy_kcal,
+            "proteins_100g": self.proteins,
+            "fat_100g": self.fat,
+            "saturated_fat_100g": self.saturated_fat,
+            "carbohydrates_100g": self.carbohydrates,
+            "fiber_100g": self.fiber,
+            "sugars_100g": self.sugars,
+            "salt_100g": self.salt,
+        }
+
+    def risk_values(self) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+        """(energy_kcal, salt, sugars, saturated_fat), the columns of risk_rules.NUTRIENT_COLUMNS"""
+        return self.energy_kcal, self.salt, self.sugars, self.saturated_fat
+
+
+def as_records(products) -> List[ProductRecord]:
+    """Records for a mix of OFF dicts and records (records are passed through)"""
+    return [p if isinstance(p, ProductRecord) else ProductRecord(p) for p in products]
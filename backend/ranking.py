@@ -0,0 +1,137 @@
+# ranking.py
+#
+# BM25 ranking of product names against a search query, used by
+# food_lookup.py in place of the per-product Jaccard loop.
+#
+# Names are tokenized once into an inverted index: postings sorted by term,
+# each with its precomputed BM25 term weight
+#   tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+# so scoring a query is one idf-weighted scatter-add per query term over
+# that term's postings, whatever the number of candidates. The same index
+# works for the ~20 products of one OFF search or a whole cached catalog.
+#
+# Scores are normalized to [0, 1] by the best score the query could reach,
+# and names starting with the query get the old +0.1 prefix bonus, so they
+# stay on the same 0.0-1.1 scale the app already receives. The bonus also
+# goes to names that share no whole word with the query ("coc" -> "Coca
+# Cola"), as it always has; the lowercased names are kept sorted so those
+# are found by binary search rather than a pass over every name.
+
+import re
+import bisect
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+RANKING_CONFIG = {
+    "K1": 1.2,
+    "B": 0.75,
+    "PREFIX_BONUS": 0.1,
+}
+
+# Generic words ignored on the query side
+STOP_WORDS = frozenset({"the", "a", "an", "of", "in", "with", "product", "food", "brand", "pack", "item"})
+
+_TOKEN_RE = re.compile(r"\w+")
+_TOKEN_OR_BREAK_RE = re.compile(r"\w+|\n")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct query tokens without stop words, in query order"""
+    return [t for t in dict.fromkeys(tokenize(query)) if t not in STOP_WORDS]
+
+
+class RankingIndex:
+    """Inverted BM25 index over a fixed list of names"""
+
+    def __init__(self, names: Sequence[Optional[str]]):
+        self.names = list(names)
+        n_docs = len(self.names)
+
+        # One regex pass over all names joined by newlines (a newline is its
+        # own token and marks the next name), then numpy builds the
+        # (name, term) -> tf postings instead of a Counter per name
+        joined = "\n".join((name or "").replace("\n", " ") for name in self.names).lower()
+        self._vocab = {}
+        token_ids = np.fromiter(
+            (-1 if token == "\n" else self._vocab.setdefault(token, len(self._vocab))
+             for token in _TOKEN_OR_BREAK_RE.findall(joined)),
+            dtype=np.int64,
+        )
+        is_break = token_ids < 0
+        doc_of_token = np.cumsum(is_break)[~is_break]
+        term_of_token = token_ids[~is_break]
+        lengths = np.bincount(doc_of_token, minlength=n_docs).astype(np.float32)
+
+        # Sorting on term first gives postings grouped by term
+        pair = term_of_token * max(n_docs, 1) + doc_of_token
+        pairs, tf = np.unique(pair, return_counts=True)
+        term_ids = pairs // max(n_docs, 1)
+        self._doc_ids = pairs % max(n_docs, 1)
+        tf = tf.astype(np.float32)
+        self._offsets = np.searchsorted(term_ids, np.arange(len(self._vocab) + 1))
+
+        k1, b = RANKING_CONFIG["K1"], RANKING_CONFIG["B"]
+        df = np.diff(self._offsets).astype(np.float32)
+        self._idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._unseen_idf = float(np.log1p((n_docs + 0.5) / 0.5)) if n_docs else 0.0
+        avg_len = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        norm = k1 * (1.0 - b + b * lengths[self._doc_ids] / avg_len)
+        self._weights = tf * (k1 + 1.0) / (tf + norm)
+
+        # Lowercased names in sorted order, for the prefix bonus
+        lowered = [(name or "").lower() for name in self.names]
+        self._prefix_order = sorted(range(n_docs), key=lowered.__getitem__)
+        self._sorted_names = [lowered[i] for i in self._prefix_order]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def score(self, query: str) -> np.ndarray:
+        """float32 score per name, on the 0.0-1.1 scale (0 = no query word matched)"""
+        scores = np.zeros(len(self.names), dtype=np.float32)
+        terms = query_terms(query)
+        if not terms or not self.names:
+            return scores
+
+        k1 = RANKING_CONFIG["K1"]
+        best_possible = 0.0
+        for token in terms:
+            term_id = self._vocab.get(token)
+            if term_id is None:
+                best_possible += self._unseen_idf * (k1 + 1.0)
+                continue
+            idf = self._idf[term_id]
+            best_possible += float(idf) * (k1 + 1.0)
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            # A term appears once per name in the postings, so plain fancy-index add is safe
+            scores[self._doc_ids[start:end]] += idf * self._weights[start:end]
+
+        if best_possible > 0:
+            scores /= best_possible
+
+        scores[self._starting_with(query.lower())] += RANKING_CONFIG["PREFIX_BONUS"]
+        return scores
+
+    def _starting_with(self, prefix: str) -> List[int]:
+        """Ids of the names whose lowercased form starts with prefix"""
+        lo = bisect.bisect_left(self._sorted_names, prefix)
+        hi = bisect.bisect_left(self._sorted_names, prefix + "\U0010ffff", lo)
+        return self._prefix_order[lo:hi]
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """Indices of the k best-scoring names with a non-zero score, best first"""
+        scores = self.score(query)
+        matched = np.flatnonzero(scores)
+        if matched.size > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return matched[np.argsort(-scores[matched], kind="stable")].tolist()
+
+
+def score_candidates(query: str, names: Sequence[Optional[str]]) -> np.ndarray:
+    """Score a candidate list (e.g. one OFF search page) against query in one pass"""
+    return RankingIndex(names).score(query)
@@ -1,39 +1,36 @@
 # In recipe_gernate.py
-from ultralytics import YOLO
 import os
 import sys
 import json
+import argparse
+
+from image_files import collect_images
+from yolo_backends import YOLO_BACKEND, YOLO_MODELS, load_yolo
+
+MODEL_PATH, MODEL_TASK = YOLO_MODELS["ingredient"]
+DEFAULT_BATCH_SIZE = 8
 
 class IngredientDetector:
-    def __init__(self, model_path, confidence_threshold=0.25):
+    def __init__(self, model_path, confidence_threshold=0.25, backend=None, imgsz=None):
         self.model_path = model_path
         self.confidence_threshold = confidence_threshold
+        self.backend = backend
+        self.imgsz = imgsz
         self.model = None
         self.class_names = None
         self.load_model()
 
     def load_model(self):
-        """Load the YOLOv8 model"""
-        if not os.path.exists(self.model_path):
+        """Load the YOLOv8 model (PyTorch, or an exported copy per $YOLO_BACKEND)"""
+        if (self.backend or YOLO_BACKEND) == "pt" and not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Model file not found: {self.model_path}")
-        self.model = YOLO(self.model_path)
+        self.model = load_yolo(self.model_path, MODEL_TASK, self.backend, self.imgsz)
         self.class_names = self.model.names
 
-    def detect(self, image_path):
-        """Detect ingredients and return their names, confidence, and bounding boxes."""
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
-        
-        results = self.model(image_path, conf=self.confidence_threshold, verbose=False)
-        
-        if not results or len(results) == 0:
-            return []
-        
-        result = results[0]
-        boxes = result.boxes
-        
+    def _parse_result(self, result):
+        """Detections plus original image dimensions from one YOLO result"""
         detected_items = []
-        for box in boxes:
+        for box in result.boxes:
             class_id = int(box.cls[0])
             confidence = float(box.conf[0])
             ingredient_name = self.class_names[class_id].strip()
@@ -45,32 +42,103 @@ class IngredientDetector:
                 "confidence": confidence,
                 "box": [round(c, 2) for c in coords] 
             })
-            
-        return detected_items
+
+        # Original image dimensions for scaling in Flutter
+        original_height, original_width = result.orig_shape[:2]
+        return {
+            "detections": detected_items,
+            "image_dimensions": {
+                "width": int(original_width),
+                "height": int(original_height)
+            }
+        }
+
+    def _infer(self, image_path):
+        """The YOLO result for one image, or None when the model returns nothing"""
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        
+        results = self.model(image_path, conf=self.confidence_threshold, verbose=False)
+        
+        if not results or len(results) == 0:
+            return None
+        return results[0]
+
+    def detect_with_dimensions(self, image_path):
+        """Detections and image dimensions from a single inference."""
+        result = self._infer(image_path)
+        if result is None:
+            raise RuntimeError(f"No result for image: {image_path}")
+        return self._parse_result(result)
+
+    def detect(self, image_path):
+        """Detect ingredients and return their names, confidence, and bounding boxes."""
+        result = self._infer(image_path)
+        if result is None:
+            return []
+        return self._parse_result(result)["detections"]
+
+    def detect_batch(self, image_paths, batch_size=DEFAULT_BATCH_SIZE):
+        """Yield (image_path, record) for each image, running YOLO on batch_size images at a time.
+
+        A record is the detect_with_dimensions() dict, or {"error": ...} for an
+        image that could not be processed.
+        """
+        pending = []
+        for image_path in image_paths:
+            if os.path.exists(image_path):
+                pending.append(image_path)
+            else:
+                yield image_path, {"error": f"Image file not found: {image_path}"}
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            try:
+                results = self.model(chunk, conf=self.confidence_threshold, batch=len(chunk), verbose=False)
+            except Exception:
+                # One unreadable image fails the whole batch; retry one by one to isolate it
+                for image_path in chunk:
+                    try:
+                        yield image_path, self.detect_with_dimensions(image_path)
+                    except Exception as e:
+                        yield image_path, {"error": str(e)}
+                continue
+            for image_path, result in zip(chunk, results):
+                yield image_path, self._parse_result(result)
+
+def run_batch(args):
+    """--batch mode: one JSON line per image, tagged with its path"""
+    parser = argparse.ArgumentParser(description="Detect ingredients in many images with one model load")
+    parser.add_argument("--batch", nargs="+", required=True, metavar="PATH", help="Images or folders of images")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--conf", type=float, default=0.25)
+    opts = parser.parse_args(args)
+
+    try:
+        detector = IngredientDetector(opts.model, opts.conf)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+    for image_path, record in detector.detect_batch(collect_images(opts.batch), max(1, opts.batch_size)):
+        print(json.dumps({"image": image_path, **record}))
+        sys.stdout.flush()
 
 def main():
+    if "--batch" in sys.argv[1:]:
+        run_batch(sys.argv[1:])
+        return
+
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No image path provided."}))
         sys.exit(1)
         
-    model_path = "yolo_fruits_and_vegetables_v3.pt"
     image_path = sys.argv[1]
     
     try:
-        detector = IngredientDetector(model_path)
-        detections = detector.detect(image_path)
-        # Also include original image dimensions for scaling in Flutter
-        results = detector.model(image_path, conf=detector.confidence_threshold, verbose=False)
-        orig_img = results[0].orig_img
-        original_height, original_width = orig_img.shape[:2]
-        
-        response = {
-            "detections": detections,
-            "image_dimensions": {
-                "width": original_width,
-                "height": original_height
-            }
-        }
+        detector = IngredientDetector(MODEL_PATH)
+        response = detector.detect_with_dimensions(image_path)
         print(json.dumps(response))
             
     except Exception as e:
@@ -78,4 +146,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,300 @@
+# result_cache.py
+#
+# Content-addressed cache of predict.py results, so a re-uploaded photo
+# (retry, flaky connection, same meal shot twice) streams back without
+# running the classifier or YOLO + MiDaS again.
+#
+# Photos are keyed by the SHA-256 of the file bytes. With perceptual
+# matching on, a 64-bit difference hash (dHash) of the decoded image is
+# stored as well, and a photo whose dHash is within RESULT_CACHE_PHASH_DISTANCE
+# bits of a cached one reuses that entry (re-encoded or resized uploads).
+# Near-duplicate lookup is indexed: the dHash is split into DISTANCE + 1
+# bands, and two hashes within DISTANCE bits must agree exactly on at least
+# one band, so only photos sharing a band are compared.
+#
+# A perceptual hit is also stored under the new photo's own SHA (link()),
+# so uploading that photo again is an exact hit, depth included. The hash
+# tables follow the cached entries: rows are deleted when their `cls` entry
+# is evicted, so they stay within the cache's size cap.
+#
+# Stored per photo:
+#   cls:<cls version>:<sha>      the `classification` event, as emitted
+#   depth:<depth version>:<sha>  the working-resolution height map and food mask (npz)
+#
+# The versions fingerprint the settings each result depends on (classifier
+# backend and model file, depth tier, working size, segmentation YOLO), so
+# changing any of them never serves results computed under the old ones.
+
+import io
+import os
+import sys
+import hashlib
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from classifier_backends import CLASSIFIER_BACKEND, MODEL_PATHS
+from depth_pipeline import DEPTH_CONFIG
+from disk_cache import DiskCache
+from image_ingest import INGEST_CONFIG
+from yolo_backends import YOLO_BACKEND, YOLO_IMGSZ, YOLO_MODELS, exported_path
+
+RESULT_CACHE_CONFIG = {
+    "ENABLED": os.getenv("RESULT_CACHE", "1") == "1",
+    "PATH": os.getenv("RESULT_CACHE_PATH", os.path.join("cache", "predict_results.sqlite3")),
+    "MAX_BYTES": int(float(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024),
+    "PHASH_DISTANCE": int(os.getenv("RESULT_CACHE_PHASH_DISTANCE", "4")),  # 0 disables perceptual matching
+}
+
+_PHASH_SCHEMA = """
+DROP TABLE IF EXISTS result_phash;
+CREATE TABLE IF NOT EXISTS phash_entries (
+    version TEXT NOT NULL,
+    sha     TEXT NOT NULL,
+    phash   INTEGER NOT NULL,
+    PRIMARY KEY (version, sha)
+);
+CREATE TABLE IF NOT EXISTS phash_bands (
+    version TEXT NOT NULL,
+    bands   INTEGER NOT NULL,
+    band    INTEGER NOT NULL,
+    bits    INTEGER NOT NULL,
+    sha     TEXT NOT NULL,
+    PRIMARY KEY (version, bands, band, bits, sha)
+);
+"""
+
+
+def file_sha256(image_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 greyscale thumbnail"""
+    small = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+def phash_bands(phash: int, bands: int) -> List[int]:
+    """Split a 64-bit hash into `bands` contiguous bit ranges of (nearly) equal width"""
+    value = phash & ((1 << 64) - 1)
+    edges = [round(64 * i / bands) for i in range(bands + 1)]
+    return [(value >> lo) & ((1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+
+
+def _file_version(path: str) -> str:
+    """path with its mtime and size, so a re-exported model changes the fingerprint"""
+    try:
+        st = os.stat(path)
+        return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        return f"{path}:missing"
+
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:12]
+
+
+def classification_fingerprint() -> str:
+    """Fingerprint of what the classification event depends on"""
+    return _fingerprint(
+        CLASSIFIER_BACKEND, _file_version(MODEL_PATHS.get(CLASSIFIER_BACKEND, "")), INGEST_CONFIG["CLASSIFIER_SIZE"]
+    )
+
+
+def depth_fingerprint() -> str:
+    """Fingerprint of what the height map and food mask depend on"""
+    pt_path = YOLO_MODELS["segment"][0]
+    try:
+        yolo_path = exported_path(pt_path, YOLO_BACKEND, YOLO_IMGSZ)
+    except ValueError:
+        yolo_path = pt_path
+    return _fingerprint(
+        DEPTH_CONFIG["TIER"], DEPTH_CONFIG["WORKING_SIZE"], YOLO_BACKEND, YOLO_IMGSZ, _file_version(yolo_path)
+    )
+
+
+class CacheKey:
+    __slots__ = ("sha", "phash")
+
+    def __init__(self, sha: str, phash: Optional[int] = None):
+        self.sha = sha
+        self.phash = phash
+
+
+class ResultCache:
+    def __init__(self, path: str, max_bytes: int, phash_distance: int,
+                 cls_version: Optional[str] = None, depth_version: Optional[str] = None):
+        self._cache = DiskCache(path, "predict_results", max_bytes)
+        self.phash_distance = phash_distance
+        self.bands = min(phash_distance + 1, 64)
+        self.cls_version = cls_version or classification_fingerprint()
+        self.depth_version = depth_version or depth_fingerprint()
+        for statement in _PHASH_SCHEMA.split(";"):
+            if statement.strip():
+                self._cache.execute(statement)
+        self._drop_orphan_phashes()
+
+    @property
+    def perceptual(self) -> bool:
+        return self.phash_distance > 0
+
+    def key_for(self, image_path: str) -> CacheKey:
+        return CacheKey(file_sha256(image_path))
+
+    def with_phash(self, key: CacheKey, ingested) -> CacheKey:
+        if self.perceptual and key.phash is None:
+            key.phash = dhash(ingested.image)
+        return key
+
+    def match(self, key: CacheKey, final: bool = True) -> Optional[str]:
+        """SHA of the cached entry for this photo (exact, else nearest perceptual neighbour).
+
+        final=False is for the cheap exact-only probe made before the photo is
+        decoded; it does not count as a miss.
+        """
+        sha = self._match(key)
+        if sha is not None or final:
+            self._cache.record_lookup(sha is not None)
+        return sha
+
+    def _cls_key(self, sha: str) -> str:
+        return f"cls:{self.cls_version}:{sha}"
+
+    def _depth_key(self, sha: str) -> str:
+        return f"depth:{self.depth_version}:{sha}"
+
+    def _match(self, key: CacheKey) -> Optional[str]:
+        if self._cache.contains(self._cls_key(key.sha)):
+            return key.sha
+        if not self.perceptual or key.phash is None:
+            return None
+
+        # Candidates share at least one band with the photo's hash
+        # (one indexed probe per band)
+        band_query = "SELECT sha FROM phash_bands WHERE version = ? AND bands = ? AND band = ? AND bits = ?"
+        params = []
+        for band, bits in enumerate(phash_bands(key.phash, self.bands)):
+            params += [self.cls_version, self.bands, band, bits]
+        rows = self._cache.execute(
+            "SELECT e.sha, e.phash FROM phash_entries e WHERE e.version = ? AND e.sha IN ("
+            + " UNION ".join([band_query] * self.bands) + ")",
+            (self.cls_version, *params),
+        )
+        best = min(((hamming(key.phash, phash), sha) for sha, phash in rows), default=None)
+        if best is None or best[0] > self.phash_distance:
+            return None
+        if not self._cache.contains(self._cls_key(best[1])):
+            # Entry was evicted by another process; drop its stale perceptual hash
+            self._forget_phash(self.cls_version, best[1])
+            return None
+        return best[1]
+
+    def get_classification(self, sha: str) -> Optional[dict]:
+        return self._cache.get_json(self._cls_key(sha), track=False)
+
+    def put_classification(self, key: CacheKey, event: dict):
+        self._forget_evicted(self._cache.put_json(self._cls_key(key.sha), event))
+        self._index_phash(key)
+
+    def link(self, key: CacheKey, sha: str):
+        """Store the entry matched perceptually (sha) under the photo's own SHA as well"""
+        if sha == key.sha:
+            return
+        for entry_key in (self._cls_key, self._depth_key):
+            raw = self._cache.get(entry_key(sha), track=False)
+            if raw is not None:
+                self._forget_evicted(self._cache.put(entry_key(key.sha), raw))
+        if self._cache.contains(self._cls_key(key.sha)):
+            self._index_phash(key)
+
+    def _index_phash(self, key: CacheKey):
+        if key.phash is None:
+            return
+        self._cache.execute(
+            "INSERT OR REPLACE INTO phash_entries (version, sha, phash) VALUES (?, ?, ?)",
+            (self.cls_version, key.sha, key.phash),
+        )
+        for band, bits in enumerate(phash_bands(key.phash, self.bands)):
+            self._cache.execute(
+                "INSERT OR IGNORE INTO phash_bands (version, bands, band, bits, sha) VALUES (?, ?, ?, ?, ?)",
+                (self.cls_version, self.bands, band, bits, key.sha),
+            )
+
+    def _forget_phash(self, version: str, sha: str):
+        self._cache.execute("DELETE FROM phash_entries WHERE version = ? AND sha = ?", (version, sha))
+        self._cache.execute("DELETE FROM phash_bands WHERE version = ? AND sha = ?", (version, sha))
+
+    def _forget_evicted(self, evicted: List[str]):
+        """Drop the perceptual hashes of evicted `cls` entries (any version)"""
+        for evicted_key in evicted:
+            kind, version, sha = evicted_key.split(":", 2)
+            if kind == "cls":
+                self._forget_phash(version, sha)
+
+    def _drop_orphan_phashes(self):
+        """Hashes whose `cls` entry is gone (evicted before hashes followed evictions)"""
+        orphan = "NOT EXISTS (SELECT 1 FROM entries WHERE namespace = ? AND key = 'cls:' || version || ':' || sha)"
+        for table in ("phash_entries", "phash_bands"):
+            self._cache.execute(f"DELETE FROM {table} WHERE {orphan}", (self._cache.namespace,))
+
+    def get_depth(self, sha: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        raw = self._cache.get(self._depth_key(sha), track=False)
+        if raw is None:
+            return None
+        with np.load(io.BytesIO(raw)) as data:
+            return data["height_map"].astype(np.float32), data["mask"].astype(np.float32)
+
+    def put_depth(self, key: CacheKey, height_map: np.ndarray, target_mask: np.ndarray):
+        buf = io.BytesIO()
+        # float16 keeps plenty of precision for a [0, 1] height map at half the size
+        np.savez_compressed(buf, height_map=height_map.astype(np.float16), mask=target_mask.astype(np.float16))
+        self._forget_evicted(self._cache.put(self._depth_key(key.sha), buf.getvalue()))
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "cls_version": self.cls_version, "depth_version": self.depth_version}
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide ResultCache, or None when RESULT_CACHE=0 or the file cannot be opened"""
+    global _result_cache
+    if not RESULT_CACHE_CONFIG["ENABLED"]:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            try:
+                _result_cache = ResultCache(
+                    RESULT_CACHE_CONFIG["PATH"],
+                    RESULT_CACHE_CONFIG["MAX_BYTES"],
+                    RESULT_CACHE_CONFIG["PHASH_DISTANCE"],
+                )
+            except Exception as e:
+                sys.stderr.write(f"Result cache disabled: {str(e)}\n")
+                RESULT_CACHE_CONFIG["ENABLED"] = False
+                return None
+    return _result_cache
+
+
+if __name__ == "__main__":
+    import json
+    cache = get_result_cache()
+    print(json.dumps(cache.stats() if cache else {"enabled": False}, indent=2))
@@ -0,0 +1,270 @@
+# risk_rules.py
+#
+# Dietary-risk rules shared by food_lookup.py (search results) and
+# extract_product.py (scanned product and its alternatives), so both paths
+# judge a product the same way. The rules below are the union of what the
+# two scripts used to check separately: both now know Obesity, Vegan, the
+# user's calorie limit, the full keyword lists and the OFF label exemptions.
+#
+# A batch of products is evaluated at once:
+#   * nutrient rules: the per-100g values parsed by product_record.py are
+#     laid out as an (N products x M rules) float matrix (NaN when missing)
+#     and compared with the rule limits in one numpy operation;
+#   * ingredient rules: every ingredient list in the batch is scanned by a
+#     single compiled regex holding all keywords, and each match is mapped
+#     back to its product and to the rules that keyword belongs to. Keywords
+#     match anywhere in a word ("peanuts", "wholewheat", "milkfat"), since a
+#     missed allergen is worse than a false alarm; the few words known to
+#     contain a keyword without the allergen (KEYWORD_EXCLUSIONS: coconut,
+#     nutmeg, ...) are matched first and ignored;
+#   * tag rules: OFF allergen tags flag a rule, OFF label tags exempt it.
+# The result holds a pass/fail matrix for the active rules, from which each
+# caller builds its own output format. The first failing rule reported to
+# food_lookup.py follows FAILURE_PRIORITY, the order its checks always ran in.
+
+import re
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from product_record import ProductRecord, as_records
+
+
+class NutrientRule:
+    """Fails when a per-100g nutrient is above limit; reason may use {value}"""
+
+    __slots__ = ("name", "column", "limit", "short", "reason")
+    safe_detail = "Safe levels"
+
+    def __init__(self, name: str, column: str, limit: float, short: str, reason: str):
+        self.name = name
+        self.column = column
+        self.limit = limit
+        self.short = short
+        self.reason = reason
+
+
+class IngredientRule:
+    """Fails on an ingredient keyword or allergen tag, unless a label exempts the product"""
+
+    __slots__ = ("name", "keywords", "flag_tags", "exempt_labels", "short", "reason")
+    safe_detail = "Safe"
+
+    def __init__(self, name: str, keywords: Sequence[str], short: str, reason: str,
+                 flag_tags: Sequence[str] = (), exempt_labels: Sequence[str] = ()):
+        self.name = name
+        self.keywords = tuple(keywords)
+        self.flag_tags = frozenset(flag_tags)
+        self.exempt_labels = frozenset(exempt_labels)
+        self.short = short
+        self.reason = reason
+
+
+# Health conditions, keyed by the names the app sends in `conditions`
+CONDITION_RULES = [
+    NutrientRule("Hypertension", "salt_100g", 1.5, "High Salt", "High Salt for Hypertension"),
+    NutrientRule("Diabetes", "sugars_100g", 22.5, "High Sugar", "High Sugar for Diabetes"),
+    NutrientRule("High Cholesterol", "saturated_fat_100g", 5.0, "High Sat. Fat", "High Saturated Fat for High Cholesterol"),
+    NutrientRule("Obesity", "energy_kcal", 450, "High Calorie", "High Calorie for Obesity"),
+]
+
+# Dietary restrictions, keyed by the names the app sends in `restrictions`
+RESTRICTION_RULES = [
+    IngredientRule("Lactose Free", ["milk", "lactose", "cheese", "cream", "butter", "whey"],
+                   "Contains Dairy", "Contains Milk/Lactose (Non-Lactose Free)",
+                   exempt_labels=["en:lactose-free"]),
+    IngredientRule("Vegan", ["milk", "egg", "meat", "fish", "gelatin", "honey"],
+                   "Animal Content", "Contains Animal Ingredients (Non-Vegan)",
+                   exempt_labels=["en:vegan"]),
+    IngredientRule("Gluten Free", ["wheat", "barley", "rye", "gluten", "malt"],
+                   "Contains Gluten", "Contains Gluten (Non-Gluten Free)",
+                   exempt_labels=["en:gluten-free"]),
+    IngredientRule("Nut Free", ["nut", "peanut", "almond", "cashew", "hazelnut", "pecan"],
+                   "Contains Nuts", "Contains Nut Allergens",
+                   flag_tags=["en:nuts", "en:peanuts", "en:almonds", "en:hazelnut", "en:walnuts", "en:cashew"]),
+]
+
+# Words that contain a restriction keyword but not the ingredient it stands for
+KEYWORD_EXCLUSIONS = ["coconut", "nutmeg", "butternut", "doughnut", "nutrition", "nutrient"]
+
+# Which failing rule is reported first: the order food_lookup.py has always
+# checked in, with the rules it did not know (Obesity, Vegan) after its own
+FAILURE_PRIORITY = (
+    "Calorie Limit", "Hypertension", "Diabetes", "High Cholesterol", "Obesity",
+    "Lactose Free", "Nut Free", "Gluten Free", "Vegan",
+)
+
+NUTRIENT_COLUMNS = ("energy_kcal", "salt_100g", "sugars_100g", "saturated_fat_100g")
+
+
+def nutrient_matrix(records: Sequence[ProductRecord]) -> np.ndarray:
+    """(N, len(NUTRIENT_COLUMNS)) float64 per-100g values, NaN where missing"""
+    return np.array([r.risk_values() for r in records], dtype=np.float64).reshape(len(records), len(NUTRIENT_COLUMNS))
+
+
+class KeywordMatcher:
+    """One compiled alternation of every rule keyword; a match yields the rules it triggers.
+
+    Exclusions are part of the alternation with no rules, so a longer
+    excluded word ("coconut") consumes the keyword inside it ("nut").
+    """
+
+    def __init__(self, rules: Sequence[IngredientRule], exclusions: Sequence[str] = ()):
+        keyword_rules: Dict[str, int] = {}
+        for bit, rule in enumerate(rules):
+            for keyword in rule.keywords:
+                keyword_rules[keyword] = keyword_rules.get(keyword, 0) | (1 << bit)
+        # A keyword that contains another also triggers the inner keyword's
+        # rules, since the longest-first alternation only reports the outer one
+        for outer in keyword_rules:
+            for inner, bits in list(keyword_rules.items()):
+                if inner != outer and inner in outer:
+                    keyword_rules[outer] |= bits
+        for word in exclusions:
+            keyword_rules[word] = 0
+        self.keyword_rules = keyword_rules
+        alternation = "|".join(re.escape(k) for k in sorted(keyword_rules, key=len, reverse=True))
+        self.pattern = re.compile(alternation) if alternation else None
+
+    def match_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """int64 rule bitmask per text"""
+        masks = np.zeros(len(texts), dtype=np.int64)
+        if self.pattern is None or not texts:
+            return masks
+        # Scan the whole batch in one pass; \x00 never occurs in ingredient text
+        joined = "\x00".join(texts)
+        starts = np.cumsum([0] + [len(t) + 1 for t in texts[:-1]])
+        positions, bits = [], []
+        for match in self.pattern.finditer(joined):
+            match_bits = self.keyword_rules[match.group()]
+            if match_bits:
+                positions.append(match.start())
+                bits.append(match_bits)
+        if positions:
+            owners = np.searchsorted(starts, positions, side="right") - 1
+            np.bitwise_or.at(masks, owners, np.asarray(bits, dtype=np.int64))
+        return masks
+
+
+_RESTRICTION_MATCHER = KeywordMatcher(RESTRICTION_RULES, KEYWORD_EXCLUSIONS)
+_COLUMN_INDEX = {column: j for j, column in enumerate(NUTRIENT_COLUMNS)}
+
+
+class RiskEvaluation:
+    """Pass/fail of the active rules (in priority order) for a batch of products"""
+
+    def __init__(self, rules: List, failed: np.ndarray, values: np.ndarray):
+        self.rules = rules
+        self.failed = failed  # (N, len(rules)) bool
+        self.values = values  # (N, number of NutrientRules) compared values
+
+    def __len__(self) -> int:
+        return self.failed.shape[0]
+
+    def failure_counts(self) -> np.ndarray:
+        return self.failed.sum(axis=1)
+
+    def statuses(self, i: int) -> List[Dict]:
+        """Per-rule {"name", "is_safe", "status_detail"} for product i"""
+        return [
+            {"name": rule.name, "is_safe": not failed, "status_detail": rule.short if failed else rule.safe_detail}
+            for rule, failed in zip(self.rules, self.failed[i].tolist())
+        ]
+
+    def first_failure(self, i: int) -> Optional[str]:
+        """Reason of the failing rule for product i that comes first in FAILURE_PRIORITY, None when all pass"""
+        hits = np.flatnonzero(self.failed[i])
+        if not hits.size:
+            return None
+        k = min(hits.tolist(), key=lambda j: FAILURE_PRIORITY.index(self.rules[j].name))
+        rule = self.rules[k]
+        return rule.reason.format(value=self.values[i, k]) if isinstance(rule, NutrientRule) else rule.reason
+
+
+def active_rules(conditions: Dict, restrictions: Dict, calorie_limit: Optional[float] = None) -> List:
+    """Rules enabled by a user profile: calorie limit, then conditions, then restrictions"""
+    rules = []
+    if calorie_limit:
+        rules.append(NutrientRule(
+            "Calorie Limit", "energy_kcal", float(calorie_limit), "High Calorie",
+            "Exceeds Calorie Limit ({value:.0f} kcal/100g)",
+        ))
+    rules += [r for r in CONDITION_RULES if (conditions or {}).get(r.name)]
+    rules += [r for r in RESTRICTION_RULES if (restrictions or {}).get(r.name)]
+    return rules
+
+
+def _tag_column(records: Sequence[ProductRecord], field: str, tags: frozenset) -> np.ndarray:
+    return np.fromiter((not tags.isdisjoint(getattr(r, field)) for r in records), dtype=bool, count=len(records))
+
+
+def evaluate(products: Sequence, conditions: Dict, restrictions: Dict,
+             calorie_limit: Optional[float] = None) -> RiskEvaluation:
+    """Evaluate every active rule for every product (OFF dict or ProductRecord) at once"""
+    records = as_records(products)
+    rules = active_rules(conditions, restrictions, calorie_limit)
+    nutrient_rules = [r for r in rules if isinstance(r, NutrientRule)]
+    n = len(products)
+    failed = np.zeros((n, len(rules)), dtype=bool)
+    values = np.full((n, len(nutrient_rules)), np.nan)
+
+    if n and nutrient_rules:
+        columns = [_COLUMN_INDEX[r.column] for r in nutrient_rules]
+        values = nutrient_matrix(records)[:, columns]
+        limits = np.array([r.limit for r in nutrient_rules])
+        with np.errstate(invalid="ignore"):
+            failed[:, :len(nutrient_rules)] = values > limits  # missing (NaN) never fails
+
+    if n and len(rules) > len(nutrient_rules):
+        texts = [r.ingredients_text.lower() for r in records]
+        masks = _RESTRICTION_MATCHER.match_batch(texts)
+        for k, rule in enumerate(rules[len(nutrient_rules):], start=len(nutrient_rules)):
+            column = (masks >> RESTRICTION_RULES.index(rule)) & 1 == 1
+            if rule.flag_tags:
+                column |= _tag_column(records, "allergens_tags", rule.flag_tags)
+            if rule.exempt_labels:
+                column &= ~_tag_column(records, "labels_tags", rule.exempt_labels)
+            failed[:, k] = column
+
+    return RiskEvaluation(rules, failed, values)
+
+
+# --- Precomputed flags ---
+# Rules that do not depend on the user (everything but the calorie limit)
+# can be evaluated once per product and stored as a bitmask over ALL_RULES;
+# alternatives_index.py keeps these next to its candidates.
+
+ALL_RULES = CONDITION_RULES + RESTRICTION_RULES
+
+
+def _rules_version() -> str:
+    """Short hash of the user-independent rules and the keyword pattern, for stored rule_flags()"""
+    parts = [_RESTRICTION_MATCHER.pattern.pattern if _RESTRICTION_MATCHER.pattern else ""]
+    for rule in ALL_RULES:
+        if isinstance(rule, NutrientRule):
+            parts.append(f"{rule.name}|{rule.column}|{rule.limit}")
+        else:
+            parts.append("|".join([rule.name, ",".join(rule.keywords), ",".join(sorted(rule.flag_tags)),
+                                   ",".join(sorted(rule.exempt_labels))]))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:12]
+
+
+# Flags stored with another version were computed by different rules
+RULES_VERSION = _rules_version()
+
+
+def rule_flags(products: Sequence) -> np.ndarray:
+    """int64 bitmask per product of the ALL_RULES it fails (bit i = ALL_RULES[i])"""
+    evaluation = evaluate(products, {r.name: True for r in CONDITION_RULES}, {r.name: True for r in RESTRICTION_RULES})
+    return (evaluation.failed.astype(np.int64) << np.arange(len(ALL_RULES), dtype=np.int64)).sum(axis=1)
+
+
+def evaluate_flags(flags: np.ndarray, conditions: Dict, restrictions: Dict) -> RiskEvaluation:
+    """Same as evaluate() for products whose rule_flags() are already known"""
+    rules = active_rules(conditions, restrictions)
+    flags = np.asarray(flags, dtype=np.int64).reshape(-1)
+    bits = np.array([ALL_RULES.index(r) for r in rules], dtype=np.int64)
+    failed = (flags[:, None] >> bits) & 1 == 1
+    n_nutrient = sum(isinstance(r, NutrientRule) for r in rules)
+    return RiskEvaluation(rules, failed, np.full((flags.size, n_nutrient), np.nan))
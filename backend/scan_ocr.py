@@ -0,0 +1,107 @@
+# scan_ocr.py
+#
+# OCR stage of the product scanner (extract_product.py).
+#
+# Tesseract is slow on a full color photo of a package, and most of that
+# time goes to background it cannot read anyway. The image is first reduced
+# to what matters:
+#   * grayscale, binarized at Otsu's threshold;
+#   * cropped to the rows and columns where the binary image flips between
+#     ink and paper as often as lines of text do, which drops empty margins
+#     and solid color blocks;
+#   * made dark text on white inside that crop (light-on-dark print is
+#     inverted), which is what Tesseract reads best.
+# Tesseract then runs as an asyncio subprocess fed a PNG on stdin, so the
+# scanner can start it alongside barcode decoding and kill it as soon as the
+# barcode resolves the product (or when it runs past OCR_TIMEOUT_S).
+
+import io
+import os
+import sys
+import asyncio
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+OCR_CONFIG = {
+    "TESSERACT_CMD": os.getenv("TESSERACT_CMD", "tesseract"),
+    "LANG": "eng",
+    "PSM": os.getenv("OCR_PSM", "3"),
+    "TIMEOUT_S": float(os.getenv("OCR_TIMEOUT_S", "15")),
+    # Ink/paper flips per pixel for a row/column to count as text
+    "MIN_FLIPS": 0.01,
+    "MAX_FLIPS": 0.5,
+    "CROP_PADDING": 12,
+    "MIN_CROP_SIDE": 32,
+}
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Gray level that best separates the histogram into two classes"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / gray.size
+    mu = np.cumsum(hist * np.arange(256)) / gray.size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    return int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+
+
+def _text_span(flips: np.ndarray) -> Optional[slice]:
+    """First..last index whose flip rate is in the text range, padded"""
+    hits = np.flatnonzero((flips >= OCR_CONFIG["MIN_FLIPS"]) & (flips <= OCR_CONFIG["MAX_FLIPS"]))
+    if hits.size == 0:
+        return None
+    pad = OCR_CONFIG["CROP_PADDING"]
+    return slice(max(int(hits[0]) - pad, 0), min(int(hits[-1]) + pad + 1, flips.size))
+
+
+def preprocess_for_ocr(img: Image.Image) -> Image.Image:
+    """Grayscale, Otsu-binarized, cropped to the text region, dark text on white"""
+    gray = np.asarray(img.convert("L"))
+    ink = gray <= otsu_threshold(gray)
+
+    rows = _text_span((ink[:, 1:] != ink[:, :-1]).mean(axis=1))
+    if rows is not None:
+        band = ink[rows]
+        cols = _text_span((band[1:] != band[:-1]).mean(axis=0))
+        if cols is not None and min(rows.stop - rows.start, cols.stop - cols.start) >= OCR_CONFIG["MIN_CROP_SIDE"]:
+            ink = band[:, cols]
+    if ink.mean() > 0.5:
+        ink = ~ink
+    return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+
+
+async def run_tesseract(img: Image.Image, timeout: Optional[float] = None) -> str:
+    """Tesseract text of img, or "" on failure/timeout; the process is killed if this is cancelled"""
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    try:
+        process = await asyncio.create_subprocess_exec(
+            OCR_CONFIG["TESSERACT_CMD"], "stdin", "stdout", "-l", OCR_CONFIG["LANG"], "--psm", OCR_CONFIG["PSM"],
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError as e:
+        sys.stderr.write(f"Tesseract unavailable: {str(e)}\n")
+        return ""
+
+    try:
+        out, _ = await asyncio.wait_for(process.communicate(buffer.getvalue()),
+                                        timeout or OCR_CONFIG["TIMEOUT_S"])
+    except asyncio.TimeoutError:
+        sys.stderr.write("Tesseract timed out\n")
+        return ""
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    if process.returncode != 0:
+        return ""
+    return out.decode("utf-8", errors="replace").strip()
+
+
+async def extract_text(img: Image.Image) -> str:
+    """Pre-process off the event loop, then OCR"""
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(None, preprocess_for_ocr, img)
+    return await run_tesseract(prepared)
@@ -39,6 +39,9 @@ const webRoutes = require('./routes/webRoutes.js');
 const complaintRoutes = require('./routes/complaintRoutes.js');
 const mealPlanRoutes = require("./routes/mealPlanRoutes.js");
 
+// --- Services ---
+const { startPredictWorker, runPredictJob } = require('./services/predictWorker');
+
 // --- App Initialization ---
 const app = express();
 const PORT = process.env.PORT || 5000;
@@ -165,35 +168,26 @@ app.post("/api/predict", protect, upload.single("image"), async (req, res) => {
       remainingCalories = String(Math.max(0, goal - consumed));
     }
 
-    // 4. Run Python Script
+    // 4. Run the photo through the shared predict worker
     // Note: We use 'localFilePath' here because it's faster for Python to read 
     // from disk than downloading the Cloudinary URL.
-    const scriptPath = path.join(__dirname, "predict.py");
-    console.log(`🚀 Spawning python: ${scriptPath} ${localFilePath}`);
-    
-    const pythonProcess = spawn('python', [scriptPath, localFilePath, healthConditions, remainingCalories]);
+    console.log(`🚀 Sending to predict worker: ${localFilePath}`);
 
-    pythonProcess.stdout.on('data', (data) => {
-      console.log(`📤 Stream chunk: ${data}`);
-      res.write(data);
+    await runPredictJob({ imagePath: localFilePath, healthConditions, remainingCalories }, (event) => {
+      const chunk = JSON.stringify(event);
+      console.log(`📤 Stream chunk: ${chunk}`);
+      res.write(chunk + "\n");
     });
+    console.log("🏁 Prediction finished");
 
-    pythonProcess.stderr.on('data', (data) => {
-      console.error(`⚠️ Python stderr: ${data}`);
+    // 5. Cleanup Local File
+    // Since the image is safe in Cloudinary, we can delete the local temp file
+    fs.unlink(localFilePath, (err) => {
+      if (err) console.error("Error deleting temp file:", err);
+      else console.log("🧹 Local temp file cleaned up");
     });
 
-    pythonProcess.on('close', (code) => {
-      console.log(`🏁 Python process exited with code ${code}`);
-      
-      // 5. Cleanup Local File
-      // Since the image is safe in Cloudinary, we can delete the local temp file
-      fs.unlink(localFilePath, (err) => {
-        if (err) console.error("Error deleting temp file:", err);
-        else console.log("🧹 Local temp file cleaned up");
-      });
-      
-      res.end();
-    });
+    res.end();
 
   } catch (error) {
     console.error("❌ Error in process:", error);
@@ -354,30 +348,23 @@ app.post("/api/predict", protect, upload.single("image"), async (req, res) => {
   }
 
   const imagePath = path.resolve(req.file.path);
-  const scriptPath = path.join(__dirname, "predict.py");
 
-  console.log(`🚀 Spawning python: ${scriptPath} ${imagePath}`);
-  const pythonProcess = spawn('python', [scriptPath, imagePath, healthConditions, remainingCalories]);
+  console.log(`🚀 Sending to predict worker: ${imagePath}`);
 
   res.setHeader('Content-Type', 'application/x-ndjson');
   res.setHeader('Transfer-Encoding', 'chunked');
 
-  pythonProcess.stdout.on('data', (data) => {
-    console.log(`📤 Stream chunk: ${data}`);
-    res.write(data);
+  await runPredictJob({ imagePath, healthConditions, remainingCalories }, (event) => {
+    const chunk = JSON.stringify(event);
+    console.log(`📤 Stream chunk: ${chunk}`);
+    res.write(chunk + "\n");
   });
 
-  pythonProcess.stderr.on('data', (data) => {
-    console.error(`⚠️ Python stderr: ${data}`);
-  });
-
-  pythonProcess.on('close', (code) => {
-    console.log(`🏁 Python process exited with code ${code}`);
-    fs.unlink(imagePath, (err) => {
-      if (err) console.error("Error deleting temp file:", err);
-    });
-    res.end();
+  console.log("🏁 Prediction finished");
+  fs.unlink(imagePath, (err) => {
+    if (err) console.error("Error deleting temp file:", err);
   });
+  res.end();
 });
 
 // --- Ingredient Detection ---
@@ -507,6 +494,32 @@ app.post("/upload", upload.single("image"), protect, async (req, res) => {
     tempInputPath = path.join(__dirname, `temp_scan_input_${Date.now()}.json`);
     fs.writeFileSync(tempInputPath, JSON.stringify(userProfileData));
 
+    // ?stream=1: NDJSON events (product, alternatives..., done) as the scanner produces them
+    if (req.query.stream === "1") {
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      res.setHeader('Transfer-Encoding', 'chunked');
+
+      const pythonProcess = spawn('python', [pythonScriptPath, "--stream", tempInputPath]);
+      const killTimer = setTimeout(() => pythonProcess.kill(), 150000);
+
+      // Client went away mid-scan: stop the scanner instead of letting it run to the end.
+      // (res, not req: on current Node req 'close' fires once the upload has been read.)
+      res.on('close', () => {
+        if (!res.writableEnded) pythonProcess.kill();
+      });
+
+      pythonProcess.stdout.on('data', (data) => res.write(data));
+      pythonProcess.stderr.on('data', (data) => console.warn("⚠️ /upload stderr:", String(data).substring(0, 100)));
+      pythonProcess.on('close', (code) => {
+        clearTimeout(killTimer);
+        fs.unlink(imagePath, () => {});
+        if (tempInputPath && fs.existsSync(tempInputPath)) fs.unlink(tempInputPath, () => {});
+        console.log(`🏁 Scanner exited with code ${code}`);
+        res.end();
+      });
+      return;
+    }
+
     const command = `python "${pythonScriptPath}" "${tempInputPath}"`;
     
     exec(command, { timeout: 150000 }, (error, stdout, stderr) => {
@@ -637,6 +650,9 @@ app.use((err, req, res, next) => {
   });
 });
 
+// Warm the predict worker now so the first upload does not pay the model load
+startPredictWorker();
+
 app.listen(PORT, "0.0.0.0", () => {
   console.log(`\n=================================================`);
   console.log(`🚀 Server running on port ${PORT}`);
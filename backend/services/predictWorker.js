@@ -0,0 +1,107 @@
+// services/predictWorker.js
+//
+// One long-lived `python predict.py --worker` process shared by every
+// /api/predict upload, so the classifier, YOLO and MiDaS are loaded once
+// instead of once per photo. Jobs are written to the worker's stdin as JSON
+// lines; the NDJSON events it writes back carry the job id and end with a
+// {"type": "done"} event, which is how they are routed to the right request.
+
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+const SCRIPT_PATH = path.join(__dirname, '..', 'predict.py');
+
+let worker = null;
+let nextJobId = 1;
+const jobs = new Map(); // job id -> { onEvent, resolve }
+
+const finishJob = (id) => {
+  const job = jobs.get(id);
+  if (!job) return;
+  jobs.delete(id);
+  job.resolve();
+};
+
+const handleLine = (line) => {
+  if (!line.trim()) return;
+
+  let event;
+  try {
+    event = JSON.parse(line);
+  } catch (err) {
+    console.error(`⚠️ Predict worker wrote a non-JSON line: ${line.substring(0, 200)}`);
+    return;
+  }
+
+  if (event.type === 'ready') {
+    console.log(`🧠 Predict worker ready (classifier: ${event.classifier}, depth: ${event.depth})`);
+    return;
+  }
+
+  const job = event.id !== undefined ? jobs.get(event.id) : undefined;
+  if (!job) {
+    console.warn(`⚠️ Predict worker event without a pending job: ${line.substring(0, 200)}`);
+    return;
+  }
+
+  if (event.type === 'done') {
+    finishJob(event.id);
+    return;
+  }
+
+  // Clients get the same events as the one-shot script, without the job id
+  delete event.id;
+  job.onEvent(event);
+};
+
+const startPredictWorker = () => {
+  if (worker) return worker;
+
+  console.log(`🚀 Starting predict worker: ${SCRIPT_PATH} --worker`);
+  const child = spawn('python', [SCRIPT_PATH, '--worker']);
+  worker = child;
+
+  readline.createInterface({ input: child.stdout }).on('line', handleLine);
+
+  child.stderr.on('data', (data) => {
+    console.error(`⚠️ Predict worker stderr: ${data}`);
+  });
+
+  const onExit = (reason) => {
+    if (worker !== child) return;
+    worker = null;
+    console.error(`🏁 Predict worker stopped (${reason}); it restarts on the next upload`);
+
+    // Jobs in flight will never get their events; fail them instead of hanging
+    for (const [id, job] of jobs) {
+      job.onEvent({ type: 'error', success: false, error: 'Prediction worker stopped' });
+      finishJob(id);
+    }
+  };
+
+  child.on('error', (err) => onExit(err.message));
+  child.on('exit', (code, signal) => onExit(signal || `code ${code}`));
+  child.stdin.on('error', (err) => console.error(`⚠️ Predict worker stdin: ${err.message}`));
+
+  return child;
+};
+
+// Runs one photo through the worker; onEvent gets each event object as it
+// arrives, and the returned promise resolves once the job is finished.
+const runPredictJob = ({ imagePath, healthConditions, remainingCalories }, onEvent) =>
+  new Promise((resolve) => {
+    const child = startPredictWorker();
+    const id = String(nextJobId++);
+    jobs.set(id, { onEvent, resolve });
+
+    const job = {
+      id,
+      image_path: imagePath,
+      health_conds: healthConditions,
+      remaining_cals: remainingCalories,
+    };
+    child.stdin.write(JSON.stringify(job) + '\n');
+  });
+
+module.exports = { startPredictWorker, runPredictJob };
@@ -0,0 +1,49 @@
+# Shared pytest fixtures for the backend scripts.
+#
+# Tests run from the backend folder (model files are looked up relative to
+# it) and import the backend modules directly.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from image_files import collect_images  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def in_backend_dir(monkeypatch):
+    monkeypatch.chdir(BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def sample_images(tmp_path_factory):
+    """Photos for parity checks: PARITY_SAMPLES (paths or folders, os.pathsep-separated), else synthetic plates"""
+    configured = [p for p in os.getenv("PARITY_SAMPLES", "").split(os.pathsep) if p]
+    if configured:
+        images = [os.path.abspath(p) for p in collect_images(configured)]
+        if not images:
+            pytest.skip(f"No images found in PARITY_SAMPLES={os.getenv('PARITY_SAMPLES')}")
+        return images
+
+    rng = np.random.default_rng(0)
+    out_dir = tmp_path_factory.mktemp("parity_samples")
+    images = []
+    for i, (w, h) in enumerate([(640, 480), (800, 600), (480, 640), (1024, 768)]):
+        Y, X = np.ogrid[:h, :w]
+        img = np.empty((h, w, 3), dtype=np.float32)
+        img[:] = rng.uniform(60, 140, 3)
+        r = min(w, h) * 0.4
+        img[(X - w / 2) ** 2 + (Y - h / 2) ** 2 <= r ** 2] = 235
+        food = (X - w / 2) ** 2 / (0.6 * r) ** 2 + (Y - h / 2) ** 2 / (0.45 * r) ** 2 <= 1
+        img[food] = rng.uniform(90, 210, 3) + rng.normal(0, 25, (int(food.sum()), 3))
+        path = str(out_dir / f"sample_{i}.jpg")
+        Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(path, quality=90)
+        images.append(path)
+    return images
@@ -0,0 +1,64 @@
+# Parity of the exported classifier and YOLO engines with the original
+# models (export_classifier.py / export_yolo.py check, as assertions).
+#
+# Each case is skipped when its runtime or model files are missing, so the
+# suite runs anywhere; point PARITY_SAMPLES at real food photos for a check
+# that means something.
+
+import os
+
+import numpy as np
+import pytest
+
+import export_classifier
+import export_yolo
+from classifier_backends import MODEL_PATHS
+from yolo_backends import YOLO_IMGSZ, YOLO_MODELS, exported_path
+
+ENGINE_PACKAGES = {"tflite": None, "onnx": "onnxruntime", "openvino": "openvino"}
+
+
+def require_files(*paths):
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        pytest.skip(f"Missing model file(s): {', '.join(missing)}")
+
+
+@pytest.mark.parametrize("backend", ["tflite", "onnx"])
+def test_classifier_backend_top1_matches_keras(backend, sample_images):
+    pytest.importorskip("tensorflow")
+    if ENGINE_PACKAGES[backend]:
+        pytest.importorskip(ENGINE_PACKAGES[backend])
+    require_files(MODEL_PATHS["keras"], MODEL_PATHS[backend])
+
+    report = export_classifier.parity_report(sample_images, [backend])["backends"][backend]
+
+    assert report["mismatched_images"] == [], report
+
+
+@pytest.mark.parametrize("backend", ["onnx", "openvino"])
+@pytest.mark.parametrize("model", sorted(YOLO_MODELS))
+def test_yolo_export_matches_pt(model, backend, sample_images):
+    pytest.importorskip("ultralytics")
+    pytest.importorskip(ENGINE_PACKAGES[backend])
+    pt_path = YOLO_MODELS[model][0]
+    require_files(pt_path, exported_path(pt_path, backend, YOLO_IMGSZ))
+
+    report = export_yolo.parity_report(
+        sample_images, [model], [backend], YOLO_IMGSZ, conf=0.25, iou_threshold=0.5, repeats=1
+    )
+    entry = report["models"][model][f"{backend}@{YOLO_IMGSZ or 640}"]
+
+    assert entry["matched_fraction"] >= export_yolo.DEFAULT_MIN_MATCH, entry
+
+
+def test_match_detections_pairs_same_class_boxes_only():
+    ref_boxes = np.array([[0, 0, 10, 10], [20, 20, 40, 40]], dtype=np.float32)
+    ref_cls = np.array([1, 2])
+    boxes = np.array([[21, 21, 40, 40], [0, 0, 10, 11], [0, 0, 10, 10]], dtype=np.float32)
+    cls = np.array([2, 1, 3])
+
+    matched = export_yolo.match_detections(ref_boxes, ref_cls, boxes, cls, iou_threshold=0.5)
+
+    assert len(matched) == 2
+    assert sorted(matched) == pytest.approx([361 / 400, 100 / 110])
@@ -0,0 +1,28 @@
+# BM25 name ranking of ranking.py, on the 0.0-1.1 scale food_lookup.py returns.
+
+import pytest
+
+from ranking import RankingIndex, score_candidates
+
+
+def test_partial_word_query_gets_prefix_bonus_only():
+    scores = score_candidates("coc", ["Coca Cola", "Coke Zero", "Cocoa Puffs"])
+
+    assert scores.tolist() == pytest.approx([0.1, 0.0, 0.1])
+
+
+def test_partial_word_query_is_returned_by_top_k():
+    assert RankingIndex(["Coke Zero", "Cocoa Puffs", "Coca Cola"]).top_k("coc", 5) == [1, 2]
+
+
+def test_prefix_bonus_adds_to_word_match():
+    # Same length, same word: only the bonus tells them apart
+    scores = score_candidates("cola", ["Cola Zero", "Diet Cola"])
+
+    assert 0 < scores[1] <= 1.0
+    assert scores[0] == pytest.approx(scores[1] + 0.1)
+
+
+def test_stop_word_query_and_missing_names_score_zero():
+    assert score_candidates("the", ["The Cola"]).tolist() == [0.0]
+    assert score_candidates("cola", [None, ""]).tolist() == [0.0, 0.0]
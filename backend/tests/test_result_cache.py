@@ -0,0 +1,46 @@
+# Perceptual matching and eviction bookkeeping of result_cache.py.
+
+import numpy as np
+import pytest
+
+from result_cache import CacheKey, ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results.sqlite3"), 20000, 4, cls_version="cls", depth_version="depth")
+
+
+def phash_rows(cache):
+    return cache._cache.execute("SELECT COUNT(*) FROM phash_entries")[0][0]
+
+
+def test_perceptual_hit_is_linked_for_exact_reuse(cache):
+    original = CacheKey("a" * 64, 0x1234)
+    cache.put_classification(original, {"type": "classification", "name": "pizza"})
+    cache.put_depth(original, np.zeros((8, 8)), np.ones((8, 8)))
+
+    reupload = CacheKey("b" * 64, 0x1234 ^ 0b101)
+    assert cache.match(reupload) == original.sha
+    cache.link(reupload, original.sha)
+
+    assert cache.match(CacheKey(reupload.sha), final=False) == reupload.sha
+    assert cache.get_classification(reupload.sha)["name"] == "pizza"
+    assert cache.get_depth(reupload.sha) is not None
+
+
+def test_phash_rows_follow_evicted_entries(cache):
+    for i in range(60):
+        cache.put_classification(CacheKey(f"{i:064d}", i * 7919), {"pad": "x" * 800})
+
+    cls_entries = cache._cache.execute("SELECT COUNT(*) FROM entries WHERE key LIKE 'cls:%'")[0][0]
+    assert 0 < cls_entries < 60
+    assert phash_rows(cache) == cls_entries
+
+
+def test_orphan_phashes_are_dropped_on_open(cache, tmp_path):
+    cache._cache.execute("INSERT INTO phash_entries (version, sha, phash) VALUES ('old', 'gone', 1)")
+
+    reopened = ResultCache(str(tmp_path / "results.sqlite3"), 20000, 4, cls_version="cls", depth_version="depth")
+
+    assert phash_rows(reopened) == 0
@@ -0,0 +1,50 @@
+# Ingredient keyword matching and rule priority of risk_rules.py.
+
+import pytest
+
+from risk_rules import evaluate
+
+
+def first_failure(ingredients, restrictions, **product):
+    product = dict(product, ingredients_text=ingredients)
+    return evaluate([product], {}, {name: True for name in restrictions}).first_failure(0)
+
+
+@pytest.mark.parametrize("ingredients, restriction", [
+    ("roasted peanuts, salt", "Nut Free"),
+    ("peanut butter", "Nut Free"),
+    ("mixed nuts", "Nut Free"),
+    ("walnut pieces", "Nut Free"),
+    ("wholewheat flour, water", "Gluten Free"),
+    ("sugar, milkfat, cocoa", "Lactose Free"),
+    ("buttermilk, flour", "Lactose Free"),
+    ("Wheat flour, EGGS", "Vegan"),
+])
+def test_compound_and_plural_keywords_are_flagged(ingredients, restriction):
+    assert first_failure(ingredients, [restriction]) is not None
+
+
+@pytest.mark.parametrize("ingredients", [
+    "coconut, nutmeg",
+    "butternut squash",
+    "see nutrition facts",
+])
+def test_excluded_words_are_not_nuts(ingredients):
+    assert first_failure(ingredients, ["Nut Free"]) is None
+
+
+def test_coconut_does_not_hide_a_later_nut():
+    assert first_failure("coconut, hazelnuts", ["Nut Free"]) == "Contains Nut Allergens"
+
+
+def test_peanut_allergen_tag_flags_nut_free():
+    assert first_failure("", ["Nut Free"], allergens_tags=["en:peanuts"]) == "Contains Nut Allergens"
+
+
+def test_label_exempts_rule():
+    assert first_failure("wheat", ["Gluten Free"], labels_tags=["en:gluten-free"]) is None
+
+
+def test_first_failure_follows_lookup_order():
+    # food_lookup.py always checked nuts before gluten
+    assert first_failure("wheat flour, almonds", ["Gluten Free", "Nut Free"]) == "Contains Nut Allergens"
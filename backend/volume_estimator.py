@@ -0,0 +1,173 @@
+# volume_estimator.py
+#
+# Local portion-weight estimate from the MiDaS height map, so the `weight`
+# event does not need a Gemini round trip.
+#
+# MiDaS depth is relative, so the height map only gives the *shape* of the
+# food. The absolute scale comes from two assumptions:
+#   * the photo frame is VOLUME_CONFIG["FRAME_WIDTH_CM"] wide at plate level
+#     (a dinner plate shot from a normal phone distance), which sets the
+#     area of one working-resolution pixel;
+#   * the highest point of the dish is its typical height from DISH_DENSITY.
+# Volume is then the integral of the scaled height map over the food mask,
+# and grams = volume * density.
+
+from typing import Dict, Optional
+
+import numpy as np
+
+VOLUME_CONFIG = {
+    "FRAME_WIDTH_CM": 35.0,
+    "MIN_WEIGHT_G": 20.0,
+    "MAX_WEIGHT_G": 2000.0,
+    "DEFAULT_PROFILE": (0.8, 3.0),
+}
+
+# Food-101 dish -> (density g/cm^3 of the served food, typical peak height cm)
+DISH_DENSITY = {
+    "Apple Pie": (0.65, 4.0),
+    "Baby Back Ribs": (0.95, 4.0),
+    "Baklava": (0.75, 3.0),
+    "Beef Carpaccio": (1.05, 0.5),
+    "Beef Tartare": (1.0, 3.5),
+    "Beet Salad": (0.55, 4.0),
+    "Beignets": (0.35, 4.0),
+    "Bibimbap": (0.8, 5.0),
+    "Bread Pudding": (0.7, 5.0),
+    "Breakfast Burrito": (0.8, 6.0),
+    "Bruschetta": (0.45, 3.0),
+    "Caesar Salad": (0.3, 6.0),
+    "Cannoli": (0.6, 3.5),
+    "Caprese Salad": (0.85, 2.0),
+    "Carrot Cake": (0.6, 8.0),
+    "Ceviche": (0.9, 4.0),
+    "Cheese Plate": (0.9, 3.0),
+    "Cheesecake": (1.05, 6.0),
+    "Chicken Curry": (1.0, 4.0),
+    "Chicken Quesadilla": (0.7, 2.5),
+    "Chicken Wings": (0.75, 4.0),
+    "Chocolate Cake": (0.6, 8.0),
+    "Chocolate Mousse": (0.6, 6.0),
+    "Churros": (0.45, 3.0),
+    "Clam Chowder": (1.05, 5.0),
+    "Club Sandwich": (0.5, 8.0),
+    "Crab Cakes": (0.9, 3.0),
+    "Creme Brulee": (1.05, 3.5),
+    "Croque Madame": (0.6, 6.0),
+    "Cup Cakes": (0.45, 7.0),
+    "Deviled Eggs": (0.95, 3.0),
+    "Donuts": (0.35, 4.0),
+    "Dumplings": (0.9, 3.0),
+    "Edamame": (0.6, 3.0),
+    "Eggs Benedict": (0.75, 6.0),
+    "Escargots": (0.9, 2.5),
+    "Falafel": (0.75, 3.5),
+    "Filet Mignon": (1.05, 5.0),
+    "Fish And Chips": (0.55, 5.0),
+    "Foie Gras": (1.0, 2.5),
+    "French Fries": (0.4, 5.0),
+    "French Onion Soup": (0.95, 6.0),
+    "French Toast": (0.6, 4.0),
+    "Fried Calamari": (0.5, 4.0),
+    "Fried Rice": (0.7, 4.0),
+    "Frozen Yogurt": (0.75, 7.0),
+    "Garlic Bread": (0.35, 3.5),
+    "Gnocchi": (0.9, 3.0),
+    "Greek Salad": (0.5, 5.0),
+    "Grilled Cheese Sandwich": (0.55, 3.5),
+    "Grilled Salmon": (1.0, 3.0),
+    "Guacamole": (0.95, 4.0),
+    "Gyoza": (0.85, 3.0),
+    "Hamburger": (0.55, 9.0),
+    "Hot And Sour Soup": (1.0, 5.0),
+    "Hot Dog": (0.6, 5.0),
+    "Huevos Rancheros": (0.85, 3.5),
+    "Hummus": (1.05, 3.0),
+    "Ice Cream": (0.55, 7.0),
+    "Lasagna": (0.95, 6.0),
+    "Lobster Bisque": (1.0, 5.0),
+    "Lobster Roll Sandwich": (0.6, 7.0),
+    "Macaroni And Cheese": (0.95, 5.0),
+    "Macarons": (0.5, 2.5),
+    "Miso Soup": (1.0, 5.0),
+    "Mussels": (0.6, 6.0),
+    "Nachos": (0.3, 6.0),
+    "Omelette": (0.8, 2.5),
+    "Onion Rings": (0.35, 4.0),
+    "Oysters": (0.8, 2.5),
+    "Pad Thai": (0.65, 5.0),
+    "Paella": (0.8, 3.5),
+    "Pancakes": (0.5, 6.0),
+    "Panna Cotta": (1.05, 6.0),
+    "Peking Duck": (0.8, 3.0),
+    "Pho": (1.0, 7.0),
+    "Pizza": (0.6, 2.0),
+    "Pork Chop": (1.05, 2.5),
+    "Poutine": (0.55, 6.0),
+    "Prime Rib": (1.05, 5.0),
+    "Pulled Pork Sandwich": (0.6, 9.0),
+    "Ramen": (1.0, 7.0),
+    "Ravioli": (0.9, 3.0),
+    "Red Velvet Cake": (0.6, 8.0),
+    "Risotto": (0.95, 3.5),
+    "Samosa": (0.6, 5.0),
+    "Sashimi": (1.05, 2.0),
+    "Scallops": (1.0, 2.5),
+    "Seaweed Salad": (0.6, 4.0),
+    "Shrimp And Grits": (0.95, 4.0),
+    "Spaghetti Bolognese": (0.85, 5.0),
+    "Spaghetti Carbonara": (0.85, 5.0),
+    "Spring Rolls": (0.7, 3.0),
+    "Steak": (1.05, 3.0),
+    "Strawberry Shortcake": (0.5, 8.0),
+    "Sushi": (0.95, 3.0),
+    "Tacos": (0.55, 5.0),
+    "Takoyaki": (0.75, 4.0),
+    "Tiramisu": (0.75, 6.0),
+    "Tuna Tartare": (1.0, 4.0),
+    "Waffles": (0.35, 3.0),
+}
+
+def estimate_volume_cm3(food_name: str, height_map: np.ndarray, target_mask: np.ndarray) -> float:
+    """Integrate the height map over the food mask into cm^3"""
+    _, peak_height_cm = DISH_DENSITY.get(food_name, VOLUME_CONFIG["DEFAULT_PROFILE"])
+    h, w = height_map.shape
+    pixel_area_cm2 = (VOLUME_CONFIG["FRAME_WIDTH_CM"] / w) ** 2
+
+    heights = height_map * target_mask
+    peak = float(heights.max())
+    if peak <= 0:
+        # Flat map (e.g. overhead shot with no parallax): treat the food as a
+        # slab at a third of its typical height rather than zero volume
+        relative = target_mask * (1.0 / 3.0)
+    else:
+        relative = heights / peak
+    return float(relative.sum(dtype=np.float64)) * peak_height_cm * pixel_area_cm2
+
+
+def estimate_weight(food_name: str, height_map: np.ndarray, target_mask: np.ndarray) -> Optional[Dict]:
+    """Local weight estimate in grams, or None if there is no usable food mask"""
+    if height_map is None or target_mask is None or not np.any(target_mask):
+        return None
+    density, _ = DISH_DENSITY.get(food_name, VOLUME_CONFIG["DEFAULT_PROFILE"])
+    volume = estimate_volume_cm3(food_name, height_map, target_mask)
+    weight = min(max(volume * density, VOLUME_CONFIG["MIN_WEIGHT_G"]), VOLUME_CONFIG["MAX_WEIGHT_G"])
+    return {"weight": round(weight, 1), "volume_cm3": round(volume, 1)}
+
+
+def smart_portion(kcal_per_g: Optional[float], weight_g: float, remaining_cals) -> str:
+    """Calorie-budget portion advice, used when Gemini is not consulted (kcal_per_g from nutrition_matrix.py)"""
+    try:
+        remaining = float(remaining_cals)
+    except (TypeError, ValueError):
+        remaining = None
+    if not kcal_per_g or remaining is None:
+        return "No specific recommendation available."
+
+    portion_kcal = weight_g * kcal_per_g
+    if portion_kcal <= remaining:
+        return (f"This portion (~{portion_kcal:.0f} kcal) fits within your remaining "
+                f"{remaining:.0f} kcal for today.")
+    allowed_g = max(0.0, remaining / kcal_per_g)
+    return (f"Consume only about {allowed_g:.0f}g (~{remaining:.0f} kcal) because the full "
+            f"portion is ~{portion_kcal:.0f} kcal and exceeds your remaining calories.")
@@ -0,0 +1,68 @@
+# yolo_backends.py
+#
+# CPU inference engines for the two YOLO models:
+#   ingredient  yolo_fruits_and_vegetables_v3.pt  (recipe_gernate.IngredientDetector)
+#   segment     yolov8n-seg.pt                    (depth_pipeline food mask)
+#
+#   pt        the PyTorch checkpoint, as before
+#   onnx      <stem>.onnx               run by ONNX Runtime
+#   openvino  <stem>_openvino_model/    run by OpenVINO
+#
+# Ultralytics drives every engine, so results (boxes, masks, names) look the
+# same to callers. The exported files are produced once by export_yolo.py.
+# YOLO_IMGSZ runs the models at a reduced square input size (e.g. 480);
+# exported files are fixed-size, so they are exported per size as
+# <stem>_<imgsz>.onnx and picked by the same setting.
+
+import os
+from typing import Optional
+
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "pt").lower()
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", "0")) or None
+
+YOLO_MODELS = {
+    "ingredient": ("yolo_fruits_and_vegetables_v3.pt", "detect"),
+    "segment": ("yolov8n-seg.pt", "segment"),
+}
+
+BACKENDS = ("pt", "onnx", "openvino")
+
+
+def exported_path(pt_path: str, backend: str, imgsz: Optional[int] = None) -> str:
+    """Where export_yolo.py writes (and load_yolo looks for) a backend's copy of pt_path"""
+    if backend == "pt":
+        return pt_path
+    stem = os.path.splitext(pt_path)[0] + (f"_{imgsz}" if imgsz else "")
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    raise ValueError(f"Unknown YOLO backend '{backend}', expected one of {list(BACKENDS)}")
+
+
+class YoloModel:
+    """Ultralytics model plus the input size it must be run at"""
+
+    def __init__(self, model, backend: str, imgsz: Optional[int]):
+        self.model = model
+        self.backend = backend
+        self.imgsz = imgsz
+        self.names = model.names
+
+    def __call__(self, source, **kwargs):
+        if self.imgsz:
+            kwargs.setdefault("imgsz", self.imgsz)
+        return self.model(source, **kwargs)
+
+
+def load_yolo(pt_path: str, task: str, backend: Optional[str] = None, imgsz: Optional[int] = None) -> YoloModel:
+    """Load pt_path through the requested engine (defaults to $YOLO_BACKEND / $YOLO_IMGSZ)"""
+    from ultralytics import YOLO
+
+    backend = (backend or YOLO_BACKEND).lower()
+    imgsz = imgsz or YOLO_IMGSZ
+    path = exported_path(pt_path, backend, imgsz)
+    if backend != "pt" and not os.path.exists(path):
+        raise FileNotFoundError(f"YOLO model not found: {path} (run export_yolo.py export first)")
+    # Exported files carry no task hint, so pass it explicitly
+    return YoloModel(YOLO(path, task=task), backend, imgsz)